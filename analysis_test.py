@@ -30,6 +30,11 @@ def main():
         'plot (if supported by another command)')
     parser.add_argument('-j', '--json', action='store_true', help='Dump '
         'data to a JSON.')
+    parser.add_argument('-w', '--workers', type=int, help='Analyze blobs '
+        'in this many processes')
+    parser.add_argument('-c', '--cache', nargs='?', const='', help='Reuse '
+        'per-blob results saved in this directory (default: the user cache '
+        'directory), computing and saving only what is missing')
 
     args = parser.parse_args()
 
@@ -41,11 +46,6 @@ def main():
     experiment.add_summary_filter(multiworm.filters.summary_lifetime_minimum(120))
     experiment.add_filter(multiworm.filters.relative_move_minimum(2))
 
-    if args.limit:
-        blob_gen = itertools.islice(experiment.good_blobs(), args.limit)
-    else:
-        blob_gen = experiment.good_blobs()
-
     speed_config = {
         'smoothing': ('sgolay', 71, 5),
         'percentiles': [10, 20, 50, 80, 90],
@@ -58,7 +58,14 @@ def main():
     analyzer.add_analysis_method(noise_est)
     analyzer.add_analysis_method(speed_est)
 
-    analyzer.analyze(blob_gen)
+    if args.limit:
+        analyzer.analyze(itertools.islice(experiment.good_blobs(), args.limit))
+    else:
+        cache = None
+        if args.cache is not None:
+            cache = multiworm.analytics.ResultCache(args.cache or None)
+        analyzer.analyze_experiment(experiment, workers=args.workers,
+                                    cache=cache)
 
     data = analyzer.results()
 
@@ -11,7 +11,6 @@ import functools
 
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
 
 import multiworm
 from multiworm.readers import blob as blob_reader
@@ -68,12 +67,11 @@ def main(argv=None):
     experiment.load_summary()
 
     # find the closest still to the given time
-    time = find_nearest(list(experiment.image_files.keys()), args.time)
+    image_file, time = experiment.image_files.nearest(time=args.time)
     print("- Found image at {0:.2f} s ({1:+.2f} s relative to specified "
           "time)".format(time, time - args.time))
-    image_file = experiment.image_files[time]
     print(image_file)
-    img = mpimg.imread(str(image_file))
+    img, _ = experiment.image_files.load(time=time)
 
     # find the closest frame to the derived still time
     frame = find_nearest_index(experiment.frame_times, time) + 1
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Smoothing and the analytics methods
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import multiworm
+from multiworm.analytics import (ragged, smooth, ExperimentAnalyzer,
+        NoiseEstimator, SpeedEstimator, SpeedSketch, PlateTimeSeries)
+
+from .common import SIZES, experiment_path, random_walks
+
+SMOOTHING = [('sgolay', 71, 5), ('hann', 15)]
+
+
+class Smoothing(object):
+    params = [[repr(s) for s in SMOOTHING]]
+    param_names = ['smoothing']
+
+    def setup(self, smoothing):
+        self.smoothing = dict((repr(s), s) for s in SMOOTHING)[smoothing]
+        walks = random_walks(200, 1000)
+        self.walks = list(walks)
+        self.values, self.offsets = ragged.concatenate(walks)
+
+    def time_smooth(self, smoothing):
+        method, window = self.smoothing[:2]
+        for walk in self.walks:
+            for k in range(2):
+                smooth.smooth(method, walk[:, k], window,
+                              *self.smoothing[2:])
+
+    def time_smooth_many(self, smoothing):
+        method, window = self.smoothing[:2]
+        smooth.smooth_many(method, self.values, self.offsets, window,
+                           *self.smoothing[2:])
+
+
+def _methods(frame_times):
+    return {
+        'noise': lambda: NoiseEstimator(),
+        'noise_mad': lambda: NoiseEstimator('mad'),
+        'speed': lambda: SpeedEstimator([10, 50, 90], SMOOTHING[0]),
+        'speed_sketch': lambda: SpeedSketch([10, 50, 90], SMOOTHING[0]),
+        'timeseries': lambda: PlateTimeSeries(frame_times),
+    }
+
+
+class Methods(object):
+    params = [sorted(_methods([])), sorted(SIZES)]
+    param_names = ['method', 'size']
+
+    def setup(self, method, size):
+        experiment = multiworm.Experiment(experiment_path(size))
+        # the stream recycles each blob's data once the next is read
+        self.blobs = [dict(data) for _, data in experiment.stream()
+                      if data is not None]
+        self.make = _methods(experiment.frame_times)[method]
+
+    def run(self):
+        analysis = self.make()
+        for data in self.blobs:
+            analysis.process_blob(data)
+        analysis.result()
+
+    def time_process(self, method, size):
+        self.run()
+
+    def peakmem_process(self, method, size):
+        self.run()
+
+
+class Experiment(object):
+    params = [[None, 2], sorted(SIZES)]
+    param_names = ['workers', 'size']
+    number = 1
+
+    def setup(self, workers, size):
+        self.path = experiment_path(size)
+
+    def time_analyze_experiment(self, workers, size):
+        experiment = multiworm.Experiment(self.path)
+        analyzer = ExperimentAnalyzer()
+        for name in ['noise', 'speed', 'speed_sketch', 'timeseries']:
+            analyzer.add_analysis_method(
+                    _methods(experiment.frame_times)[name]())
+        analyzer.analyze_experiment(experiment, workers=workers)
+        analyzer.results()
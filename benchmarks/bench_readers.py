@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Reading experiments: summary files, blobs files, and contours
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import numpy as np
+
+import multiworm
+from multiworm.readers import summary, blob
+
+from .common import SIZES, experiment_path
+
+
+class Summary(object):
+    params = sorted(SIZES)
+    param_names = ['size']
+
+    def setup(self, size):
+        self.path = experiment_path(size)
+        self.summary_file, _ = summary.find(self.path)
+
+    def time_parse(self, size):
+        summary.parse(self.summary_file)
+
+    def peakmem_parse(self, size):
+        summary.parse(self.summary_file)
+
+    def time_open(self, size):
+        multiworm.Experiment(self.path)
+
+
+class BlobReads(object):
+    params = sorted(SIZES)
+    param_names = ['size']
+    number = 1
+
+    def setup(self, size):
+        self.experiment = multiworm.Experiment(experiment_path(size))
+        self.bids = list(self.experiment.summary.index)
+        self.shuffled = list(np.random.RandomState(0).permutation(self.bids))
+
+    def time_sequential(self, size):
+        for _ in self.experiment.stream(self.bids):
+            pass
+
+    def time_random(self, size):
+        for _ in self.experiment.stream(self.shuffled):
+            pass
+
+    def peakmem_sequential(self, size):
+        for _ in self.experiment.stream(self.bids):
+            pass
+
+    def time_workers(self, size):
+        for _ in self.experiment.blobs(workers=2, executor='process'):
+            pass
+
+
+class Outlines(object):
+
+    def setup(self):
+        experiment = multiworm.Experiment(experiment_path('small'))
+        data = experiment.stream(list(experiment.summary.index[:20]))
+        self.contours = []
+        for _, blob_data in data:
+            if blob_data is None:
+                continue
+            self.contours.extend(
+                    c for c in zip(blob_data['contour_start'],
+                                   blob_data['contour_encode_len'],
+                                   blob_data['contour_encoded'])
+                    if c[1] is not None)
+        self.contours = self.contours[:2000]
+        self.outlines = [blob.decode_outline(*c) for c in self.contours]
+
+    def time_decode_outline(self):
+        for contour in self.contours:
+            blob.decode_outline(*contour)
+
+    def time_encode_outline(self):
+        for outline in self.outlines:
+            blob.encode_outline(outline)
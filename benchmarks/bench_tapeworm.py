@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Finding and scoring candidate joins between blobs
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import numpy as np
+
+from multiworm.util import dtype
+from tapeworm import tape, scoring
+
+from .common import random_walks
+
+TERMINAL_FIELDS = dtype([('bid', 'int32'), ('loc', '2int16'), ('f', 'int32')])
+
+
+def termini(n, frames=100000, seed=0):
+    """
+    Returns random ends and starts for *n* blobs tracked over *frames*.
+    """
+    rs = np.random.RandomState(seed)
+    born = rs.randint(1, frames, n)
+    died = np.minimum(born + rs.geometric(1 / 500, n), frames)
+    starts = np.zeros(n, TERMINAL_FIELDS)
+    ends = np.zeros(n, TERMINAL_FIELDS)
+    for array, frame in [(starts, born), (ends, died)]:
+        array['bid'] = np.arange(1, n + 1)
+        array['loc'] = rs.randint(0, 2000, (n, 2))
+        array['f'] = frame
+    return ends, starts
+
+
+class FindCandidates(object):
+    params = [1000, 4000]
+    param_names = ['blobs']
+
+    def setup(self, blobs):
+        self.ends, self.starts = termini(blobs)
+
+    def time_find_candidates(self, blobs):
+        tape.find_candidates(self.ends, self.starts)
+
+    def peakmem_find_candidates(self, blobs):
+        tape.find_candidates(self.ends, self.starts)
+
+    def track_candidates(self, blobs):
+        candidates = tape.find_candidates(self.ends, self.starts)
+        return sum(len(c) for c in six.itervalues(candidates))
+
+
+class DisplacementScorer(object):
+    params = [[100, 400], [100, 700]]
+    param_names = ['blobs', 'horizon']
+    number = 1
+
+    def setup(self, blobs, horizon):
+        walks = random_walks(blobs, horizon, seed=1)
+        lengths = np.random.RandomState(2).randint(horizon // 4, horizon + 1,
+                                                   blobs)
+        lengths[:2] = horizon # the KDE needs a few samples at every gap
+        # what tape.jagged_mask() builds, without its per-row loop
+        self.displacements = np.ma.masked_all((blobs, horizon))
+        for i, (walk, n) in enumerate(zip(walks, lengths)):
+            self.displacements[i, :n] = tape.absolute_displacement(walk[:n])
+        self.scorer = scoring.DisplacementScorer(self.displacements)
+        rs = np.random.RandomState(3)
+        self.fgaps = rs.randint(1, horizon, 10000)
+        self.dgaps = rs.uniform(0, 50, 10000)
+
+    def time_fit(self, blobs, horizon):
+        scoring.DisplacementScorer(self.displacements)
+
+    def peakmem_fit(self, blobs, horizon):
+        scoring.DisplacementScorer(self.displacements)
+
+    def time_score(self, blobs, horizon):
+        for f, d in zip(self.fgaps, self.dgaps):
+            self.scorer(f, d)
+
+    def time_score_many(self, blobs, horizon):
+        self.scorer.ev(self.fgaps, self.dgaps)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Data shared by the benchmarks: synthetic experiments, generated once and
+kept in the temporary directory so every benchmark process can reuse them.
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import os
+import pathlib
+import shutil
+import tempfile
+
+import numpy as np
+
+from multiworm import synthetic
+
+#: Experiments benchmarked, by name
+SIZES = {
+    'small': dict(frames=2000, concurrent=20, total_blobs=400, images=2),
+    'medium': dict(frames=20000, concurrent=50, total_blobs=5000, images=2),
+}
+SEED = 0
+
+ROOT = pathlib.Path(os.environ.get('MULTIWORM_BENCHMARK_DATA') or
+                    os.path.join(tempfile.gettempdir(),
+                                 'multiworm-benchmarks'))
+
+
+def experiment_path(size):
+    """
+    Returns the location of the synthetic experiment *size* (one of
+    :data:`SIZES`), generating it if it doesn't exist yet.
+    """
+    options = dict(SIZES[size], plate_size=(1024, 1024), seed=SEED)
+    name = '-'.join('{}{}'.format(k, v) for k, v in sorted(options.items())
+                    if k != 'plate_size')
+    path = ROOT / name.replace(' ', '')
+    if not path.exists():
+        # generate beside and move into place so a half-written experiment
+        # is never picked up
+        if not ROOT.exists():
+            ROOT.mkdir(parents=True)
+        temp = pathlib.Path(tempfile.mkdtemp(dir=str(ROOT)))
+        synthetic.generate(temp, **options)
+        try:
+            temp.rename(path)
+        except OSError: # someone else got there first
+            shutil.rmtree(str(temp))
+    return path
+
+
+def random_walks(n, length, seed=SEED):
+    """
+    Returns *n* random walks *length* steps long, shaped (n, length, 2).
+    """
+    rs = np.random.RandomState(seed)
+    heading = np.cumsum(rs.normal(0, 0.2, (n, length)), axis=1)
+    speed = rs.gamma(2, 0.5, (n, 1))
+    steps = speed[..., None] * np.stack([np.cos(heading), np.sin(heading)],
+                                        axis=-1)
+    return np.cumsum(steps, axis=1) + rs.uniform(0, 1000, (n, 1, 2))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Runs the benchmarks without asv, each in a fresh process (so peak memory is
+the benchmark's own), e.g.::
+
+    python -m benchmarks.run                      # everything
+    python -m benchmarks.run Summary --save a.json
+    git checkout other-branch
+    python -m benchmarks.run Summary --compare a.json
+
+The benchmarks are written for asv (``asv run``, ``asv continuous master
+HEAD``), which is better for tracking history; this is for quick checks.
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import pkgutil
+import re
+import subprocess
+import sys
+import timeit
+
+import benchmarks
+from multiworm.util import memory_usage
+
+PREFIXES = ('time_', 'peakmem_', 'track_')
+UNITS = {'time_': 's', 'peakmem_': 'B', 'track_': ''}
+CHANGE = 0.1 #: Relative change flagged by --compare
+
+
+def discover():
+    """
+    Yields the name, class, method name and parameters of every benchmark.
+    """
+    for _, module_name, _ in pkgutil.iter_modules(benchmarks.__path__):
+        if not module_name.startswith('bench_'):
+            continue
+        module = importlib.import_module('benchmarks.' + module_name)
+        for class_name, cls in sorted(inspect.getmembers(module,
+                                                         inspect.isclass)):
+            if cls.__module__ != module.__name__:
+                continue
+            for method in sorted(m for m in dir(cls)
+                                 if m.startswith(PREFIXES)):
+                for params in _combinations(cls):
+                    name = '{}.{}.{}'.format(module_name, class_name, method)
+                    if params:
+                        name += '({})'.format(', '.join(repr(p)
+                                                        for p in params))
+                    yield name, cls, method, params
+
+
+def _combinations(cls):
+    params = getattr(cls, 'params', None)
+    if params is None:
+        return [()]
+    if len(getattr(cls, 'param_names', [])) <= 1 and \
+            not isinstance(params[0], (list, tuple)):
+        params = [params]
+    return list(itertools.product(*params))
+
+
+def measure(cls, method, params, repeat):
+    instance = cls()
+    if hasattr(instance, 'setup'):
+        instance.setup(*params)
+    function = getattr(instance, method)
+    try:
+        if method.startswith('track_'):
+            return function(*params)
+        if method.startswith('peakmem_'):
+            function(*params)
+            return memory_usage()['peak']
+        number = getattr(instance, 'number', 1)
+        return min(timeit.repeat(lambda: function(*params), number=number,
+                                 repeat=repeat)) / number
+    finally:
+        if hasattr(instance, 'teardown'):
+            instance.teardown(*params)
+
+
+def run_one(name, repeat):
+    for found, cls, method, params in discover():
+        if found == name:
+            print(json.dumps(measure(cls, method, params, repeat)))
+            return
+    raise SystemExit('No benchmark {}'.format(name))
+
+
+def format_value(name, value):
+    method = name.split('.')[2]
+    unit = next(UNITS[p] for p in PREFIXES if method.startswith(p))
+    if unit == 's':
+        for scale, prefix in [(1, ''), (1e-3, 'm'), (1e-6, 'u')]:
+            if value >= scale:
+                break
+        return '{:.3g} {}s'.format(value / scale, prefix)
+    if unit == 'B':
+        return '{:.1f} MB'.format(value / 2**20)
+    return '{}'.format(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pattern', nargs='?', default='',
+            help='Only run benchmarks with names matching this regex')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+            help='Timing repeats (the best is reported)')
+    parser.add_argument('-s', '--save', help='Save results to this JSON file')
+    parser.add_argument('-c', '--compare', help='Compare with results '
+            'saved in this JSON file')
+    parser.add_argument('--one', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        return run_one(args.one, args.repeat)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    results = {}
+    for name, _, _, _ in discover():
+        if not re.search(args.pattern, name):
+            continue
+        output = subprocess.check_output([sys.executable, '-m',
+                'benchmarks.run', '--one', name, '--repeat', str(args.repeat)])
+        value = results[name] = json.loads(output.decode('utf-8')
+                                           .strip().splitlines()[-1])
+
+        line = '{:<70} {:>12}'.format(name, format_value(name, value))
+        if name in previous and previous[name]:
+            ratio = value / previous[name]
+            flag = ''
+            if ratio > 1 + CHANGE:
+                flag = ' worse'
+            elif ratio < 1 - CHANGE:
+                flag = ' better'
+            line += '  {:>12}  {:5.2f}x{}'.format(
+                    format_value(name, previous[name]), ratio, flag)
+        print(line)
+        sys.stdout.flush()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,10 +13,9 @@ import numbers
 import numpy as np
 import scipy.optimize as spo
 import scipy.stats as sps
-import scipy.signal as ss
 
 import multiworm
-import multiworm.analytics.sgolay
+from multiworm.analytics.smooth import smooth, METHODS as ALL_METHODS
 import where
 
 WALDO_LOC = os.path.join(os.path.dirname(__file__), '..', 'Waldo')
@@ -135,39 +134,6 @@ def fld(fieldname, *data, **kwargs):
 
     print(' {0:25s} | {1:s}'.format(fieldname, datastr))
 
-def sgolay(series, window, order):
-    series = np.array(series)
-    window = int(window)
-    order = int(order)
-    return multiworm.analytics.sgolay.savitzky_golay(series, window, order)
-
-STOCK_METHODS = [
-    'boxcar', 'triang', 'blackman', 'hamming', 'hann', 'bartlett',
-    'flattop', 'parzen', 'bohman', 'blackmanharris', 'nuttall', 'barthann',
-    'kaiser', 'gaussian', 'general_gaussian', 'slepian', 'chebwin'
-]
-SMOOTH_METHODS = {
-    'sgolay': sgolay,
-}
-
-def smooth(method, series, winlen, *params):
-    if method in SMOOTH_METHODS:
-        return SMOOTH_METHODS[method](series, winlen, *params)
-
-    try:
-        winlen = int(winlen) // 2 * 2 + 1 # make it odd, rounding up
-        half_win = winlen // 2
-        wintype = (method,) + tuple(int(x) for x in params)
-        fir_win = ss.get_window(wintype, winlen)
-    except ValueError:
-        raise ValueError('Unrecognized smoothing type')
-
-    b = fir_win / sum(fir_win)
-    a = [1]
-    #zi = ss.lfiltic(b, a)
-    #zi = series[0] * np.ones(len(b) - 1)
-    return ss.lfilter(b, a, series)[winlen-1:]
-
 def speed_dist(centroid):
     Ellipsis
 
@@ -219,7 +185,6 @@ def main(argv=None):
         print('Blob ID {0} not found.'.format(args.blob_id), file=sys.stderr)
         sys.exit(1)
 
-    ALL_METHODS = list(six.iterkeys(SMOOTH_METHODS)) + STOCK_METHODS
     if args.smooth and args.smooth[0] not in ALL_METHODS:
         print('Smoothing method "{}" not valid.  Must be one of: {}'
             .format(args.smooth[0], ', '.join(ALL_METHODS)), file=sys.stderr)
@@ -3,6 +3,7 @@ from __future__ import (
         absolute_import, division, print_function, unicode_literals)
 
 from .experiment import Experiment
+from .collection import ExperimentCollection
 from . import filters
 from . import util
 from .core import *
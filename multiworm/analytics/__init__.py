@@ -3,4 +3,7 @@ from __future__ import absolute_import
 
 from .analytics import ExperimentAnalyzer
 from .noise import NoiseEstimator
-from .speed import SpeedEstimator
+from .speed import SpeedEstimator, SpeedSketch
+from .sketch import TDigest
+from .timeseries import PlateTimeSeries, plate_timeseries
+from .resultcache import ResultCache
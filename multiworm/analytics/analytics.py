@@ -6,6 +6,13 @@ from __future__ import (
 import six
 from six.moves import (zip, filter, map, reduce, input, range)
 
+import copy
+
+from ..experiment import load_good_blob
+from ..util import bounded_map
+from . import resultcache
+
+SHARD_BLOBS = 250
 
 class ExperimentAnalyzer(object):
     def __init__(self):
@@ -19,6 +26,85 @@ class ExperimentAnalyzer(object):
             for analyzer in self.analyzers:
                 analyzer.process_blob(blob)
 
+    def analyze_experiment(self, experiment, workers=None,
+            shard_size=SHARD_BLOBS, executor='process', cache=None):
+        """
+        Runs every analyzer on the good blobs of *experiment* (those
+        :meth:`.Experiment.good_blobs` would yield), reading each blob once.
+
+        Blobs are split into shards of *shard_size* in order, and each shard
+        is analyzed from scratch (see :meth:`AnalysisMethod.spawn`) by one
+        of *workers* (see :func:`.util.bounded_map`; the analyzers and
+        experiment filters must be picklable for processes).  The partial
+        results are then merged into the analyzers here in the same order,
+        so the results don't depend on the number of workers.
+
+        Given a :class:`.resultcache.ResultCache` *cache*, analyzers that
+        support it (see :meth:`AnalysisMethod.cache_params`) only compute
+        the blobs missing from it, and save them there.  Whether each blob
+        passes the experiment filters is cached too if the filters can be
+        pickled, so blobs are only read when some analyzer needs them.
+        """
+        experiment.load_summary()
+        locations = list(experiment._blob_locations(
+                experiment._good_summary.index))
+
+        cached, passes, filters_hash = [], {}, None
+        if cache is not None:
+            fingerprint = resultcache.fingerprint(experiment)
+            for analyzer in self.analyzers:
+                params = analyzer.cache_params()
+                if params is not None:
+                    key = (fingerprint, type(analyzer).__name__,
+                           resultcache.params_hash(params))
+                    cached.append((analyzer, key, cache.load(key)))
+
+            filters_hash = resultcache.filters_hash(experiment.filters)
+            if filters_hash is not None:
+                filters_key = (fingerprint, '_filters', filters_hash)
+                passes = cache.load(filters_key)
+        live = [a for a in self.analyzers
+                if not any(a is c for c, _, _ in cached)]
+        known = len(passes)
+
+        def blob_tasks():
+            for bid, location in locations:
+                todo = [i for i, (_, _, entries) in enumerate(cached)
+                        if bid not in entries]
+                if passes.get(bid) is False:
+                    continue
+                if bid in passes and not live and not todo:
+                    continue
+                yield bid, location, todo
+        blobs = list(blob_tasks())
+        tasks = ((blobs[i:i + shard_size], experiment.filters,
+                  [analyzer.spawn() for analyzer in live],
+                  [analyzer.spawn() for analyzer, _, _ in cached])
+                 for i in range(0, len(blobs), shard_size))
+
+        if workers:
+            shards = bounded_map(_analyze_shard, tasks, workers=workers,
+                                 executor=executor)
+        else:
+            shards = map(_analyze_shard, tasks)
+
+        computed = [0] * len(cached)
+        for partials, shard_passes, outputs in shards:
+            for analyzer, partial in zip(live, partials):
+                analyzer.merge(partial)
+            passes.update(shard_passes)
+            for i, ((_, _, entries), new) in enumerate(zip(cached, outputs)):
+                entries.update(new)
+                computed[i] += len(new)
+
+        for (analyzer, key, entries), n in zip(cached, computed):
+            analyzer.add_outputs([entries[bid] for bid, _ in locations
+                                  if passes.get(bid)])
+            if n:
+                cache.store(key, entries)
+        if filters_hash is not None and len(passes) > known:
+            cache.store(filters_key, passes)
+
     def results(self):
         data = {}
         for analyzer in self.analyzers:
@@ -26,10 +112,93 @@ class ExperimentAnalyzer(object):
 
         return data
 
+def _analyze_shard(task):
+    blobs, filters, analyzers, cached = task
+    passes = {}
+    pending = [[] for _ in cached]
+    for bid, location, todo in blobs:
+        bid, blob = load_good_blob((bid, location, filters))
+        passes[bid] = blob is not None
+        if blob is None:
+            continue
+        for analyzer in analyzers:
+            analyzer.process_blob(blob)
+        for i in todo:
+            pending[i].append((bid, blob))
+    # send back the results rather than blobs still waiting for a batch
+    for analyzer in analyzers:
+        analyzer.flush()
+
+    outputs = []
+    for analyzer, items in zip(cached, pending):
+        new = {}
+        if items:
+            bids, data = zip(*items)
+            new = dict(zip(bids, analyzer.blob_outputs(list(data))))
+        outputs.append(new)
+    return analyzers, passes, outputs
+
 # import abc
 
 # @six.add_metaclass(abc.ABCMeta)
 class AnalysisMethod(object):
+    """
+    Base for analyses of blobs.  The state starts out as set by
+    :meth:`reset`, is updated by :meth:`process_blob` with each blob, and
+    :meth:`merge` combines the state of another instance (which saw later
+    blobs) into this one, so the work can be split up.  Analyses that
+    hold blobs back to process in batches finish them in :meth:`flush`.
+    """
 #     @abc.abstract_method
     def process_blob(self, blob):
         raise NotImplementedError()
+
+    def reset(self):
+        """
+        Clears all results.
+        """
+        raise NotImplementedError()
+
+    def merge(self, other):
+        """
+        Adds the results of *other*, which processed blobs after those
+        this one did, to this one.
+        """
+        raise NotImplementedError()
+
+    def flush(self):
+        """
+        Processes any blobs still held back, e.g. for a batch, so the
+        state only holds results.  Does nothing by default.
+        """
+        pass
+
+    def cache_params(self):
+        """
+        Returns the configuration (as JSON-compatible data) that decides
+        what :meth:`blob_outputs` gives for any blob, if those outputs can
+        be cached, or ``None`` (the default) if they can't.
+        """
+        return None
+
+    def blob_outputs(self, blobs):
+        """
+        Returns a list of what each of the parsed *blobs* adds to the
+        results, picklable, without changing them.
+        """
+        raise NotImplementedError()
+
+    def add_outputs(self, outputs):
+        """
+        Adds the results of blobs, given the :meth:`blob_outputs` for them,
+        as if they were processed.
+        """
+        raise NotImplementedError()
+
+    def spawn(self):
+        """
+        Returns an instance with the same configuration but no results.
+        """
+        clone = copy.copy(self)
+        clone.reset()
+        return clone
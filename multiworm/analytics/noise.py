@@ -11,6 +11,11 @@ import numpy as np
 import scipy.optimize as spo
 
 from .analytics import AnalysisMethod
+from . import ragged
+
+METHODS = ('moments', 'mad', 'fit')
+BATCH_BLOBS = 1000
+MAD_TO_SD = 1.482602218505602 # for normally distributed data
 
 def normpdf(x, *args):
     "Return the normal pdf evaluated at *x*; args provides *mu*, *sigma*"
@@ -24,7 +29,7 @@ def fit_gaussian(x, num_bins=200):
         print('fit_gaussian exit')
         return max(x), 0
 
-    n, bin_edges = np.histogram(x, num_bins, normed=True)
+    n, bin_edges = np.histogram(x, num_bins, density=True)
     bincenters = [0.5 * (bin_edges[i + 1] + bin_edges[i]) for i in range(len(n))]
 
     # Target function
@@ -56,33 +61,109 @@ def centroid_stats(steps):
         stats.append(fit_gaussian(data))
     return stats
 
+def batch_step_stats(centroids, robust=False):
+    """
+    Returns the means and standard deviations of the x and y frame-by-frame
+    steps of each of *centroids* as two arrays, shaped (blobs, 2), computed
+    for all at once.  If *robust*, the median and the median absolute
+    deviation (scaled to match the standard deviation of a normal
+    distribution) are used instead.  Blobs with fewer than two frames get
+    NaN.
+    """
+    values, offsets = ragged.concatenate(
+            np.asarray(c, dtype=float).reshape(-1, 2) for c in centroids)
+    steps, step_offsets = ragged.diff(values.reshape(-1, 2), offsets)
+
+    if not robust:
+        means = ragged.means(steps, step_offsets)
+        return means, ragged.stds(steps, step_offsets, means)
+
+    medians = ragged.medians(steps, step_offsets)
+    deviations = np.abs(steps - medians[ragged.group_ids(step_offsets)])
+    return medians, MAD_TO_SD * ragged.medians(deviations, step_offsets)
+
 
 class NoiseEstimator(AnalysisMethod):
     """
     Attempt to determine the amount of noise present in some worm recordings.
+
+    The mean and standard deviation of each blob's centroid steps are found
+    by *method*: ``'moments'`` (default) computes them directly, ``'mad'``
+    uses the median and median absolute deviation to resist outliers, and
+    ``'fit'`` fits a Gaussian to a histogram of the steps (slow).  The
+    first two are computed for *batch_size* blobs at a time.
     """
-    def __init__(self):
+    def __init__(self, method='moments', batch_size=BATCH_BLOBS):
+        if method not in METHODS:
+            raise ValueError('Unknown noise estimation method: {}'
+                             .format(method))
+        self.method = method
+        self.batch_size = batch_size
+        self.reset()
+
+    def reset(self):
         self.std_devs = []
         self.means = []
+        self._pending = []
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        self.std_devs.extend(other.std_devs)
+        self.means.extend(other.means)
 
     def process_blob(self, blob):
         """
         Feed parsed blobs and it generates the appropriate statistics.
+        Blobs are processed in batches, so :attr:`means` and
+        :attr:`std_devs` are only complete after calling :meth:`result`.
         """
         if blob is None:
             return
 
-        steps = centroid_steps(blob['centroid'])
-        result = centroid_stats(steps)
-        means, sds = zip(*result)
+        self._pending.append(blob['centroid'])
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if pending:
+            self.add_outputs(self._outputs(pending))
 
-        self.std_devs.append(sds)
-        self.means.append(means)
+    def cache_params(self):
+        return {'method': self.method}
+
+    def blob_outputs(self, blobs):
+        """
+        Returns the means and standard deviations of the steps of each of
+        *blobs*.
+        """
+        return self._outputs([blob['centroid'] for blob in blobs])
+
+    def add_outputs(self, outputs):
+        for means, sds in outputs:
+            self.means.append(means)
+            self.std_devs.append(sds)
+
+    def _outputs(self, centroids):
+        if self.method == 'fit':
+            outputs = []
+            for centroid in centroids:
+                result = centroid_stats(centroid_steps(centroid))
+                means, sds = zip(*result)
+                outputs.append((means, sds))
+            return outputs
+
+        means, sds = batch_step_stats(centroids, robust=self.method == 'mad')
+        return [(tuple(m), tuple(s))
+                for m, s in zip(means.tolist(), sds.tolist())]
 
     def result(self):
+        self.flush()
 
-        mean_mean = np.mean(self.means, axis=0)
-        mean_std_dev = np.mean(self.std_devs, axis=0)
+        # blobs too short to have any steps are NaN
+        mean_mean = np.nanmean(self.means, axis=0)
+        mean_std_dev = np.nanmean(self.std_devs, axis=0)
 
         data = {
             'mean_xy': mean_mean.tolist(),
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized operations on ragged arrays: the data of many blobs stored as
+one concatenated array of *values*, and the *offsets* where each blob's
+data starts (with the total length at the end), so blob ``i`` is
+``values[offsets[i]:offsets[i + 1]]``.
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import numpy as np
+
+def concatenate(arrays, dtype=float):
+    """
+    Joins *arrays* along the first axis, returning the values and offsets.
+    """
+    arrays = [np.asarray(a, dtype=dtype) for a in arrays]
+    offsets = np.zeros(len(arrays) + 1, dtype=int)
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    if not arrays:
+        return np.empty(0, dtype=dtype), offsets
+    arrays = [a for a in arrays if len(a)] or arrays[:1]
+    return np.concatenate(arrays), offsets
+
+def split(values, offsets):
+    """
+    Inverse of :func:`concatenate`, returning a list of arrays.
+    """
+    return [values[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+
+def lengths(offsets):
+    """
+    Returns the number of values in each group.
+    """
+    return np.diff(offsets)
+
+def group_ids(offsets):
+    """
+    Returns the index of the group each value belongs to.
+    """
+    return np.repeat(np.arange(len(offsets) - 1), lengths(offsets))
+
+def diff(values, offsets):
+    """
+    Like ``np.diff(..., axis=0)`` on each group, returning the differences
+    and their offsets (groups of *n* values have *n - 1* differences).
+    """
+    ids = group_ids(offsets)
+    keep = ids[:-1] == ids[1:]
+    new_offsets = np.zeros_like(offsets)
+    np.cumsum(np.maximum(lengths(offsets) - 1, 0), out=new_offsets[1:])
+    return np.diff(values, axis=0)[keep], new_offsets
+
+def _columns(values):
+    return values.reshape(len(values), int(np.prod(values.shape[1:])))
+
+def _shaped(result, values):
+    return result.reshape((len(result),) + values.shape[1:])
+
+def sums(values, offsets):
+    """
+    Sum of each group's values (along the first axis).
+    """
+    ids = group_ids(offsets)
+    n = len(offsets) - 1
+    columns = _columns(values)
+    result = np.empty((n, columns.shape[1]))
+    for k in range(columns.shape[1]):
+        result[:, k] = np.bincount(ids, weights=columns[:, k], minlength=n)
+    return _shaped(result, values)
+
+def means(values, offsets):
+    """
+    Mean of each group's values, NaN for empty groups.
+    """
+    counts = lengths(offsets).reshape((-1,) + (1,) * (values.ndim - 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums(values, offsets) / counts
+
+def stds(values, offsets, center=None):
+    """
+    Standard deviation of each group's values (with no degrees of freedom
+    correction, like ``np.std``), NaN for empty groups.  Deviations are
+    taken from *center* (one row per group) if given, else the mean.
+    """
+    if center is None:
+        center = means(values, offsets)
+    deviations = values - center[group_ids(offsets)]
+    return np.sqrt(means(deviations * deviations, offsets))
+
+def select(values, offsets, mask):
+    """
+    Returns the values where *mask* is true and their offsets.
+    """
+    new_offsets = np.zeros_like(offsets)
+    np.cumsum(np.bincount(group_ids(offsets)[mask],
+                          minlength=len(offsets) - 1), out=new_offsets[1:])
+    return values[mask], new_offsets
+
+def sort(values, offsets):
+    """
+    Sorts the values of each group separately.
+    """
+    # complex numbers sort by real then imaginary part, so this orders by
+    # group then value in a single sort (much quicker than lexsort)
+    return np.sort(group_ids(offsets) + 1j * values).imag
+
+def medians(values, offsets):
+    """
+    Median of each group's values, NaN for empty groups.
+    """
+    return percentiles(values, offsets, 50)
+
+def percentiles(values, offsets, q):
+    """
+    Like ``np.percentile(..., q, axis=0)`` on each group (linear
+    interpolation), NaN for empty groups.  The result is shaped (groups,)
+    plus the shape of *q*, plus any further dimensions of *values*.
+    """
+    q = np.asarray(q, dtype=float)
+    counts = lengths(offsets)
+    has_data = counts > 0
+    position = (q.reshape(1, -1) / 100) * (counts[has_data, None] - 1)
+    low = np.floor(position).astype(int)
+    high = np.minimum(low + 1, counts[has_data, None] - 1)
+    fraction = position - low
+    low += offsets[:-1][has_data, None]
+    high += offsets[:-1][has_data, None]
+
+    columns = _columns(values)
+    result = np.full((len(counts), q.size, columns.shape[1]), np.nan)
+    for k in range(columns.shape[1]):
+        ordered = sort(columns[:, k], offsets)
+        below, above = ordered[low], ordered[high]
+        result[has_data, :, k] = below + (above - below) * fraction
+    return result.reshape((len(counts),) + q.shape + values.shape[1:])
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of per-blob analysis outputs, so re-running an analysis only
+computes what's changed
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+from six.moves import cPickle as pickle
+
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import types
+import warnings
+
+RESULT_CACHE_BYTES = 1 * 2**30 #: Default disk budget for cached outputs
+SUFFIX = '.pkl'
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def default_path():
+    """
+    Cache directory used unless another is given: ``multiworm/analytics``
+    under ``$XDG_CACHE_HOME`` (default ``~/.cache``).
+    """
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+            os.path.expanduser('~'), '.cache')
+    return pathlib.Path(root) / 'multiworm' / 'analytics'
+
+
+def fingerprint(experiment):
+    """
+    Identifies the data of *experiment*: a hash of the location, size and
+    modification time of its summary and blobs files, so it changes if any
+    of them do.
+    """
+    digest = hashlib.sha1()
+    for path in [experiment.summary_file] + sorted(experiment.blobs_files):
+        stat = path.stat()
+        digest.update('{}:{}:{}\n'.format(
+                path.resolve(), stat.st_size, stat.st_mtime).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def params_hash(params):
+    """
+    Hash of *params*, anything that serializes to JSON.
+    """
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def filters_hash(filters):
+    """
+    Hash of the blob *filters*, or ``None`` unless every one is from
+    :mod:`multiworm.filters` (or a :func:`functools.partial` of one), so
+    that pickling it captures everything deciding what it does.  Functions
+    and classes defined elsewhere pickle by name only, so an edited filter
+    couldn't be told apart from the original.
+    """
+    filters = list(filters)
+    if not all(_library_filter(f) for f in filters):
+        return None
+    try:
+        data = pickle.dumps(filters, protocol=2)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return None
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def _library_filter(f):
+    if isinstance(f, functools.partial):
+        arguments = list(f.args) + list(six.itervalues(f.keywords or {}))
+        return _library_filter(f.func) and all(
+                _library_filter(a) for a in arguments if callable(a))
+    if not isinstance(f, (type, types.FunctionType)):
+        f = type(f)
+    module = getattr(f, '__module__', None) or ''
+    return module.split('.')[0] == 'multiworm'
+
+
+class ResultCache(object):
+    """
+    Per-blob outputs stored on disk under *path* (default
+    :func:`default_path`).  Each entry is keyed by the experiment
+    fingerprint, blob ID, analyzer name and parameter hash.  The entries for
+    one experiment, analyzer and parameters share a file, so they are
+    loaded and saved in one go with :meth:`load` and :meth:`store`.
+
+    When the files take up more than *max_bytes*, the least recently used
+    files are deleted.  Errors writing to the cache only raise warnings.
+    """
+    def __init__(self, path=None, max_bytes=RESULT_CACHE_BYTES):
+        self.path = pathlib.Path(path) if path is not None else default_path()
+        self.max_bytes = max_bytes
+
+    def __repr__(self):
+        return '<ResultCache {} ({}/{} bytes)>'.format(
+                self.path, self.nbytes, self.max_bytes)
+
+    def _file(self, key):
+        return self.path / ('-'.join(key) + SUFFIX)
+
+    def _files(self):
+        if not self.path.exists():
+            return []
+        return [p for p in self.path.iterdir() if p.suffix == SUFFIX]
+
+    @property
+    def nbytes(self):
+        "Size of all the cached files"
+        return sum(p.stat().st_size for p in self._files())
+
+    def load(self, key):
+        """
+        Returns a dictionary of the outputs stored under *key*, a tuple of
+        experiment fingerprint, analyzer name and parameter hash, by blob
+        ID.  It's empty if there aren't any (or they can't be read).
+        """
+        path = self._file(key)
+        try:
+            with path.open('rb') as f:
+                entries = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError,
+                AttributeError, ImportError, IndexError, ValueError):
+            # missing, or saved by another version: start over
+            return {}
+        try:
+            os.utime(str(path), None) # mark as recently used
+        except OSError:
+            pass
+        return entries
+
+    def store(self, key, entries):
+        """
+        Saves the dictionary of outputs by blob ID, *entries*, under *key*
+        (see :meth:`load`), replacing anything there, then evicts old files
+        if the cache is too big.
+        """
+        try:
+            if not self.path.exists():
+                self.path.mkdir(parents=True)
+            fd, temp = tempfile.mkstemp(dir=str(self.path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entries, f, protocol=2)
+            _replace(temp, str(self._file(key)))
+        except (IOError, OSError) as e:
+            warnings.warn('Could not save analysis results to {}: {}'
+                          .format(self.path, e))
+            return
+        self._evict(keep=self._file(key))
+
+    def clear(self):
+        """
+        Deletes every cached file.
+        """
+        for path in self._files():
+            path.unlink()
+
+    def _evict(self, keep):
+        files = []
+        for path in self._files():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue # removed by someone else
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files, key=lambda f: f[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
@@ -12,6 +12,10 @@ from six.moves import (zip, filter, map, reduce, input, range)
 import numpy as np
 from math import factorial
 
+from ..cache import memoize
+
+KERNEL_CACHE_BYTES = 8 * 2**20
+
 def savitzky_golay(y, window_size, order, deriv=0, rate=1):
     r"""Smooth (and optionally differentiate) data with a Savitzky-Golay filter.
     The Savitzky-Golay filter removes high frequency noise from data.
@@ -66,6 +70,21 @@ def savitzky_golay(y, window_size, order, deriv=0, rate=1):
        Cambridge University Press ISBN-13: 9780521880688
     """
 
+    m = savitzky_golay_kernel(window_size, order, deriv, rate)
+    half_window = (len(m) - 1) // 2
+    # pad the signal at the extremes with
+    # values taken from the signal itself
+    firstvals = y[0] - np.abs( y[1:half_window+1][::-1] - y[0] )
+    lastvals = y[-1] + np.abs(y[-half_window-1:-1][::-1] - y[-1])
+    y = np.concatenate((firstvals, y, lastvals))
+    return np.convolve( m[::-1], y, mode='valid')
+
+@memoize(KERNEL_CACHE_BYTES)
+def savitzky_golay_kernel(window_size, order, deriv=0, rate=1):
+    """
+    Returns the coefficients :func:`savitzky_golay` convolves the (padded)
+    signal with, reversed.  Results are cached (and read-only).
+    """
     try:
         window_size = np.abs(np.int(window_size))
         order = np.abs(np.int(order))
@@ -79,13 +98,7 @@ def savitzky_golay(y, window_size, order, deriv=0, rate=1):
     half_window = (window_size -1) // 2
     # precompute coefficients
     b = np.mat([[k**i for i in order_range] for k in range(-half_window, half_window+1)])
-    m = np.linalg.pinv(b).A[deriv] * rate**deriv * factorial(deriv)
-    # pad the signal at the extremes with
-    # values taken from the signal itself
-    firstvals = y[0] - np.abs( y[1:half_window+1][::-1] - y[0] )
-    lastvals = y[-1] + np.abs(y[-half_window-1:-1][::-1] - y[-1])
-    y = np.concatenate((firstvals, y, lastvals))
-    return np.convolve( m[::-1], y, mode='valid')
+    return np.linalg.pinv(b).A[deriv] * rate**deriv * factorial(deriv)
 
 def main():
     t = np.linspace(-4, 4, 500)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Mergeable quantile sketches, to estimate percentiles of more values than
+can be kept in memory
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import numpy as np
+
+COMPRESSION = 200 #: Default t-digest compression (twice the most centroids)
+BUFFER_FACTOR = 20 # buffered values per unit of compression before merging
+
+
+class TDigest(object):
+    """
+    A merging t-digest [Dunning]_: a sorted set of weighted centroids
+    summarizing the distribution of the values added, with few, small
+    centroids in the tails so extreme quantiles stay accurate.  There are
+    at most about half of *compression* centroids, which trades size for
+    accuracy.
+
+    Values are buffered and merged into the centroids in vectorized
+    batches.  Digests combine with :meth:`merge` and round-trip through
+    :meth:`to_dict`/:meth:`from_dict` (plain JSON-compatible types), so
+    pieces built separately can be brought together later.  Adding the
+    same values in the same order always gives the same digest.
+
+    .. [Dunning] T. Dunning and O. Ertl, "Computing Extremely Accurate
+       Quantiles Using t-Digests" (2019)
+    """
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+        self._buffer = []
+        self._buffered = 0
+
+    def __len__(self):
+        "Number of centroids (after merging any buffered values)"
+        self._compress()
+        return len(self.means)
+
+    @property
+    def count(self):
+        "Total weight of the values added"
+        return self.weights.sum() + sum(w.sum() for _, w in self._buffer)
+
+    def add(self, values, weights=None):
+        """
+        Adds an array of *values* (non-finite values are ignored), each
+        with weight 1 unless *weights* are given.
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        if weights is None:
+            weights = np.ones_like(values)
+        else:
+            weights = np.broadcast_to(np.asarray(weights, dtype=float),
+                                      values.shape)
+        keep = np.isfinite(values) & (weights > 0)
+        if not keep.all():
+            values, weights = values[keep], weights[keep]
+        if not len(values):
+            return
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._buffer.append((values, weights))
+        self._buffered += len(values)
+        if self._buffered >= BUFFER_FACTOR * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        """
+        Adds everything summarized by the digest *other* to this one.
+        """
+        other._compress()
+        if not len(other.means):
+            return
+        self.add(other.means, other.weights)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means] + [v for v, _ in self._buffer])
+        weights = np.concatenate([self.weights] + [w for _, w in self._buffer])
+        self._buffer, self._buffered = [], 0
+
+        order = np.argsort(means, kind='mergesort')
+        means, weights = means[order], weights[order]
+
+        # every centroid may span at most one unit of the scale function
+        # k(q) = compression / 2pi * asin(2q - 1), so group by the unit each
+        # one starts in
+        total = weights.sum()
+        start = (np.cumsum(weights) - weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * start - 1)
+        _, group = np.unique(np.floor(k), return_inverse=True)
+
+        self.weights = np.bincount(group, weights=weights)
+        self.means = (np.bincount(group, weights=means * weights) /
+                      self.weights)
+
+    def quantile(self, q):
+        """
+        Estimated quantiles (0-1) *q* of the values added, NaN if there
+        aren't any.
+        """
+        self._compress()
+        q = np.asarray(q, dtype=float)
+        if not len(self.means):
+            return np.full(q.shape, np.nan)
+
+        # each centroid's mean is taken to be its middle rank, with the
+        # extremes at either end
+        total = self.weights.sum()
+        ranks = np.cumsum(self.weights) - self.weights / 2
+        return np.interp(q * total, np.r_[0, ranks, total],
+                         np.r_[self.min, self.means, self.max])
+
+    def percentile(self, q):
+        """
+        Like :meth:`quantile` with *q* from 0 to 100.
+        """
+        return self.quantile(np.asarray(q, dtype=float) / 100)
+
+    def to_dict(self):
+        """
+        Returns the state of the digest as a dictionary of numbers and lists.
+        """
+        self._compress()
+        return {
+            'compression': self.compression,
+            'means': self.means.tolist(),
+            'weights': self.weights.tolist(),
+            'min': float(self.min) if len(self.means) else None,
+            'max': float(self.max) if len(self.means) else None,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Rebuilds a digest from the output of :meth:`to_dict`.
+        """
+        digest = cls(state['compression'])
+        digest.means = np.asarray(state['means'], dtype=float)
+        digest.weights = np.asarray(state['weights'], dtype=float)
+        if len(digest.means):
+            digest.min, digest.max = state['min'], state['max']
+        return digest
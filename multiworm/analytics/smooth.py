@@ -7,7 +7,9 @@ from six.moves import zip, range, map
 import numpy as np
 import scipy.signal as ss
 
-from .sgolay import savitzky_golay
+from ..cache import memoize
+from .sgolay import savitzky_golay, savitzky_golay_kernel, KERNEL_CACHE_BYTES
+from . import ragged
 
 # Filters that are included in scipy.signal
 BASE_METHODS = [
@@ -27,20 +29,119 @@ ADDITIONAL_METHODS = {
 }
 METHODS = BASE_METHODS + list(six.iterkeys(ADDITIONAL_METHODS))
 
-def smooth(method, series, winlen, *params):
-    if method in ADDITIONAL_METHODS:
-        return ADDITIONAL_METHODS[method](series, winlen, *params)
+def kernel(method, winlen, *params, **kwargs):
+    """
+    Returns the coefficients to convolve a series with to smooth it like
+    :func:`smooth`, from a cache shared by every caller (so don't modify
+    them).  For ``'sgolay'``, a *deriv* keyword argument selects the
+    derivative to compute.
+    """
+    params = tuple(int(x) for x in params)
+    if method == 'sgolay':
+        order, = params
+        deriv = kwargs.get('deriv', 0)
+        return savitzky_golay_kernel(int(winlen), order, deriv, 1)[::-1]
+    return fir_kernel(method, int(winlen), *params)
 
+@memoize(KERNEL_CACHE_BYTES)
+def fir_kernel(method, winlen, *params):
+    """
+    Returns the normalized FIR window used by :func:`smooth` for one of
+    :data:`BASE_METHODS`.  Results are cached (and read-only).
+    """
     winlen = int(winlen) // 2 * 2 + 1 # make it odd, rounding up
-    half_win = winlen // 2 # ignoring the 0.5 remainder
     wintype = (method,) + tuple(int(x) for x in params)
     try:
         fir_win = ss.get_window(wintype, winlen)
     except ValueError:
         raise ValueError('Unrecognized smoothing type')
 
-    b = fir_win / sum(fir_win)
+    return fir_win / sum(fir_win)
+
+def smooth(method, series, winlen, *params):
+    if method in ADDITIONAL_METHODS:
+        return ADDITIONAL_METHODS[method](series, winlen, *params)
+
+    b = kernel(method, winlen, *params)
     a = [1]
     #zi = ss.lfiltic(b, a)
     #zi = series[0] * np.ones(len(b) - 1)
-    return ss.lfilter(b, a, series)[winlen-1:]
+    return ss.lfilter(b, a, series)[len(b)-1:]
+
+def smooth_many(method, values, offsets, winlen, *params):
+    """
+    Equivalent to calling :func:`smooth` on each segment of the ragged
+    array *values* (see :mod:`.ragged`), but convolving all of them at
+    once.  Columns of 2D *values* are smoothed separately.  Returns the
+    smoothed values and their offsets.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim > 1:
+        columns = [smooth_many(method, values[:, k], offsets, winlen, *params)
+                   for k in range(values.shape[1])]
+        return np.column_stack([c[0] for c in columns]), columns[0][1]
+
+    if method == 'sgolay':
+        return _sgolay_many(values, offsets, winlen, *params)
+    if method in ADDITIONAL_METHODS:
+        return ragged.concatenate(smooth(method, segment, winlen, *params)
+                for segment in ragged.split(values, offsets))
+
+    b = kernel(method, winlen, *params)
+    kept = np.maximum(ragged.lengths(offsets) - len(b) + 1, 0)
+    if len(values) < len(b):
+        return np.empty(0), _offsets(kept)
+    # keep only the outputs whose windows lie entirely within a segment
+    convolved = np.convolve(values, b, mode='valid')
+    return convolved[_segment_indices(offsets[:-1], kept)], _offsets(kept)
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=int)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+def _segment_indices(starts, lengths):
+    """
+    Indices of the first *lengths* elements after each of *starts*.
+    """
+    offsets = _offsets(lengths)
+    within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    return np.repeat(starts, lengths) + within
+
+def _sgolay_many(values, offsets, window, order):
+    m = kernel('sgolay', window, order)
+    half = (len(m) - 1) // 2
+    lengths = ragged.lengths(offsets)
+
+    # segments too short to pad as usual get the same treatment as
+    # savitzky_golay(), whatever that might be; at least the rest are fast
+    full = lengths > half
+    n = lengths[full]
+    segments = values[np.repeat(full, lengths)]
+    starts = _offsets(n)[:-1]
+
+    # pad both ends of every segment like savitzky_golay()
+    padded_offsets = _offsets(n + 2 * half)
+    owner = np.repeat(np.arange(len(n)), n + 2 * half)
+    pos = np.arange(padded_offsets[-1]) - padded_offsets[owner]
+    seg_n, seg_start = n[owner], starts[owner]
+    head, tail = pos < half, pos >= half + seg_n
+    source = np.where(head, half - pos, np.where(tail,
+            seg_n - 2 - (pos - half - seg_n), pos - half))
+    padded = segments[seg_start + source]
+    first = segments[seg_start]
+    last = segments[seg_start + seg_n - 1]
+    padded = np.where(head, first - np.abs(padded - first), padded)
+    padded = np.where(tail, last + np.abs(padded - last), padded)
+
+    smoothed = np.empty(0)
+    if len(padded):
+        convolved = np.convolve(padded, m, mode='valid')
+        smoothed = convolved[_segment_indices(padded_offsets[:-1], n)]
+    if np.all(full):
+        return smoothed, offsets
+
+    pieces = ragged.split(smoothed, _offsets(n))[::-1]
+    return ragged.concatenate(pieces.pop() if is_full else
+            (sgolay(segment, window, order) if len(segment) else [])
+            for is_full, segment in zip(full, ragged.split(values, offsets)))
@@ -7,44 +7,183 @@ from __future__ import (
 import six
 from six.moves import (zip, filter, map, reduce, input, range)
 
-import functools
-
 import numpy as np
 
 from .analytics import AnalysisMethod
-from .smooth import smooth
+from .smooth import smooth, smooth_many
+from .sketch import TDigest, COMPRESSION
+from . import ragged
 
 SUBSAMPLE = 1
+BATCH_BLOBS = 1000
 
-class SpeedEstimator(AnalysisMethod):
+def batch_speeds(centroids, offsets, smoothing):
     """
-    Attempt to determine the amount of noise present in some worm recordings.
+    Returns the frame-by-frame speeds of many blobs at once (a ragged array
+    of their centroids, see :mod:`.ragged`) after *smoothing*, a tuple of
+    method, window and any parameters for :func:`.smooth.smooth_many`, as
+    a ragged array of speeds.
     """
-    def __init__(self, percentiles, smoothing):
+    method, window = smoothing[:2]
+    xy, offsets = smooth_many(method, centroids, offsets, window,
+                              *smoothing[2:])
+    if SUBSAMPLE != 1:
+        position = (np.arange(len(xy)) -
+                    offsets[ragged.group_ids(offsets)])
+        xy, offsets = ragged.select(xy, offsets, position % SUBSAMPLE == 0)
+
+    dxy, offsets = ragged.diff(xy.reshape(-1, 2), offsets)
+    return np.hypot(dxy[:, 0], dxy[:, 1]), offsets
+
+def _smoothing(smoothing):
+    method, window = smoothing[:2]
+    if len(smoothing) <= 2:
+        params = ()
+    else:
+        params = smoothing[2:]
+    return (method, window) + tuple(params)
 
-        method, window = smoothing[:2]
-        if len(smoothing) <= 2:
-            params = ()
-        else:
-            params = smoothing[2:]
+def _concatenate(centroids):
+    return ragged.concatenate(
+            np.asarray(c, dtype=float).reshape(-1, 2) for c in centroids)
+
+class SpeedEstimator(AnalysisMethod):
+    """
+    Attempt to determine the amount of noise present in some worm recordings.
 
-        #self.smoother = functools.partial(smooth, method, winlen=window, params=params)
-        self.smoother = lambda series: smooth(method, series, window, *params)
+    Blobs are processed *batch_size* at a time, smoothing and finding the
+    speed percentiles of all of them at once with :meth:`process_batch`.
+    """
+    def __init__(self, percentiles, smoothing, batch_size=BATCH_BLOBS):
+        self.smoothing = _smoothing(smoothing)
         self.percentiles = percentiles
+        self.batch_size = batch_size
+        self.reset()
 
+    def reset(self):
         self.speed_pctiles = []
+        self._pending = []
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        self.speed_pctiles.extend(other.speed_pctiles)
+
+    def smoother(self, series):
+        method, window = self.smoothing[:2]
+        return smooth(method, series, window, *self.smoothing[2:])
 
     def process_blob(self, blob):
-        xy = list(zip(*blob['centroid']))
-        xy_smoothed = [self.smoother(c) for c in xy]
-        dxy = np.diff(np.array(xy_smoothed)[...,::SUBSAMPLE], axis=1)
-        ds = np.linalg.norm(dxy, axis=0)
+        """
+        Queues a parsed blob to be processed with the next batch, so
+        :attr:`speed_pctiles` is only complete after calling
+        :meth:`result`.
+        """
+        self._pending.append(blob['centroid'])
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if pending:
+            self.process_batch(*_concatenate(pending))
+
+    def process_batch(self, centroids, offsets):
+        """
+        Processes many blobs at once, given as a ragged array (see
+        :mod:`.ragged`) of their centroids.  Blobs without enough frames
+        to have a speed after smoothing get NaN percentiles.
+        """
+        self.add_outputs(self._percentiles(centroids, offsets))
+
+    def cache_params(self):
+        return {
+            'percentiles': np.asarray(self.percentiles, dtype=float).tolist(),
+            'smoothing': list(self.smoothing),
+            'subsample': SUBSAMPLE,
+        }
+
+    def blob_outputs(self, blobs):
+        """
+        Returns the speed percentiles of each of *blobs*.
+        """
+        return list(self._percentiles(*_concatenate(
+                blob['centroid'] for blob in blobs)))
+
+    def add_outputs(self, outputs):
+        self.speed_pctiles.extend(outputs)
 
-        self.speed_pctiles.append(np.percentile(ds, self.percentiles))
+    def _percentiles(self, centroids, offsets):
+        ds, offsets = batch_speeds(centroids, offsets, self.smoothing)
+        return ragged.percentiles(ds, offsets, self.percentiles)
 
     def result(self):
+        self.flush()
         data = {
             'percentiles': self.speed_pctiles,
         }
 
         return {'speed': data}
+
+
+class SpeedSketch(AnalysisMethod):
+    """
+    Estimates *percentiles* of the frame-by-frame speeds (smoothed as for
+    :class:`SpeedEstimator`) pooled over every blob, in bounded memory,
+    using a :class:`.sketch.TDigest` with the given *compression*.
+
+    Sketches from other shards, experiments, or runs are combined with
+    :meth:`merge`; the ``'digest'`` in the result can be rebuilt with
+    :meth:`from_result` to merge saved results.
+    """
+    def __init__(self, percentiles, smoothing, compression=COMPRESSION,
+            batch_size=BATCH_BLOBS):
+        self.smoothing = _smoothing(smoothing)
+        self.percentiles = percentiles
+        self.compression = compression
+        self.batch_size = batch_size
+        self.reset()
+
+    def reset(self):
+        self.digest = TDigest(self.compression)
+        self._pending = []
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        self.digest.merge(other.digest)
+
+    def process_blob(self, blob):
+        self._pending.append(blob['centroid'])
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if pending:
+            ds, _ = batch_speeds(*_concatenate(pending),
+                                 smoothing=self.smoothing)
+            self.digest.add(ds)
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Rebuilds a sketch from the output of :meth:`result`.
+        """
+        data = result['speed_sketch']
+        sketch = cls(data['percentiles'], data['smoothing'],
+                     data['digest']['compression'])
+        sketch.digest = TDigest.from_dict(data['digest'])
+        return sketch
+
+    def result(self):
+        self.flush()
+        data = {
+            'percentiles': self.percentiles,
+            'values': self.digest.percentile(self.percentiles).tolist(),
+            'smoothing': list(self.smoothing),
+            'count': self.digest.count,
+            'digest': self.digest.to_dict(),
+        }
+
+        return {'speed_sketch': data}
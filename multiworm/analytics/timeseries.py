@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Population measures over the course of an experiment, frame by frame
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from ..core import MWTDataError
+from .analytics import AnalysisMethod, ExperimentAnalyzer, SHARD_BLOBS
+from . import ragged
+
+BATCH_BLOBS = 1000
+COLUMNS = ('time', 'worms', 'mean_speed', 'mean_area')
+
+
+class PlateTimeSeries(AnalysisMethod):
+    """
+    Accumulates, for every frame of an experiment with *frame_times* (as
+    :attr:`.Experiment.frame_times`), the number of blobs tracked, their
+    mean speed (in pixels per second, from the step since each blob's
+    previous frame), and their mean area.
+
+    Blobs are added *batch_size* at a time into running per-frame sums
+    and counts with :func:`numpy.bincount`, so the state is a few arrays
+    as long as the experiment no matter how many blobs there are.
+    Instances from :meth:`spawn` (the partials analyzed in shards) only
+    know how many frames there are, and their arrays only cover the
+    frames of the blobs they're given, starting from :attr:`first`.
+    Once flushed (as shards are before being sent back) they're about as
+    big as those frames, not the blobs; merge them into one with the
+    frame times to get a :meth:`table`.
+    """
+    _ARRAYS = [('worms', int), ('area_sums', float), ('step_sums', float),
+               ('step_counts', int)]
+
+    def __init__(self, frame_times, batch_size=BATCH_BLOBS):
+        self.frame_times = np.asarray(frame_times, dtype=float)
+        self.n_frames = len(self.frame_times)
+        self.batch_size = batch_size
+        self.reset()
+
+    def reset(self):
+        # per-frame sums from index self.first; the distances of steps to
+        # the next frame are summed there and divided by the time between
+        # frames at the end, those over gaps in tracking are kept apart
+        self.first = 0
+        for name, dtype in self._ARRAYS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self._gap_steps = []
+        self._pending = []
+        if self.frame_times is not None:
+            self._cover(0, self.n_frames)
+
+    def spawn(self):
+        clone = copy.copy(self)
+        clone.frame_times = None
+        clone.reset()
+        return clone
+
+    def _cover(self, start, stop):
+        """
+        Extends the per-frame arrays to cover frame indices *start* up to
+        *stop*.
+        """
+        end = self.first + len(self.worms)
+        if len(self.worms):
+            start, stop = min(start, self.first), max(stop, end)
+        if (start, stop) == (self.first, end):
+            return
+
+        for name, dtype in self._ARRAYS:
+            array = np.zeros(stop - start, dtype=dtype)
+            old = getattr(self, name)
+            array[self.first - start:self.first - start + len(old)] = old
+            setattr(self, name, array)
+        self.first = start
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        if len(other.worms):
+            self._cover(other.first, other.first + len(other.worms))
+            within = slice(other.first - self.first,
+                           other.first - self.first + len(other.worms))
+            for name, _ in self._ARRAYS:
+                getattr(self, name)[within] += getattr(other, name)
+        self._gap_steps.extend(other._gap_steps)
+
+    def process_blob(self, blob):
+        if blob is None:
+            return
+
+        self._pending.append(blob)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if pending:
+            self.process_batch(
+                *ragged.concatenate(b['frame'] for b in pending),
+                areas=np.concatenate([b['area'] for b in pending]),
+                centroids=ragged.concatenate(
+                    np.asarray(b['centroid'], dtype=float).reshape(-1, 2)
+                    for b in pending)[0])
+
+    def process_batch(self, frames, offsets, areas, centroids):
+        """
+        Adds many blobs at once, given as a ragged array (see
+        :mod:`.ragged`) of their frame numbers, with the matching *areas*
+        and *centroids* (shaped (frames, 2)) sharing the same *offsets*.
+        """
+        n = self.n_frames
+        index = frames.astype(int) - 1
+        if not len(index):
+            return
+        if index.min() < 0 or index.max() >= n:
+            raise MWTDataError('Blob data in frames {:.0f}-{:.0f} beyond the '
+                    '{} frames of the experiment'
+                    .format(frames.min(), frames.max(), n))
+
+        self._cover(index.min(), index.max() + 1)
+        local = index - self.first
+        size = len(self.worms)
+        self.worms += np.bincount(local, minlength=size)
+        self.area_sums += np.bincount(local, weights=areas, minlength=size)
+
+        # only steps within a blob count; each goes to its later frame
+        dxy, _ = ragged.diff(centroids, offsets)
+        gaps, _ = ragged.diff(index, offsets)
+        later = np.ones(len(index), dtype=bool)
+        later[offsets[:-1][ragged.lengths(offsets) > 0]] = False
+        step_index = index[later]
+        distances = np.hypot(dxy[:, 0], dxy[:, 1])
+        valid = np.isfinite(distances)
+
+        adjacent = valid & (gaps == 1)
+        self.step_sums += np.bincount(local[later][adjacent],
+                weights=distances[adjacent], minlength=size)
+        self.step_counts += np.bincount(local[later][adjacent],
+                                        minlength=size)
+        apart = valid & (gaps != 1)
+        if apart.any():
+            self._gap_steps.append((step_index[apart], gaps[apart],
+                                    distances[apart]))
+
+    def _speeds(self):
+        """
+        Per-frame sums and counts of the speeds of every step.
+        """
+        if self.frame_times is None:
+            raise ValueError('a spawned partial has no frame times; merge '
+                             'it into the instance it was spawned from')
+        times = self.frame_times
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dt = np.append(np.nan, np.diff(times))
+            speed_sums = self.step_sums / dt
+            # as if each step was divided separately, a frame with no
+            # time since the last has no valid speeds
+            ok = np.isfinite(speed_sums)
+            speed_sums[~ok] = 0
+            speed_counts = np.where(ok, self.step_counts, 0)
+
+            if self._gap_steps:
+                index, gaps, distances = (np.concatenate(c)
+                                          for c in zip(*self._gap_steps))
+                speeds = distances / (times[index] - times[index - gaps])
+                valid = np.isfinite(speeds)
+                speed_sums += np.bincount(index[valid], weights=speeds[valid],
+                                          minlength=self.n_frames)
+                speed_counts += np.bincount(index[valid],
+                                            minlength=self.n_frames)
+        return speed_sums, speed_counts
+
+    def table(self):
+        """
+        Returns a data frame, indexed by frame number (from 1), of the
+        :data:`COLUMNS` for every frame.  Means are NaN for frames without
+        any data.
+        """
+        self.flush()
+        speed_sums, speed_counts = self._speeds()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table = pd.DataFrame({
+                'time': self.frame_times,
+                'worms': self.worms,
+                'mean_speed': speed_sums / speed_counts,
+                'mean_area': self.area_sums / self.worms,
+            }, index=pd.RangeIndex(1, len(self.frame_times) + 1, name='frame'),
+            columns=COLUMNS)
+        return table
+
+    def result(self):
+        table = self.table()
+        data = dict((column, table[column].tolist()) for column in COLUMNS)
+        return {'timeseries': data}
+
+
+def plate_timeseries(experiment, workers=None, shard_size=SHARD_BLOBS,
+        executor='process'):
+    """
+    Returns the :meth:`PlateTimeSeries.table` of the good blobs of
+    *experiment*, computed in shards of blobs by *workers* (see
+    :meth:`.ExperimentAnalyzer.analyze_experiment`).
+    """
+    experiment.load_summary()
+    method = PlateTimeSeries(experiment.frame_times)
+    analyzer = ExperimentAnalyzer()
+    analyzer.add_analysis_method(method)
+    analyzer.analyze_experiment(experiment, workers=workers,
+                                shard_size=shard_size, executor=executor)
+    return method.table()
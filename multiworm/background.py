@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Estimation of the plate background from the images of an experiment
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import numpy as np
+
+from .core import MWTDataError
+from .readers import image
+from .util import bounded_map
+
+BACKGROUND_BYTES = 256 * 2**20 #: Default memory budget for the image data
+SUFFIX = '.background.npy'
+
+
+def estimate(paths, reader=image.read, max_bytes=BACKGROUND_BYTES,
+        workers=None, executor='thread'):
+    """
+    Returns the per-pixel median of the images at *paths*, decoded with
+    *reader*.
+
+    Only a band of rows from every image is held at once, as many rows as
+    fit in *max_bytes*, so if all the images don't fit, each band takes
+    another pass decoding them.  Images are decoded by *workers* (see
+    :func:`.util.bounded_map`, though the default *executor* here is
+    threads) which only send back the band being worked on.
+    """
+    paths = list(paths)
+    if not paths:
+        raise ValueError('no images to estimate the background from')
+
+    first = np.asarray(reader(paths[0]))
+    shape, dtype = first.shape, first.dtype
+    row_bytes = len(paths) * dtype.itemsize * int(np.prod(shape[1:]))
+    band = int(min(shape[0], max(1, max_bytes // row_bytes)))
+
+    background = np.empty(shape)
+    stack = np.empty((len(paths), band) + shape[1:], dtype=dtype)
+    for start in range(0, shape[0], band):
+        stop = min(start + band, shape[0])
+        tasks = ((i, path, reader, shape, start, stop)
+                 for i, path in enumerate(paths))
+        if workers:
+            results = bounded_map(_read_band, tasks, workers=workers,
+                    ordered=False, executor=executor)
+        else:
+            results = map(_read_band, tasks)
+
+        rows = stack[:, :stop - start]
+        for i, data in results:
+            rows[i] = data
+        # rows is a view of the stack that's filled again next pass anyway
+        background[start:stop] = np.median(rows, axis=0, overwrite_input=True)
+
+    return background
+
+
+def _read_band(task):
+    i, path, reader, shape, start, stop = task
+    data = np.asarray(reader(path))
+    if data.shape != shape:
+        raise MWTDataError('Image {} is {}, not {} like the others'
+                           .format(path, data.shape, shape))
+    return i, data[start:stop]
+
+
+def cache_path(experiment):
+    """
+    Location of the background saved for *experiment*, next to its summary
+    file.
+    """
+    return experiment.summary_file.with_name(experiment.basename + SUFFIX)
+
+
+def read(experiment):
+    """
+    Returns the background saved for *experiment*, or ``None`` if there
+    isn't one or it's older than any of the images.
+    """
+    path = cache_path(experiment)
+    if not path.exists():
+        return None
+
+    newest = max(p.stat().st_mtime for p in experiment.image_files.values())
+    if path.stat().st_mtime < newest:
+        return None
+    return np.load(str(path))
+
+
+def write(experiment, background):
+    """
+    Saves *background* for *experiment* (see :func:`cache_path`).
+    """
+    with cache_path(experiment).open('wb') as f:
+        np.save(f, background)
@@ -81,7 +81,7 @@ class Blob(collections.Mapping):
                 return []
 
             if self.blob_data is None:
-                self.blob_data = self.experiment._parse_blob(self.id)
+                self.blob_data = self.experiment._blob_data(self.id)
 
             return self.blob_data[key]
 
@@ -142,3 +142,57 @@ class Blob(collections.Mapping):
         if self.empty:
             return None
         return BlobDataFrame(dict(self.experiment[self.id]))
+
+
+class BlobView(object):
+    """
+    A lightweight, read-only alternative to :class:`Blob` that only holds a
+    reference to the *experiment*, the *blob_id*, and the *row* in the
+    experiment's compact summary records.  Summary fields (``born_f``,
+    ``died_t``, etc.) are looked up on demand and blob data is fetched
+    through the experiment's shared cache, so creating one for every blob
+    in a plate is cheap.  Get them with :meth:`.Experiment.view` or
+    :meth:`.Experiment.views`.
+    """
+    __slots__ = ('experiment', 'id', 'row')
+
+    def __init__(self, experiment, blob_id, row):
+        self.experiment = experiment
+        self.id = blob_id
+        self.row = row
+
+    def __repr__(self):
+        return '<BlobView {} of Experiment {}>'.format(
+                self.id, self.experiment.id)
+
+    def __getattr__(self, name):
+        if name not in self.__slots__:
+            records = self.experiment._summary_records
+            if name in records.dtype.names:
+                return records[name][self.row]
+        raise AttributeError(
+                "'BlobView' object has no attribute '{}'".format(name))
+
+    def __getitem__(self, key):
+        records = self.experiment._summary_records
+        if key in records.dtype.names:
+            return records[key][self.row]
+
+        if self.empty:
+            return []
+        return self.experiment._blob_data(self.id)[key]
+
+    @property
+    def empty(self):
+        """
+        Check if the blob really contains any data
+        """
+        if self.file_no == NO_DATA:
+            return True
+        return self.experiment._blob_data(self.id) is None
+
+    def blob(self, fields=None):
+        """
+        Returns a full :class:`Blob` object for this blob.
+        """
+        return Blob(self.experiment, self.id, fields)
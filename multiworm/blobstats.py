@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Per-blob statistics, computed once from the parsed blob data so decisions
+about many blobs can be made from a table instead of the blobs files.
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import numpy as np
+import pandas as pd
+
+from .readers import blob
+from .filters import _stack_midlines, _midline_lengths
+from .util import bounded_map
+
+#: Columns of the statistics table, in order
+COLUMNS = (
+    'n_frames',     # frames with data
+    'move_px',      # sum of the sides of the centroid bounding box
+    'path_px',      # distance travelled by the centroid
+    'mean_area',
+    'mean_midline', # over frames with a midline
+    'bbox_x0',      # centroid bounding box
+    'bbox_y0',
+    'bbox_x1',
+    'bbox_y1',
+)
+
+#: Column types, the same whether the table was built or read back
+DTYPES = dict((c, int if c == 'n_frames' else float) for c in COLUMNS)
+
+SUFFIX = '.blobstats.csv'
+
+
+def compute(data):
+    """
+    Returns a tuple of the statistics in :data:`COLUMNS` for the parsed
+    blob *data*, or all NaN (except `n_frames`, 0) if there isn't any.
+    """
+    if not data or not len(data['frame']):
+        return (0,) + (np.nan,) * (len(COLUMNS) - 1)
+
+    centroid = np.asarray(data['centroid'], dtype=float)
+    low, high = centroid.min(axis=0), centroid.max(axis=0)
+    steps = np.diff(centroid, axis=0)
+
+    midlines = _midline_lengths(_stack_midlines(data['midline']))
+    mean_midline = midlines.mean() if len(midlines) else np.nan
+
+    return (
+        len(centroid),
+        (high - low).sum(),
+        np.sqrt(np.einsum('ij,ij->i', steps, steps)).sum(),
+        np.mean(data['area']),
+        mean_midline,
+        low[0], low[1], high[0], high[1],
+    )
+
+
+def build(experiment, bids=None, workers=None, executor='process'):
+    """
+    Reads and parses every blob of *experiment* (or those in *bids*) once,
+    returning a data frame of their statistics indexed by blob ID.  See
+    :func:`.util.bounded_map` for *workers* and *executor*; without workers
+    it runs on the calling thread.
+    """
+    tasks = experiment._blob_locations(bids)
+    if workers:
+        rows = bounded_map(_compute_task, tasks, workers=workers,
+                           executor=executor)
+    else:
+        rows = map(_compute_task, tasks)
+
+    bids, stats = [], []
+    for bid, row in rows:
+        bids.append(bid)
+        stats.append(row)
+
+    table = pd.DataFrame.from_records(stats, index=bids, columns=COLUMNS)
+    table = table.astype(DTYPES)
+    table.index.name = experiment.summary.index.name
+    return table
+
+
+def cache_path(experiment):
+    """
+    Location of the statistics table saved for *experiment*, next to its
+    summary file.
+    """
+    return experiment.summary_file.with_name(experiment.basename + SUFFIX)
+
+
+def read(experiment):
+    """
+    Returns the statistics table saved for *experiment*, or ``None`` if
+    there isn't one or it's older than the experiment's data files.
+    """
+    path = cache_path(experiment)
+    if not path.exists():
+        return None
+
+    data_files = [experiment.summary_file] + list(experiment.blobs_files)
+    newest = max(p.stat().st_mtime for p in data_files)
+    if path.stat().st_mtime < newest:
+        return None
+
+    table = pd.read_csv(str(path), index_col=0,
+                        float_precision='round_trip')
+    if tuple(table.columns) != COLUMNS:
+        return None
+    return table.astype(DTYPES)
+
+
+def write(experiment, table):
+    """
+    Saves *table* for *experiment* (see :func:`cache_path`).
+    """
+    table.to_csv(str(cache_path(experiment)))
+
+
+def _compute_task(task):
+    bid, location = task
+    if location is None:
+        return bid, compute(None)
+    return bid, compute(blob.load(*location, bid=bid))
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Memory-bounded caching
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import collections
+import functools
+import threading
+
+import numpy as np
+
+from .util import sizeof
+
+_MISSING = object()
+
+class LRUCache(object):
+    """
+    A thread-safe mapping that evicts the least-recently used entries once
+    the total size of its values exceeds *max_bytes*.  Sizes are measured
+    with *sizeof* (default: :func:`.util.sizeof`) when a value is stored.
+
+    Keys can be pinned with :meth:`pin` to exempt them from eviction; pinned
+    values still count towards the budget.  A single value larger than the
+    budget is not stored unless it is pinned.
+    """
+    def __init__(self, max_bytes, sizeof=sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = collections.OrderedDict() # key: (value, size)
+        self._pinned = set()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getstate__(self):
+        # caches travel empty (e.g. to worker processes)
+        return {'max_bytes': self.max_bytes, 'sizeof': self.sizeof}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return '<LRUCache {} entries, {}/{} bytes>'.format(
+                len(self), self.nbytes, self.max_bytes)
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored at *key* (marking it as recently used), or
+        *default* if it isn't present.
+        """
+        with self._lock:
+            try:
+                entry = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        Stores *value* at *key*, evicting older entries as needed.
+        """
+        size = self.sizeof(value)
+        with self._lock:
+            self.discard(key)
+            if size > self.max_bytes and key not in self._pinned:
+                return
+            self._entries[key] = value, size
+            self.nbytes += size
+            self._evict()
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the value at *key*, calling *loader* (with no arguments) to
+        create and store it on a miss.  *loader* runs outside the lock, so
+        concurrent misses on the same key may both load it.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def discard(self, key):
+        """
+        Removes *key* if it's present.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
+
+    def clear(self):
+        """
+        Removes all entries (pins are retained).
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def pin(self, key):
+        """
+        Prevents *key* from being evicted, whether or not it's currently
+        stored.
+        """
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key):
+        """
+        Allows *key* to be evicted again.
+        """
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict()
+
+    def stats(self):
+        """
+        Returns a dictionary of hit/miss/eviction counters and sizes.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'pinned': len(self._pinned),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _evict(self):
+        if self.nbytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if key in self._pinned:
+                continue
+            self.nbytes -= self._entries.pop(key)[1]
+            self.evictions += 1
+            if self.nbytes <= self.max_bytes:
+                break
+
+
+def memoize(max_bytes, sizeof=sizeof):
+    """
+    Decorator that caches the results of a function by its arguments (which
+    must be hashable) in an :class:`LRUCache` of *max_bytes*, available as
+    the `cache` attribute of the decorated function.  Returned Numpy arrays
+    are made read-only, as they're shared by every caller.
+    """
+    def decorator(function):
+        cache = LRUCache(max_bytes, sizeof)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = args, tuple(sorted(six.iteritems(kwargs)))
+            return cache.get_or_load(key,
+                    lambda: _read_only(function(*args, **kwargs)))
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+def _read_only(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
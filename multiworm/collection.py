@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Handles data from many Multi-Worm Tracker experiments at once
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import collections
+import copy
+
+from .experiment import Experiment
+from .readers import blob
+from .util import get_executor, bounded_map
+
+
+class ExperimentCollection(object):
+    """
+    A group of :class:`.Experiment` objects, opened concurrently from the
+    iterable of directories *paths* (e.g. as resolved by ``where.py``) with
+    their summary files parsed in a pool of *workers*.  The same pool is
+    then shared by :meth:`map`, :meth:`filter`, and :meth:`reduce` to work
+    on the blobs of every experiment at once.
+
+    *executor* is ``'process'`` (default), ``'thread'``, or an existing
+    :class:`concurrent.futures.Executor`.  Functions given to the query
+    methods must be picklable (e.g. defined at module level) when using
+    processes.
+
+    Experiments are available by ID from :attr:`experiments`, in the order
+    they were provided.  Use as a context manager or call :meth:`close` to
+    shut down the pool.
+    """
+    def __init__(self, paths, workers=None, executor='process'):
+        self.pool, self._owned = get_executor(executor, workers)
+        self.workers = workers
+
+        self.experiments = collections.OrderedDict()
+        try:
+            for experiment in self.pool.map(_open_experiment, paths):
+                if experiment.id in self.experiments:
+                    raise ValueError("Duplicate experiment ID '{}'"
+                                     .format(experiment.id))
+                self.experiments[experiment.id] = experiment
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.experiments)
+
+    def __iter__(self):
+        return iter(self.experiments)
+
+    def __getitem__(self, experiment_id):
+        return self.experiments[experiment_id]
+
+    def close(self):
+        """
+        Shuts down the worker pool if this collection created it.
+        """
+        if self._owned:
+            self.pool.shutdown(wait=True)
+
+    def map(self, function, summary_filter=None):
+        """
+        Calls *function* with the parsed data of every blob that has any, and
+        returns the results in a dictionary of dictionaries, keyed first by
+        experiment ID and then by blob ID.
+
+        If provided, *summary_filter* (see :mod:`.filters`) limits the
+        blobs considered in each experiment.
+        """
+        results = self._empty_results(collections.OrderedDict)
+        for eid, bid, value in self._apply(function, summary_filter):
+            results[eid][bid] = value
+        return results
+
+    def filter(self, predicate, summary_filter=None):
+        """
+        Returns a dictionary, keyed by experiment ID, of lists of the blob
+        IDs that *predicate* accepts.
+        """
+        results = self._empty_results(list)
+        for eid, bid, accept in self._apply(predicate, summary_filter):
+            if accept:
+                results[eid].append(bid)
+        return results
+
+    def reduce(self, function, mapper, initial, summary_filter=None):
+        """
+        Folds the output of *mapper* on every blob into one value for each
+        experiment using *function* (as the builtin reduce(), starting with
+        a copy of *initial*), returning a dictionary keyed by experiment ID.
+        Only *mapper* runs in the pool; the fold happens here in blob order.
+        """
+        results = self._empty_results(lambda: copy.deepcopy(initial))
+        for eid, bid, value in self._apply(mapper, summary_filter):
+            results[eid] = function(results[eid], value)
+        return results
+
+    def _empty_results(self, factory):
+        return collections.OrderedDict(
+                (eid, factory()) for eid in self.experiments)
+
+    def _tasks(self, function, summary_filter):
+        for eid, experiment in six.iteritems(self.experiments):
+            bids = None
+            if summary_filter is not None:
+                bids = summary_filter(experiment.summary).index
+            for bid, location in experiment._blob_locations(bids):
+                if location is not None:
+                    yield function, eid, bid, location
+
+    def _apply(self, function, summary_filter):
+        results = bounded_map(_apply_to_blob,
+                self._tasks(function, summary_filter),
+                workers=self.workers, executor=self.pool)
+        return (r for r in results if r is not None)
+
+
+def _open_experiment(path):
+    return Experiment(path)
+
+def _apply_to_blob(task):
+    function, eid, bid, location = task
+    data = blob.load(*location, bid=bid)
+    if data is None:
+        return None
+    return eid, bid, function(data)
@@ -11,16 +11,27 @@ from six.moves import (zip, filter, map, reduce, input, range)
 import pathlib
 import warnings
 
+import numpy as np
+import pandas as pd
+
 from .core import MWTDataError
 from .readers import blob, summary, image
-from .util import multifilter, multitransform
-from .filters import exists_in_frame
-from .blob import Blob
+from . import blobstats
+from . import background as bg
+from .readers.summary import NO_DATA
+from .util import (multifilter, multitransform, bounded_map, lazyprop,
+        LAZY_PREFIX)
+from .filters import exists_in_frame, summary_mask, StreamingFilter, screen
+from .blob import Blob, BlobView
+from .cache import LRUCache
+from .stream import BlobStream
 
 PROGRESS_SUMMARY_LOAD_START = 0.1
 PROGRESS_EXP_DURATION_PAD = 1.05
 PROGRESS_SUMMARY_LOAD_END = 1
 
+BLOB_CACHE_BYTES = 256 * 2**20 #: Default memory budget for parsed blob data
+
 class Experiment(object):
     """
     Provides interfaces for Multi-Worm Tracker experiment data.
@@ -31,10 +42,22 @@ class Experiment(object):
 
     Next, pass filter functions to :func:`add_summary_filter` and/or
     :func:`add_filter`.  Then call :func:`load_summary` to index the location
-    of all possible good blobs.
+    of all possible good blobs, and iterate through them with
+    :func:`good_blobs`.  Filters can be added at any time; the index is
+    rebuilt when needed.
+
+    Parsed blob data is kept in :attr:`blob_cache`, a :class:`.LRUCache`
+    limited to *cache_bytes* and shared by all :class:`Blob` objects from
+    this experiment.
     """
-    def __init__(self, fullpath=None, experiment_id=None, data_root='', callback=None):
+    def __init__(self, fullpath=None, experiment_id=None, data_root='',
+            callback=None, cache_bytes=BLOB_CACHE_BYTES):
         self._pcb = callback
+        self.blob_cache = LRUCache(cache_bytes)
+        self.summary_filters = []
+        self.filters = []
+        self._good_summary = None
+        self._good_done = 0
         self._progress(0)
 
         if fullpath:
@@ -60,6 +83,8 @@ class Experiment(object):
         self._find_images()
 
         self.summary = None
+        self.blob_stats = None
+        self._background = None
 
         self._progress(PROGRESS_SUMMARY_LOAD_START)
         self._load_summary()
@@ -67,19 +92,260 @@ class Experiment(object):
         self.n_blobs = len(self.summary)
         self._progress(1)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pcb'] = None
+        state['graph'] = self.graph.copy() # the frozen graph can't pickle
+        return state
+
+    def __setstate__(self, state):
+        state['graph'] = summary.lock_graph(state['graph'])
+        self.__dict__.update(state)
+
     def __iter__(self):
         return iter(self.summary.index)
 
     def __len__(self):
         return self.n_blobs
 
-    def blobs(self):
-        for blob_id in self:
-            yield blob_id, self[blob_id]
+    def blobs(self, bids=None, workers=None, ordered=True, prefetch=None,
+            executor='process'):
+        """
+        Generator that yields blob IDs and their :class:`Blob` objects for
+        all blobs, or only those in *bids* if provided.
+
+        If *workers* is provided, blobs are read and parsed ahead of the
+        consumer by a pool, otherwise they are parsed lazily on the calling
+        thread when first indexed.  See :func:`.util.bounded_map` for the
+        meaning of *ordered*, *prefetch*, and *executor*.
+        """
+        if not workers:
+            for blob_id in (self if bids is None else bids):
+                yield blob_id, self[blob_id]
+            return
+
+        tasks = self._blob_locations(bids)
+        for bid, data in bounded_map(_load_blob, tasks, workers=workers,
+                ordered=ordered, prefetch=prefetch, executor=executor):
+            yield bid, self._preloaded_blob(bid, data)
 
     def __getitem__(self, key):
         return Blob(self, key)
 
+    def add_summary_filter(self, f):
+        """
+        Adds a filter that will be called with the entire summary data frame
+        (see :mod:`.filters`) and should return either a boolean mask of the
+        rows to keep, or only the rows to keep.
+        """
+        self.summary_filters.append(f)
+        self._good_summary = None
+
+    def add_filter(self, f):
+        """
+        Adds a filter that will be called with the parsed data of each blob
+        passing the summary filters, and should return whether to keep it.
+        """
+        self.filters.append(f)
+
+    def load_summary(self):
+        """
+        Indexes the blobs that pass all summary filters.  The filters are
+        all evaluated on the full summary data and combined into a single
+        mask before any blobs file is read.
+        """
+        if self._good_summary is None:
+            mask = summary_mask(self.summary_filters, self.summary)
+            self._good_summary = self.summary[mask]
+
+    def load_blob_stats(self, bids=None, workers=None, executor='process',
+            cache=True):
+        """
+        Adds per-blob statistics (see :data:`.blobstats.COLUMNS`) as columns
+        of :attr:`summary`, so blobs can be filtered on them with
+        :func:`add_summary_filter` without reading the blobs files again.
+        Blobs not yet computed have NaN statistics.  The table is also kept
+        as :attr:`blob_stats` and returned.
+
+        Statistics are computed for all blobs, or only those in *bids*,
+        reading the blobs files once with *workers* (see
+        :func:`.blobstats.build`).  If *cache* is true, the table is saved
+        next to the summary file and reused while it's newer than the
+        experiment data, so only blobs missing from it are computed.
+        """
+        table = self.blob_stats
+        if table is None and cache:
+            table = blobstats.read(self)
+
+        wanted = self.summary.index if bids is None else pd.Index(bids)
+        if table is None:
+            missing = wanted
+        else:
+            missing = wanted.difference(table.index)
+        if table is None or len(missing):
+            new = blobstats.build(self, missing, workers=workers,
+                                  executor=executor)
+            if table is not None:
+                # (concatenating with an empty table would make the
+                # columns objects)
+                new = pd.concat([table, new])
+            table = new.sort_index()
+            if cache:
+                try:
+                    blobstats.write(self, table)
+                except (IOError, OSError) as e:
+                    warnings.warn('Could not save blob statistics: {}'
+                                  .format(e))
+
+        self.blob_stats = table
+        self.summary = self.summary.drop(list(blobstats.COLUMNS), axis=1,
+                errors='ignore').join(table)
+        self._good_summary = None
+        self.__dict__.pop(LAZY_PREFIX + '_summary_records', None)
+        return table
+
+    @property
+    def max_blobs(self):
+        """
+        Number of blobs that pass the summary filters; an upper limit on the
+        number that :func:`good_blobs` will yield.
+        """
+        self.load_summary()
+        return len(self._good_summary)
+
+    def good_blobs(self, workers=None, ordered=True, prefetch=None,
+            executor='process'):
+        """
+        Generator that yields the blob IDs and parsed data of blobs passing
+        all summary and blob filters.  Blobs without any data are skipped.
+
+        If *workers* is provided, reading, parsing and blob filtering happen
+        in a pool (see :func:`.util.bounded_map` for the other keyword
+        arguments); with processes, the blob filters must be picklable.
+        Check how far along the iteration is with :func:`progress`.
+        """
+        self.load_summary()
+        self._good_done = 0
+
+        tasks = ((bid, location, self.filters) for bid, location
+                 in self._blob_locations(self._good_summary.index))
+        if workers:
+            results = bounded_map(load_good_blob, tasks, workers=workers,
+                    ordered=ordered, prefetch=prefetch, executor=executor)
+        else:
+            results = map(load_good_blob, tasks)
+
+        for bid, data in results:
+            self._good_done += 1
+            if data is not None:
+                yield bid, data
+            data = None
+
+    def progress(self):
+        """
+        Returns how many blobs :func:`good_blobs` has checked so far and how
+        many it will check in total.
+        """
+        return self._good_done, self.max_blobs
+
+    def stream(self, bids=None, callback=None, memory_limit=None):
+        """
+        Returns a :class:`.BlobStream` that yields blob IDs and parsed data
+        while holding no more than one blob in memory.  See there for the
+        keyword arguments.
+        """
+        return BlobStream(self, bids, callback=callback,
+                          memory_limit=memory_limit)
+
+    def view(self, bid):
+        """
+        Returns a lightweight :class:`.BlobView` of blob *bid*.
+        """
+        row = self._summary_row(bid)
+        return BlobView(self, self._summary_records['bid'][row], row)
+
+    def views(self):
+        """
+        Returns a list of :class:`.BlobView` objects for every blob.
+        """
+        bids = self._summary_records['bid'].tolist()
+        return [BlobView(self, bid, row) for row, bid in enumerate(bids)]
+
+    @lazyprop
+    def _summary_records(self):
+        """
+        Compact structured array of the summary data, one row per blob
+        ordered by blob ID, with the ID in the `bid` field.
+        """
+        records = self.summary.to_records(index=True)
+        records.dtype.names = ('bid',) + records.dtype.names[1:]
+        return records
+
+    def _summary_row(self, bid):
+        """
+        Row of blob *bid* in :attr:`_summary_records`.
+        """
+        bids = self._summary_records['bid']
+        row = np.searchsorted(bids, bid)
+        if row >= len(bids) or bids[row] != bid:
+            raise KeyError(bid)
+        return int(row)
+
+    def _preloaded_blob(self, bid, data):
+        """
+        Returns a :class:`Blob` with its data already parsed as *data*.
+        """
+        blob_obj = Blob(self, bid)
+        blob_obj.blob_data = data
+        setattr(blob_obj, LAZY_PREFIX + 'empty', data is None)
+        return blob_obj
+
+    def image_patches(self, bid, times, size, fill=0, workers=None,
+            executor='thread'):
+        """
+        Returns an array of image patches of *size* pixels (an int, or a
+        pair of x and y sizes) centered on blob *bid* in the images nearest
+        to each of *times*, stacked in the same order.  The centroid is
+        taken from the frame nearest to when each image was taken (clamped
+        to the blob's lifetime).  See :meth:`.ImageFileOrganizer.patches`
+        for the other arguments.
+        """
+        blob_obj = self[bid]
+        if blob_obj.empty:
+            raise MWTDataError('Blob {} has no data'.format(bid))
+
+        _, image_times = self.image_files.nearest_many(times=times)
+        frames = image.find_nearest_sorted(
+                np.asarray(blob_obj['time'], dtype=float), image_times)
+        centers = np.asarray(blob_obj['centroid'], dtype=float)[frames]
+        return self.image_files.patches(image_times, centers, size,
+                fill=fill, workers=workers, executor=executor)
+
+    def background(self, max_bytes=bg.BACKGROUND_BYTES,
+            workers=None, executor='thread', cache=True):
+        """
+        Returns the plate background, the per-pixel median of all images
+        (see :func:`.background.estimate` for the arguments), indexed by x
+        then y like the images.  It's computed once per experiment; if
+        *cache* is true it's also saved next to the summary file and reused
+        while it's newer than the images.
+        """
+        if self._background is None and cache:
+            self._background = bg.read(self)
+
+        if self._background is None:
+            self._background = bg.estimate(
+                    (self.image_files[t] for t in self.image_files.times),
+                    reader=self.image_files.reader, max_bytes=max_bytes,
+                    workers=workers, executor=executor)
+            if cache:
+                try:
+                    bg.write(self, self._background)
+                except (IOError, OSError) as e:
+                    warnings.warn('Could not save background: {}'.format(e))
+
+        return self._background
+
     def _find_summary_file(self):
         """
         Locate summary file
@@ -141,21 +407,45 @@ class Experiment(object):
         """
         return self.summary.loc[bid]
 
+    def _blob_data(self, bid):
+        """
+        Returns the parsed data for blob id `bid`, from the cache if
+        possible.  The returned object is shared, so don't modify it.
+        """
+        return self.blob_cache.get_or_load(bid, lambda: self._parse_blob(bid))
+
+    def _blob_location(self, bid):
+        """
+        Returns the blobs file path and byte offset of blob id `bid`, or
+        ``None`` if it has no data.
+        """
+        file_no, offset = self.summary[['file_no', 'offset']].loc[bid]
+        if file_no == NO_DATA:
+            return None
+        return self.blobs_files[file_no], offset
+
+    def _blob_locations(self, bids=None):
+        """
+        Generator that yields blob IDs and their locations (as
+        :meth:`_blob_location`) for all blobs, or those in *bids*, looked up
+        in bulk.
+        """
+        rows = self.summary
+        if bids is not None:
+            rows = rows.loc[list(bids)]
+        for bid, file_no, offset in zip(rows.index.tolist(),
+                rows['file_no'].tolist(), rows['offset'].tolist()):
+            if file_no == NO_DATA:
+                yield bid, None
+            else:
+                yield bid, (self.blobs_files[file_no], offset)
+
     def _blob_lines(self, bid):
         """
         Generator that yields all lines of data for blob id `bid`.
         """
         file_no, offset = self.summary[['file_no', 'offset']].loc[bid]
-        with self.blobs_files[file_no].open('r') as f:
-            f.seek(offset)
-            if next(f).rstrip() != '% {}'.format(bid):
-                raise MWTDataError("File number/offset ({}/{}) for blob {} "
-                        "was incorrect.".format(file_no, offset, bid))
-            for line in f:
-                if line[0] != '%':
-                    yield line
-                else:
-                    return
+        return blob.read_lines(self.blobs_files[file_no], offset, bid)
 
     def parse_blob(self, *args, **kwargs): # pragma: no cover
         notice = ('parse_blob is now internal, index the experiment to '
@@ -193,3 +483,38 @@ class Experiment(object):
     def _progress(self, p):
         if self._pcb:
             self._pcb(p)
+
+
+def _load_blob(task):
+    """
+    Reads and parses a blob in a worker; *task* is a blob ID and the
+    location returned by :meth:`Experiment._blob_location`.
+    """
+    bid, location = task
+    if location is None:
+        return bid, None
+    return bid, blob.load(*location, bid=bid)
+
+def load_good_blob(task):
+    """
+    Reads and parses a blob, returning its ID and data, with the data
+    replaced by ``None`` if it doesn't pass every blob filter.  *task* is
+    a blob ID, the location returned by :meth:`Experiment._blob_location`
+    and a list of filters; everything is passed by value so it can run
+    in another process.  Any :class:`.filters.StreamingFilter` are run
+    while the blob is parsed so it can be dropped part way through.
+    """
+    bid, location, filters = task
+    if location is None:
+        return bid, None
+
+    streaming = [f for f in filters if isinstance(f, StreamingFilter)]
+    others = [f for f in filters if not isinstance(f, StreamingFilter)]
+    if streaming:
+        data = screen(blob.read_lines(*location, bid=bid), streaming)
+    else:
+        data = blob.load(*location, bid=bid)
+
+    if data is not None and not all(f(data) for f in others):
+        data = None
+    return bid, data
@@ -9,8 +9,14 @@ from __future__ import (
 import six
 from six.moves import (zip, filter, map, reduce, input, range)
 
+import functools
 import math
 
+import numpy as np
+import pandas as pd
+
+from .readers.blob import FIELDS, parse_line, collate
+
 
 def summary_lifetime_minimum(threshold):
     """
@@ -23,6 +29,21 @@ def summary_lifetime_minimum(threshold):
     return f
 
 
+def summary_mask(summary_filters, summary_data):
+    """
+    Combines the results of calling every one of *summary_filters* on
+    *summary_data* into a single boolean mask.  Filters may return either a
+    mask or the subset of *summary_data* to keep (like the ones here).
+    """
+    mask = np.ones(len(summary_data), dtype=bool)
+    for f in summary_filters:
+        result = f(summary_data)
+        if isinstance(result, pd.DataFrame):
+            result = summary_data.index.isin(result.index)
+        mask &= np.asarray(result, dtype=bool)
+    return mask
+
+
 def exists_in_frame(frame):
     """
     Returns a function that filters summary blob data by requiring it to
@@ -51,13 +72,40 @@ def _midline_length(points):
     """
     Calculates the length of a path connecting *points*.
     """
-    dist = 0
-    ipoints = iter(points)
-    a = six.next(ipoints) # prime loop
-    for b in ipoints:
-        dist += math.sqrt((a[0] - b[0])**2 + (a[1] - b[1])**2)
-        a = b
-    return dist
+    return _midline_lengths(np.asarray(points, dtype=float)[np.newaxis])[0]
+
+
+def _midline_lengths(midlines):
+    """
+    Calculates the length of each midline in the (frames, points, 2) array
+    *midlines* with one batched reduction.  Steps to or from NaN points
+    (e.g. padding, or frames without a midline) count as zero-length.
+    """
+    steps = np.diff(midlines, axis=1)
+    return np.nansum(np.sqrt(np.einsum('...i,...i', steps, steps)), axis=1)
+
+
+def _stack_midlines(midlines):
+    """
+    Converts the `midline` field of parsed blob data to a float array with
+    one row per frame that had a midline.  Arrays pass straight through.
+    """
+    if isinstance(midlines, np.ndarray):
+        return midlines.astype(float, copy=False)
+
+    midlines = [m for m in midlines if m]
+    if not midlines:
+        return np.empty((0, 1, 2))
+    try:
+        return np.array(midlines, dtype=float).reshape(len(midlines), -1, 2)
+    except ValueError:
+        # midlines with differing numbers of points; pad them out with NaN
+        # which will contribute no length
+        n_points = max(len(m) for m in midlines)
+        stack = np.full((len(midlines), n_points, 2), np.nan)
+        for i, m in enumerate(midlines):
+            stack[i, :len(m)] = m
+        return stack
 
 
 def relative_move_minimum(threshold):
@@ -66,32 +114,225 @@ def relative_move_minimum(threshold):
     of movement.  The sum of the blob's centroid bounding box must exceed
     *threshold* times the average length of the midline.
     """
-    def f(blob):
-        xcent, ycent = tuple(zip(*blob['centroid']))
-        move_px = (max(xcent) - min(xcent)) + (max(ycent) - min(ycent))
-        size_px = (
-            sum(_midline_length(p) for p in blob['midline'] if p)
-            / len(blob['midline']))
-        return move_px >= size_px * threshold
+    # partial rather than a closure so it can be sent to worker processes
+    return functools.partial(_relative_move_minimum, threshold)
 
-    return f
 
+def _relative_move_minimum(threshold, blob):
+    centroid = np.asarray(blob['centroid'], dtype=float)
+    move_px = np.ptp(centroid, axis=0).sum()
+    midlines = _stack_midlines(blob['midline'])
+    size_px = _midline_lengths(midlines).sum() / len(blob['midline'])
+    return move_px >= size_px * threshold
 
-def area_minimum(threshold): # pragma: no cover # TODO
+
+class StreamingFilter(object):
     """
-    Returns a function that filters parsed blob data by a minimum ...
+    Base for blob filters that can decide on a blob one frame at a time.
+    They can be called with parsed blob data like any other filter, but
+    when used with :meth:`.Experiment.good_blobs` they are fed each frame as
+    it's parsed (see :func:`screen`), so a blob can be rejected without
+    parsing the rest of it.
+
+    Subclasses set :attr:`fields` to the parsed fields they look at (see
+    :data:`.readers.blob.FIELDS`) and implement :meth:`start`,
+    :meth:`update`, and :meth:`finish`.
     """
-    def f(blob):
-        return bool
+    fields = ()
 
-    return f
+    def start(self, n_frames):
+        """
+        Returns a new state for a blob with *n_frames* frames of data.
+        """
+        raise NotImplementedError()
+
+    def update(self, state, values):
+        """
+        Feeds the next frame's *values* of :attr:`fields` into *state*.
+        Returns ``True`` or ``False`` once the outcome for the blob is
+        certain, otherwise ``None``.
+        """
+        raise NotImplementedError()
 
+    def finish(self, state):
+        """
+        Returns the outcome once every frame has been fed in.
+        """
+        raise NotImplementedError()
 
-def aspect_ratio_minimum(threshold): # pragma: no cover # TODO
+    def __call__(self, blob):
+        columns = [blob[field] for field in self.fields]
+        state = self.start(len(columns[0]))
+        for values in zip(*columns):
+            outcome = self.update(state, values)
+            if outcome is not None:
+                return outcome
+        return self.finish(state)
+
+
+class _FrameFractionFilter(StreamingFilter):
     """
-    Returns a function that filters parsed blob data by a minimum ...
+    Accepts blobs where no more than *max_fraction* of the frames fail
+    :meth:`passes`.  The outcome is known as soon as too many frames have
+    failed, or too few are left to fail.
     """
-    def f(blob):
-        return bool
+    def __init__(self, threshold, max_fraction=0.5):
+        self.threshold = threshold
+        self.max_fraction = max_fraction
 
-    return f
+    def passes(self, *columns):
+        """
+        Returns a boolean array of the frames that pass, given an array for
+        each of :attr:`fields`.
+        """
+        raise NotImplementedError()
+
+    def frame_passes(self, *values):
+        """
+        Scalar version of :meth:`passes` for a single frame.
+        """
+        raise NotImplementedError()
+
+    def start(self, n_frames):
+        # [frames left, failures left before rejecting]
+        return [n_frames, self.max_fraction * n_frames]
+
+    def update(self, state, values):
+        state[0] -= 1
+        if not self.frame_passes(*values):
+            state[1] -= 1
+            if state[1] < 0:
+                return False
+        if state[0] <= state[1]:
+            return True
+        return None
+
+    def finish(self, state):
+        return state[1] >= 0
+
+    def __call__(self, blob):
+        columns = [np.asarray(blob[field], dtype=float)
+                   for field in self.fields]
+        n_frames = len(columns[0])
+        failed = n_frames - np.count_nonzero(self.passes(*columns))
+        return failed <= self.max_fraction * n_frames
+
+
+class _AreaMinimum(_FrameFractionFilter):
+    fields = ('area',)
+
+    def passes(self, area):
+        return area >= self.threshold
+
+    frame_passes = passes
+
+
+class _AspectRatioMinimum(_FrameFractionFilter):
+    fields = ('std_vector', 'std_ortho')
+
+    def passes(self, std_vector, std_ortho):
+        std_vector = np.hypot(std_vector[:, 0], std_vector[:, 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = std_vector / std_ortho
+        # 0/0 (a single pixel) has no elongation to speak of
+        return np.where(std_vector == 0, 0, ratio) >= self.threshold
+
+    def frame_passes(self, std_vector, std_ortho):
+        std_vector = math.hypot(*std_vector)
+        if not std_vector:
+            return 0 >= self.threshold
+        if not std_ortho:
+            return True
+        return std_vector / std_ortho >= self.threshold
+
+
+class _MoveMinimum(StreamingFilter):
+    fields = ('centroid',)
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def start(self, n_frames):
+        # centroid bounding box: [min x, max x, min y, max y]
+        return [np.inf, -np.inf, np.inf, -np.inf]
+
+    def update(self, state, values):
+        x, y = values[0]
+        state[:] = min(state[0], x), max(state[1], x), \
+                   min(state[2], y), max(state[3], y)
+        if (state[1] - state[0]) + (state[3] - state[2]) >= self.threshold:
+            return True
+        return None
+
+    def finish(self, state):
+        return False
+
+    def __call__(self, blob):
+        centroid = np.asarray(blob['centroid'], dtype=float)
+        if not len(centroid):
+            return False
+        return np.ptp(centroid, axis=0).sum() >= self.threshold
+
+
+def area_minimum(threshold, max_fraction=0.5):
+    """
+    Returns a function that filters parsed blob data by a minimum area.
+    At most *max_fraction* of the frames may have an area less than
+    *threshold* pixels.  Works as a :class:`StreamingFilter`.
+    """
+    return _AreaMinimum(threshold, max_fraction)
+
+
+def aspect_ratio_minimum(threshold, max_fraction=0.5):
+    """
+    Returns a function that filters parsed blob data by a minimum aspect
+    ratio, the length of `std_vector` over `std_ortho`.  At most
+    *max_fraction* of the frames may be less elongated than *threshold*.
+    Works as a :class:`StreamingFilter`.
+    """
+    return _AspectRatioMinimum(threshold, max_fraction)
+
+
+def move_minimum(threshold):
+    """
+    Returns a function that filters parsed blob data by a minimum amount
+    of movement: the sum of the sides of the blob's centroid bounding box
+    must be at least *threshold* pixels.  Works as a
+    :class:`StreamingFilter`, accepting as soon as the blob has moved far
+    enough.
+    """
+    return _MoveMinimum(threshold)
+
+
+def screen(lines, blob_filters):
+    """
+    Parses blob data from *lines* (e.g. from :func:`.readers.blob.read_lines`)
+    while feeding every frame to the :class:`StreamingFilter` instances in
+    *blob_filters*.  Returns the same as :func:`.readers.blob.parse`, or
+    ``None`` as soon as any filter rejects the blob, leaving the remaining
+    lines unparsed.
+    """
+    lines = list(lines) # reading is cheap compared to parsing
+    pending = []
+    for f in blob_filters:
+        indices = [FIELDS.index(field) for field in f.fields]
+        pending.append((f, f.start(len(lines)), indices))
+
+    rows = []
+    for line in lines:
+        row = parse_line(line)
+        rows.append(row)
+        if not pending:
+            continue
+        undecided = []
+        for f, state, indices in pending:
+            outcome = f.update(state, [row[i] for i in indices])
+            if outcome is False:
+                return None
+            if outcome is None:
+                undecided.append((f, state, indices))
+        pending = undecided
+
+    if not all(f.finish(state) for f, state, _ in pending):
+        return None
+    return collate(rows)
@@ -10,7 +10,6 @@ from six.moves import (zip, filter, map, reduce, input, range)
 
 import os.path
 import glob
-from collections import defaultdict
 
 import numpy as np
 
@@ -32,6 +31,39 @@ def find(directory, basename):
 
     return blobs_files
 
+def read_lines(path, offset, bid):
+    """
+    Generator that yields all lines of data for blob *bid*, which starts at
+    byte *offset* in the blobs file at *path*.
+    """
+    with path.open('r') as f:
+        f.seek(offset)
+        if next(f).rstrip() != '% {}'.format(bid):
+            raise MWTBlobsError("File/offset ({}/{}) for blob {} was "
+                    "incorrect.".format(path.name, offset, bid))
+        for line in f:
+            if line[0] != '%':
+                yield line
+            else:
+                return
+
+def load(path, offset, bid, parser=None):
+    """
+    Reads blob *bid* from byte *offset* of the blobs file at *path* and
+    returns the output of *parser* (default: :func:`parse`).  Everything
+    needed is passed by value, so this is suitable to send to another
+    process.
+    """
+    if parser is None:
+        parser = parse
+    return parser(read_lines(path, offset, bid))
+
+FIELDS = (
+    'frame', 'time', 'centroid', 'area', 'std_vector', 'std_ortho', 'size',
+    'midline', 'contour_start', 'contour_encode_len', 'contour_encoded',
+)
+NO_GEOMETRY = (None, (0, 0), None, None)
+
 def parse(lines):
     """
     Consumes a provided *lines* iterable and generates two dictionaries; the
@@ -62,49 +94,47 @@ def parse(lines):
         encoded per character, each one of up, down, left, or right (using 2
         bits).
     """
-    blob_info = defaultdict(list, {})
-
-    i = None
-    for i, line in enumerate(lines):
-        ld = line.split('%')
-
-        # parse the first block with the generic stats
-        lda = ld[0].split()
-        blob_info['frame'].append(int(lda[0]))
-        blob_info['time'].append(float(lda[1]))
-        blob_info['centroid'].append((float(lda[2]), float(lda[3])))
-        blob_info['area'].append(int(lda[4]))
-        blob_info['std_vector'].append((float(lda[5]), float(lda[6])))
-        blob_info['std_ortho'].append(float(lda[7]))
-        blob_info['size'].append((float(lda[8]), float(lda[9])))
-
-        # if there are geometry sections, parse them too.
-        if len(ld) == 4:
-            blob_info['midline'].append(tuple(zip(*alternate([int(x) for x in ld[1].split()]))))
-
-            # contour data
-            ldc = ld[3].split()
-            blob_info['contour_start'].append((int(ldc[0]), int(ldc[1])))
-            blob_info['contour_encode_len'].append(int(ldc[2]))
-            blob_info['contour_encoded'].append(ldc[3])
-        else:
-            blob_info['midline'].append(None)
-            blob_info['contour_start'].append((0, 0))
-            blob_info['contour_encode_len'].append(None)
-            blob_info['contour_encoded'].append(None)
-
-    # check if blob was empty
-    if i is None:
-        return None
-
-    # prevent referencing non-existant fields
-    blob_info.default_factory = None
+    return collate([parse_line(line) for line in lines])
 
-    # verify everything is the same length
-    frames = len(blob_info['frame'])
-    assert all(len(v) == frames for v in blob_info.values())
-
-    return blob_info
+def parse_line(line):
+    """
+    Parses a single *line* of blob data into a tuple with a value for each
+    of :data:`FIELDS`, as described in :func:`parse`.
+    """
+    ld = line.split('%')
+
+    # parse the first block with the generic stats
+    lda = ld[0].split()
+    info = (
+        int(lda[0]),
+        float(lda[1]),
+        (float(lda[2]), float(lda[3])),
+        int(lda[4]),
+        (float(lda[5]), float(lda[6])),
+        float(lda[7]),
+        (float(lda[8]), float(lda[9])),
+    )
+
+    # if there are geometry sections, parse them too.
+    if len(ld) != 4:
+        return info + NO_GEOMETRY
+
+    ldc = ld[3].split()
+    return info + (
+        tuple(zip(*alternate([int(x) for x in ld[1].split()]))),
+        (int(ldc[0]), int(ldc[1])),
+        int(ldc[2]),
+        ldc[3],
+    )
+
+def collate(rows):
+    """
+    Combines *rows* returned by :func:`parse_line` into the dictionary of
+    lists returned by :func:`parse`, or ``None`` if there aren't any.
+    """
+    if not rows:
+        return None
+    return dict(zip(FIELDS, (list(column) for column in zip(*rows))))
 
 INFO_FIELDS = dtype([
         ('frame', 'int32'),
@@ -135,16 +165,20 @@ def decode_outline(start, n_points, encoded_outline):
     start : coordinate pair
         Starting X-Y coordinate of the encoded outline
     n_points : int
-        Number of contour points encoded in *encoded_outline*
+        Number of contour points, including the start, so one more than
+        the steps encoded in *encoded_outline*
     encoded_outline : str
         The (non-standard) base64-encoded coordinate steps
+
+    If *encoded_outline* holds fewer steps than it should (which happens),
+    only the points it does encode are returned.
     """
     if not n_points:
         raise ValueError('Empty data passed.')
 
-    outline = np.empty((n_points + 1, 2), int)
+    outline = np.empty((n_points, 2), int)
     outline[0] = start
-    remaining = n_points
+    remaining = n_points - 1
 
     for ch in encoded_outline:
         byte = ord(ch) - ENCODE_OFFSET
@@ -157,14 +191,34 @@ def decode_outline(start, n_points, encoded_outline):
             remaining -= 1
 
             step = STEPS[(byte >> 2*i) & 0b11]
-            outline[n_points - remaining] = outline[n_points - remaining - 1] + step
+            outline[n_points - 1 - remaining] = outline[n_points - 2 - remaining] + step
 
-    return outline
+    return outline[:n_points - remaining]
 
 def encode_outline(outline):
     """
-    Inverse of :func:`decode_outline`.  **NOT YET IMPLEMENTED**
+    Inverse of :func:`decode_outline`: encodes the N-by-2 array of
+    coordinates *outline*, each one step up, down, left, or right from the
+    last, and returns the start coordinates, number of points (N), and
+    encoded string.
     """
+    outline = np.asarray(outline, dtype=int)
+    if not len(outline):
+        raise ValueError('Empty data passed.')
+    steps = np.diff(outline, axis=0)
+    n_points = len(outline)
+    if np.any(np.abs(steps).sum(axis=1) != 1):
+        raise ValueError('Outline points must be one step apart')
+
+    # index into STEPS: (-1, 0), (1, 0), (0, -1), (0, 1)
+    codes = np.where(steps[:, 0], (steps[:, 0] + 1) // 2,
+                     2 + (steps[:, 1] + 1) // 2)
+    codes = np.concatenate([codes, np.zeros(-len(codes) % 3, dtype=int)])
+    codes = codes.reshape(-1, 3)
+    chars = (codes[:, 0] << 4) + (codes[:, 1] << 2) + codes[:, 2]
+    encoded = (chars + ENCODE_OFFSET).astype(np.uint8).tobytes()
+
+    return tuple(outline[0].tolist()), n_points, encoded.decode('ascii')
 
 def decode_outline_line(blob_info, index):
     """
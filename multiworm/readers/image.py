@@ -10,9 +10,36 @@ from six.moves import (zip, filter, map, reduce, input, range)
 
 import pathlib
 import re
+import threading
 import warnings
 
 import numpy as np
+from concurrent import futures
+
+from ..cache import LRUCache
+from ..util import bounded_map
+
+IMAGE_CACHE_BYTES = 128 * 2**20 #: Default memory budget for decoded images
+
+def read(path):
+    """
+    Decodes the image at *path* into a Numpy array.  MWT saves images
+    transposed, so the array is indexed by x then y like the blob
+    coordinates (transpose it again to display).  Requires either Pillow or
+    matplotlib.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        try:
+            import matplotlib.image as mpimg
+        except ImportError:
+            raise ImportError('Pillow or matplotlib is required to read '
+                              'images')
+        return mpimg.imread(str(path))
+
+    with Image.open(str(path)) as img:
+        return np.asarray(img)
 
 def find_nearest_index(seq, value):
     """
@@ -27,16 +54,100 @@ def find_nearest(seq, value):
     """
     return seq[find_nearest_index(seq, value)]
 
+def find_nearest_sorted(seq, values):
+    """
+    Vectorized :func:`find_nearest_index` for a *seq* that's already sorted
+    (as a Numpy array), returning the index in *seq* closest to each of
+    *values* with a binary search.  Ties go to the lower value.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(seq) == 1:
+        return np.zeros(values.shape, dtype=int)
+    right = np.clip(np.searchsorted(seq, values), 1, len(seq) - 1)
+    left = right - 1
+    use_right = (seq[right] - values) < (values - seq[left])
+    return np.where(use_right, right, left)
+
+
+def _invalidates_index(method):
+    def wrapper(self, *args, **kwargs):
+        self._times = None
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
 
 class ImageFileOrganizer(dict):
+    """
+    Dictionary of image paths keyed by the time they were taken, which can
+    look up the images nearest to given times or frames.  A sorted array of
+    the times is kept to answer those quickly, and is rebuilt after the
+    dictionary is changed.
+
+    Decoded images from :meth:`load` are kept in :attr:`image_cache`, an
+    :class:`.LRUCache` limited to the *cache_bytes* keyword argument.  The
+    *reader* keyword argument replaces :func:`read` for decoding, and
+    *prefetch* is how many images on either side of the last one loaded
+    to decode ahead of time in a background thread (default 0, off).
+    """
     def __init__(self, *args, **kwargs):
-        self.experiment = kwargs['experiment']
-        del kwargs['experiment']
+        self.experiment = kwargs.pop('experiment')
+        self.image_cache = LRUCache(kwargs.pop('cache_bytes',
+                                               IMAGE_CACHE_BYTES))
+        self.reader = kwargs.pop('reader', read)
+        self.prefetch = kwargs.pop('prefetch', 0)
+        self._times = None
+        self._init_prefetcher()
         super(ImageFileOrganizer, self).__init__(*args, **kwargs)
 
+    def _init_prefetcher(self):
+        self._prefetcher = None
+        self._pending = {} # image time: future
+        self._pending_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in ['_prefetcher', '_pending', '_pending_lock']:
+            del state[attr]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_prefetcher()
+
+    __setitem__ = _invalidates_index(dict.__setitem__)
+    __delitem__ = _invalidates_index(dict.__delitem__)
+    clear = _invalidates_index(dict.clear)
+    pop = _invalidates_index(dict.pop)
+    popitem = _invalidates_index(dict.popitem)
+    setdefault = _invalidates_index(dict.setdefault)
+    update = _invalidates_index(dict.update)
+
+    @property
+    def times(self):
+        """
+        Sorted Numpy array of the image times.
+        """
+        if self._times is None:
+            self._times = np.array(sorted(self), dtype=float)
+        return self._times
+
     def _frame_time(self, frame):
         return self.experiment.frame_times[max(0, int(frame) - 1)]
 
+    def _frame_times(self, frames):
+        frames = np.asarray(frames)
+        if np.any(frames.astype(int) != frames):
+            warnings.warn('non-integer passed to nearest() as a frame', Warning)
+        frame_times = np.asarray(self.experiment.frame_times)
+        return frame_times[np.maximum(0, frames.astype(int) - 1)]
+
+    def _nearest_indices(self, times):
+        if not self:
+            raise ValueError('no images to search')
+        return find_nearest_sorted(self.times, times)
+
     def nearest(self, **kwargs):
         """
         Given keyword argument 'frame' or 'time', return the path of the
@@ -56,10 +167,130 @@ class ImageFileOrganizer(dict):
 
             time = self._frame_time(frame)
 
-        image_time = find_nearest(list(six.iterkeys(self)), time)
+        image_time = self.times[self._nearest_indices(time)].item()
 
         return self[image_time], image_time
 
+    def nearest_many(self, **kwargs):
+        """
+        nearest_many(times=[t0, t1, ...])
+        nearest_many(frames=[f0, f1, ...])
+
+        Batched form of :meth:`nearest`, returning a list of the paths of
+        the nearest images and a Numpy array of the times they were taken.
+        """
+        frames = kwargs.get('frames', None)
+        times = kwargs.get('times', None)
+        if frames is None and times is None:
+            raise ValueError("either the 'times' or 'frames' keyword "
+                             "argument must be provided")
+        if times is None:
+            times = self._frame_times(frames)
+
+        image_times = self.times[self._nearest_indices(times)]
+
+        return [self[t] for t in image_times.tolist()], image_times
+
+    def load(self, **kwargs):
+        """
+        Given keyword argument 'frame' or 'time', return the decoded image
+        nearest to it and the time it was taken (as a tuple).  The array is
+        shared with the cache, so don't modify it.
+        """
+        path, image_time = self.nearest(**kwargs)
+        image = self._load(image_time)
+        if self.prefetch:
+            self._prefetch_around(image_time)
+        return image, image_time
+
+    def close(self):
+        """
+        Stops the prefetching thread, if it was started.
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown(wait=True)
+            self._prefetcher = None
+
+    def _load(self, image_time):
+        with self._pending_lock:
+            pending = self._pending.get(image_time)
+        if pending is not None:
+            return pending.result()
+        return self.image_cache.get_or_load(image_time,
+                lambda: self.reader(self[image_time]))
+
+    def patches(self, times, centers, size, fill=0, workers=None,
+            executor='thread'):
+        """
+        Cuts a patch of *size* pixels (an int for square patches, or a pair
+        of x and y sizes) centered on each of *centers* from the image
+        nearest to the respective one of *times*.  Returns an array stacked
+        in the same order, shaped (n, x size, y size).  Parts of patches
+        that fall off the image are set to *fill*, and the array's type is
+        promoted as needed to hold it (see :func:`cut_patches`).
+
+        Each image is decoded just once for all of its patches.  Those not
+        already in :attr:`image_cache` are decoded and cut by *workers*
+        (see :func:`.util.bounded_map`, though the default *executor* here
+        is threads) and aren't added to the cache.
+        """
+        size = _patch_size(size)
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        _, image_times = self.nearest_many(times=times)
+        if len(centers) != len(image_times):
+            raise ValueError('a center is required for each time')
+        corners = np.round(centers).astype(int) - np.array(size) // 2
+
+        groups = {}
+        for i, t in enumerate(image_times.tolist()):
+            groups.setdefault(t, []).append(i)
+
+        patches = None
+        tasks = []
+        for t, indices in six.iteritems(groups):
+            cached = self.image_cache.get(t)
+            if cached is None:
+                tasks.append((indices, self[t], self.reader, corners[indices],
+                              size, fill))
+                continue
+            patches = _store(patches, indices,
+                             cut_patches(cached, corners[indices], size, fill),
+                             len(image_times))
+
+        if workers:
+            results = bounded_map(_decode_and_cut, tasks, workers=workers,
+                    ordered=False, executor=executor)
+        else:
+            results = map(_decode_and_cut, tasks)
+        for indices, cut in results:
+            patches = _store(patches, indices, cut, len(image_times))
+
+        if patches is None:
+            patches = np.full((0,) + size, fill)
+        return patches
+
+    def _prefetch_around(self, image_time):
+        index = int(np.searchsorted(self.times, image_time))
+        neighbors = self.times[max(0, index - self.prefetch):
+                               index + self.prefetch + 1].tolist()
+
+        if self._prefetcher is None:
+            self._prefetcher = futures.ThreadPoolExecutor(max_workers=1)
+        with self._pending_lock:
+            for t in neighbors:
+                if t in self.image_cache or t in self._pending:
+                    continue
+                self._pending[t] = self._prefetcher.submit(self._fetch, t)
+
+    def _fetch(self, image_time):
+        try:
+            image = self.reader(self[image_time])
+            self.image_cache.put(image_time, image)
+            return image
+        finally:
+            with self._pending_lock:
+                self._pending.pop(image_time, None)
+
     def spanning(self, **kwargs):
         """
         spanning(time=[t0, tN])
@@ -69,21 +300,55 @@ class ImageFileOrganizer(dict):
         range. Guaranteed to return at least one filename.
         """
         if 'frame' in kwargs:
-            times = (self._frame_time(f) for f in kwargs['frame'])
+            times = [self._frame_time(f) for f in kwargs['frame']]
         else:
-            times = kwargs['time']
+            times = list(kwargs['time'])
 
-        keytimes = sorted(self)
-
-        try:
-            istart, iend = (find_nearest_index(keytimes, t) for t in times)
-        except ValueError:
+        if len(times) != 2:
             raise ValueError('Only two frames or times values are accepted')
+        istart, iend = self._nearest_indices(times)
+
+        return [self[t] for t in self.times[istart:iend + 1].tolist()]
+
+def cut_patches(image, corners, size, fill=0):
+    """
+    Returns an array of patches of *size* (x, y) cut from *image* starting
+    at each of *corners*, which may be partly or entirely off the image.
+    Pixels off the image are set to *fill*.  The patches have the image's
+    type promoted to hold *fill* too (e.g. uint8 images become int16 with
+    a fill of -1, or float with NaN) so they can be told apart from
+    pixels of any value.
+    """
+    dtype = np.result_type(image.dtype, np.min_scalar_type(fill))
+    patches = np.full((len(corners),) + tuple(size), fill, dtype=dtype)
+    limits = np.array(image.shape[:2])
+    for patch, corner in zip(patches, corners):
+        start = np.clip(corner, 0, limits)
+        stop = np.clip(corner + size, 0, limits)
+        if np.any(stop <= start):
+            continue
+        offset = start - corner
+        patch[offset[0]:offset[0] + stop[0] - start[0],
+              offset[1]:offset[1] + stop[1] - start[1]] = \
+                image[start[0]:stop[0], start[1]:stop[1]]
+    return patches
+
+def _patch_size(size):
+    try:
+        size_x, size_y = size
+    except TypeError:
+        size_x = size_y = size
+    return int(size_x), int(size_y)
 
-        return [self[keytimes[i]] for i in range(istart, iend + 1)]
+def _store(patches, indices, cut, n):
+    if patches is None:
+        patches = np.empty((n,) + cut.shape[1:], dtype=cut.dtype)
+    patches[indices] = cut
+    return patches
 
-        #find_nearest_index()
-        #return sorted(self[t] for t in six.iterkeys(self) if key.start <= t <= key.stop)
+def _decode_and_cut(task):
+    indices, path, reader, corners, size, fill = task
+    return indices, cut_patches(reader(path), corners, size, fill)
 
 def find(directory, basename):
     """
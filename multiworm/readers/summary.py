@@ -208,11 +208,17 @@ def parse(path, callback=None):
     df['born_t'] = df['born_t'] / 1000
     df['died_t'] = df['died_t'] / 1000
 
-    # local graph should be immutable
+    return df, frame_times, lock_graph(digraph)
+
+def lock_graph(digraph):
+    """
+    Freezes *digraph* in place (so the experiment's local graph is
+    immutable) but lets ``copy()`` return a mutable version.
+    """
     digraph = nx.freeze(digraph)
 
     def unlock():
         return nx.DiGraph(digraph)
     digraph.copy = unlock
 
-    return df, frame_times, digraph
+    return digraph
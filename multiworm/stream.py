@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Memory-bounded iteration over every blob in an experiment
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import time
+
+from .readers import blob
+from .util import memory_usage
+
+
+class StreamStats(object):
+    """
+    Running statistics of a :class:`BlobStream`.  Latencies are the time in
+    seconds spent reading and parsing a blob, memory figures are in bytes.
+    `rss` is sampled after each blob and `peak_rss` is the largest sample,
+    while `process_peak` is the high-water mark for the process's entire
+    life (so it may predate the stream).  Only aggregates are kept, so this
+    doesn't grow with the number of blobs.
+    """
+    def __init__(self):
+        self.count = 0
+        self.latency = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.rss = 0
+        self.peak_rss = 0
+        self.process_peak = 0
+        self.start_rss = memory_usage()['rss']
+
+    def __repr__(self):
+        return ('<StreamStats {} blobs, {:.1f} ms/blob, RSS {:.1f} MB '
+                '(peak {:.1f} MB)>'.format(self.count,
+                    1000 * self.mean_latency, self.rss / 2**20,
+                    self.peak_rss / 2**20))
+
+    @property
+    def mean_latency(self):
+        if not self.count:
+            return 0.0
+        return self.total_latency / self.count
+
+    def update(self, latency):
+        """
+        Record a blob that took *latency* seconds and sample memory use.
+        """
+        self.count += 1
+        self.latency = latency
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+        memory = memory_usage()
+        self.rss = memory['rss']
+        self.peak_rss = max(self.peak_rss, self.rss)
+        self.process_peak = memory['peak']
+
+
+class BlobStream(object):
+    """
+    Iterates over blob IDs and their parsed data for all blobs in
+    *experiment*, or those in *bids* if provided, holding only one blob at
+    a time.  Each blob is parsed without going through the experiment's
+    cache, and the data is cleared as soon as the consumer asks for the
+    next one, so hanging on to it is pointless.
+
+    Keyword Arguments
+    -----------------
+    callback : callable
+        Called as ``callback(bid, stats)`` after each blob is parsed, with
+        the :class:`StreamStats` of the stream.
+    memory_limit : int
+        Raise :class:`MemoryError` if the resident memory of the process
+        ever exceeds this many bytes.
+    """
+    def __init__(self, experiment, bids=None, callback=None,
+            memory_limit=None):
+        self.experiment = experiment
+        self.bids = bids
+        self.callback = callback
+        self.memory_limit = memory_limit
+        self.stats = StreamStats()
+
+    def __iter__(self):
+        for bid, location in self.experiment._blob_locations(self.bids):
+            tick = time.time()
+            if location is None:
+                data = None
+            else:
+                data = blob.load(*location, bid=bid)
+            self.stats.update(time.time() - tick)
+
+            if self.callback:
+                self.callback(bid, self.stats)
+            if self.memory_limit and self.stats.rss > self.memory_limit:
+                raise MemoryError('Streaming blob {} exceeded the memory '
+                        'limit ({:.1f} MB > {:.1f} MB)'.format(bid,
+                            self.stats.rss / 2**20, self.memory_limit / 2**20))
+
+            yield bid, data
+
+            if data is not None:
+                data.clear()
+            data = None
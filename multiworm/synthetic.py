@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Generates synthetic Multi-Worm Tracker experiments of any size, e.g. to
+test and benchmark against realistic amounts of data.
+"""
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import argparse
+import heapq
+import pathlib
+import struct
+import zlib
+
+import numpy as np
+
+from .readers.blob import encode_outline
+
+PLATE_SIZE = (2592, 1944) #: Default plate (image) size in pixels, x by y
+MIDLINE_POINTS = 11
+
+
+def generate(directory, basename='synthetic', frames=1000, concurrent=10,
+        total_blobs=100, blobs_per_file=1000, geometry=1.0, event_rate=0.1,
+        images=10, fps=10, plate_size=PLATE_SIZE, seed=0):
+    """
+    Writes an experiment named *basename* into *directory* (created if
+    needed) and returns the path to it.  The same arguments always give the
+    same files.
+
+    Parameters
+    ----------
+    frames : int
+        Number of frames, *fps* per second.
+    concurrent : int
+        Number of worms tracked at once.  As each is lost, another is found
+        in its place, until *total_blobs* have been tracked.  Lifetimes are
+        random, averaging as long as spreads that many over all the frames.
+    blobs_per_file : int
+        Blobs written to each blobs file before starting the next.
+    geometry : float
+        Fraction of frames with a midline and contour.
+    event_rate : float
+        Fraction of lost worms that split in two (fission) or join another
+        (fusion) instead of vanishing, each equally likely.
+    images : int
+        Number of images, evenly spaced in time, that are *plate_size*
+        pixels, showing the worms as dark shapes.
+    seed : int
+        Seed for the random number generator.
+    """
+    directory = pathlib.Path(directory)
+    if not directory.exists():
+        directory.mkdir(parents=True)
+
+    plate = _Plate(directory, basename, frames, concurrent, total_blobs,
+            blobs_per_file, geometry, event_rate, images, fps, plate_size,
+            np.random.RandomState(seed))
+    plate.run()
+    return directory
+
+
+class _Worm(object):
+    def __init__(self, bid, born, end, start, rs, plate_size):
+        self.bid = bid
+        self.born = born
+        self.end = end
+        self.start = start
+        self.length = rs.uniform(40, 90)
+        self.width = self.length / rs.uniform(8, 12)
+        self.speed = rs.gamma(2, 0.5)
+        self.heading = rs.uniform(0, 2 * np.pi)
+        self.position = None # the last, once simulated
+
+    def simulate(self, rs, plate_size):
+        """
+        Random walk, reflected off the edges of the plate.
+        """
+        n = self.end - self.born + 1
+        heading = self.heading + np.cumsum(rs.normal(0, 0.1, n))
+        steps = self.speed * np.column_stack([np.cos(heading),
+                                              np.sin(heading)])
+        steps[0] = 0
+        xy = self.start + np.cumsum(steps, axis=0)
+        xy += rs.normal(0, 0.2, xy.shape) # tracking noise
+        bounds = np.asarray(plate_size, dtype=float)
+        xy = np.mod(xy, 2 * bounds)
+        xy = np.where(xy > bounds, 2 * bounds - xy, xy)
+        self.position = xy[-1]
+        return xy
+
+
+class _Plate(object):
+    def __init__(self, directory, basename, frames, concurrent, total_blobs,
+            blobs_per_file, geometry, event_rate, images, fps, plate_size,
+            rs):
+        self.directory = directory
+        self.basename = basename
+        self.frames = frames
+        self.concurrent = concurrent
+        self.total_blobs = total_blobs
+        self.blobs_per_file = blobs_per_file
+        self.geometry = geometry
+        self.event_rate = event_rate
+        self.fps = fps
+        self.plate_size = plate_size
+        self.rs = rs
+
+        self.lifetime = max(1, frames * concurrent / max(total_blobs, 1))
+        self.image_frames = np.unique(np.linspace(
+                1, frames, images).astype(int)) if images else []
+        self.image_worms = dict((f, []) for f in self.image_frames)
+
+        self.alive = {}
+        self.deaths = [] # heap of (last frame, bid)
+        self.next_bid = 1
+        self.written = 0
+        self.blobs_file = None
+
+    def time(self, frame):
+        return frame / self.fps
+
+    def run(self):
+        summary = self.directory / (self.basename + '.summary')
+        try:
+            with summary.open('wb') as f:
+                for frame in range(1, self.frames + 1):
+                    f.write(self.frame_line(frame).encode('ascii'))
+        finally:
+            if self.blobs_file is not None:
+                self.blobs_file.close()
+
+        for frame in self.image_frames:
+            self.write_image(frame)
+
+    def frame_line(self, frame):
+        events, offsets = [], []
+
+        ending = []
+        while self.deaths and self.deaths[0][0] < frame:
+            ending.append(heapq.heappop(self.deaths)[1])
+        for bid in ending:
+            if bid in self.alive:
+                events.extend(self.lose(bid, frame, offsets))
+
+        while len(self.alive) < self.concurrent and self.available(1):
+            start = self.rs.uniform(0, 1, 2) * self.plate_size
+            events.extend([0, self.find(frame, start).bid])
+
+        tracked = len(self.alive)
+        if frame == self.frames:
+            for bid in sorted(self.alive):
+                offsets.extend(self.write_blob(self.alive.pop(bid)))
+
+        line = '{} {:.3f} {} {}'.format(frame, self.time(frame),
+                tracked, tracked) + ' 0' * 11
+        if events:
+            line += ' %% ' + ' '.join(str(e) for e in events)
+        if offsets:
+            line += ' %%% ' + ' '.join(str(o) for o in offsets)
+        return line + '\n'
+
+    def available(self, n):
+        return self.next_bid + n - 1 <= self.total_blobs
+
+    def find(self, frame, start):
+        life = self.rs.geometric(1 / self.lifetime)
+        end = min(frame + life - 1, self.frames)
+        worm = _Worm(self.next_bid, frame, end, np.asarray(start, dtype=float),
+                     self.rs, self.plate_size)
+        self.next_bid += 1
+        self.alive[worm.bid] = worm
+        heapq.heappush(self.deaths, (worm.end, worm.bid))
+        return worm
+
+    def lose(self, bid, frame, offsets):
+        """
+        Ends worm *bid* (last seen the frame before *frame*), returning the
+        lost-and-found pairs for it and adding the blobs file locations of
+        the worms that ended to *offsets*.
+        """
+        worm = self.alive.pop(bid)
+        offsets.extend(self.write_blob(worm))
+
+        roll = self.rs.uniform()
+        partners = sorted(b for b, w in six.iteritems(self.alive)
+                          if w.born < frame)
+        if roll < self.event_rate / 2 and partners and self.available(1):
+            # fusion with another worm, cut short
+            other = self.alive.pop(partners[self.rs.randint(len(partners))])
+            other.end = frame - 1
+            offsets.extend(self.write_blob(other))
+            child = self.find(frame, (worm.position + other.position) / 2)
+            return [worm.bid, child.bid, other.bid, child.bid]
+
+        if roll < self.event_rate and self.available(2):
+            # fission
+            events = []
+            for _ in range(2):
+                jitter = self.rs.normal(0, worm.length / 4, 2)
+                child = self.find(frame, worm.position + jitter)
+                events.extend([worm.bid, child.bid])
+            return events
+
+        return [worm.bid, 0]
+
+    def write_blob(self, worm):
+        """
+        Writes the data of *worm* to the current blobs file, returning its
+        ID and location for the summary file.
+        """
+        if self.written % self.blobs_per_file == 0:
+            if self.blobs_file is not None:
+                self.blobs_file.close()
+            path = self.directory / '{}_{:05}k.blobs'.format(
+                    self.basename, self.written // self.blobs_per_file)
+            self.blobs_file = path.open('wb')
+        file_no = self.written // self.blobs_per_file
+        self.written += 1
+
+        rs = self.rs
+        xy = worm.simulate(rs, self.plate_size)
+        frames = np.arange(worm.born, worm.end + 1)
+        n = len(frames)
+        area = np.round(worm.length * worm.width * 0.8 *
+                        rs.normal(1, 0.05, n)).astype(int)
+
+        axis = np.array([np.cos(worm.heading), np.sin(worm.heading)])
+        std_vector = axis * worm.length / 4
+        std_ortho = worm.width / 4
+        size = np.abs(axis) * worm.length + worm.width
+        info = '{:.4f} {:.4f} {:.4f}'.format(std_vector[0], std_vector[1],
+                std_ortho) + ' {:.1f} {:.1f}'.format(size[0], size[1])
+
+        midline, outline = _shape(worm.length, worm.width, worm.heading)
+        midline = ' '.join(str(v) for v in midline.ravel())
+        corner, n_points, encoded = encode_outline(outline)
+        geometry = rs.uniform(size=n) < self.geometry
+        corners = np.round(xy).astype(int) + corner
+
+        # %-formatting is quickest, and this is most of the work
+        info_line = '%d %.3f %.3f %.3f %d ' + info.replace('%', '%%')
+        geo_line = (' %% {} %%%% %d %d {} {}'.format(
+                midline, n_points, encoded.replace('%', '%%')))
+        lines = ['% {}\n'.format(worm.bid)]
+        for frame, t, (x, y), a, geo, (cx, cy) in zip(frames.tolist(),
+                self.time(frames).tolist(), xy.tolist(), area.tolist(),
+                geometry.tolist(), corners.tolist()):
+            if geo:
+                lines.append(info_line % (frame, t, x, y, a) +
+                             geo_line % (cx, cy) + '\n')
+            else:
+                lines.append(info_line % (frame, t, x, y, a) + '\n')
+
+        offset = self.blobs_file.tell()
+        self.blobs_file.write(''.join(lines).encode('ascii'))
+
+        for frame in self.image_frames:
+            if worm.born <= frame <= worm.end:
+                self.image_worms[frame].append((xy[frame - worm.born], worm))
+
+        return [worm.bid, '{}.{}'.format(file_no, offset)]
+
+    def write_image(self, frame):
+        x_size, y_size = self.plate_size
+        rs = np.random.RandomState(frame)
+        img = rs.normal(200, 5, (x_size, y_size))
+        for (x, y), worm in self.image_worms[frame]:
+            reach = int(worm.length / 2 + 2)
+            x0, x1 = max(0, int(x) - reach), min(x_size, int(x) + reach + 1)
+            y0, y1 = max(0, int(y) - reach), min(y_size, int(y) + reach + 1)
+            px, py = np.ogrid[x0:x1, y0:y1]
+            along = (px - x) * np.cos(worm.heading) + \
+                    (py - y) * np.sin(worm.heading)
+            across = -(px - x) * np.sin(worm.heading) + \
+                    (py - y) * np.cos(worm.heading)
+            inside = ((along / (worm.length / 2))**2 +
+                      (across / (worm.width / 2))**2) <= 1
+            img[x0:x1, y0:y1][inside] = 60
+
+        ms = int(round(self.time(frame) * 1000))
+        name = self.basename + (str(ms) if ms else '') + '.png'
+        write_png(self.directory / name,
+                  np.clip(img, 0, 255).astype(np.uint8))
+
+
+def _shape(length, width, heading):
+    """
+    Returns the midline (relative to the centroid) and the outline (one
+    pixel step apart, relative to the rounded centroid) of an ellipse
+    standing in for a worm.
+    """
+    axis = np.array([np.cos(heading), np.sin(heading)])
+    normal = np.array([-axis[1], axis[0]])
+
+    along = np.linspace(-length / 2, length / 2, MIDLINE_POINTS)
+    midline = np.round(along[:, None] * axis).astype(int)
+
+    # sampled closely enough that neighbours round at most a pixel apart
+    angles = np.linspace(0, 2 * np.pi, int(4 * length), endpoint=False)
+    ring = (np.cos(angles)[:, None] * axis * length / 2 +
+            np.sin(angles)[:, None] * normal * width / 2)
+    ring = np.round(ring).astype(int)
+
+    # diagonal neighbours are joined by stepping in x then y
+    steps = np.roll(ring, -1, axis=0) - ring
+    corners = ring + steps * [1, 0]
+    points = np.stack([ring, corners], axis=1).reshape(-1, 2)
+    keep = np.stack([np.ones(len(ring), dtype=bool),
+                     steps.all(axis=1)], axis=1).ravel()
+    points = points[keep]
+
+    # drop repeats (including of the start at the end)
+    moved = np.any(points != np.roll(points, 1, axis=0), axis=1)
+    return midline, points[moved]
+
+
+def write_png(path, image):
+    """
+    Saves the 2D 8-bit array *image* as a greyscale PNG at *path*, one row
+    per first index.  MWT images are transposed, so arrays indexed by x
+    then y (see :func:`.readers.image.read`) are saved as they are.
+    """
+    height, width = image.shape
+    raw = np.zeros((height, width + 1), dtype=np.uint8) # filter byte 0
+    raw[:, 1:] = image
+
+    def chunk(kind, data):
+        body = kind + data
+        return (struct.pack(b'>I', len(data)) + body +
+                struct.pack(b'>I', zlib.crc32(body) & 0xffffffff))
+
+    with pathlib.Path(path).open('wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack(b'>IIBBBBB', width, height, 8, 0,
+                                           0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic '
+            'Multi-Worm Tracker experiment.')
+    parser.add_argument('directory', help='Where to write the experiment')
+    parser.add_argument('-n', '--basename', default='synthetic')
+    parser.add_argument('-f', '--frames', type=int, default=1000)
+    parser.add_argument('-c', '--concurrent', type=int, default=10)
+    parser.add_argument('-b', '--total-blobs', type=int, default=100)
+    parser.add_argument('--blobs-per-file', type=int, default=1000)
+    parser.add_argument('-g', '--geometry', type=float, default=1.0,
+            help='Fraction of frames with midlines and contours')
+    parser.add_argument('-e', '--event-rate', type=float, default=0.1,
+            help='Fraction of lost blobs that split or join others')
+    parser.add_argument('-i', '--images', type=int, default=10)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.directory, basename=args.basename, frames=args.frames,
+             concurrent=args.concurrent, total_blobs=args.total_blobs,
+             blobs_per_file=args.blobs_per_file, geometry=args.geometry,
+             event_rate=args.event_rate, images=args.images, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,10 +7,21 @@ from __future__ import (
 import six
 from six.moves import (zip, filter, map, reduce, input, range)
 
+import collections
+import itertools
+import multiprocessing
+import sys
+try:
+    import resource
+except ImportError: # pragma: no cover # Windows
+    resource = None
+from concurrent import futures
+
 import numpy as np
 import pandas as pd
 
 LAZY_PREFIX = '_lazy_'
+PREFETCH_PER_WORKER = 2
 
 def multifilter(filters, iterable):
     """
@@ -65,3 +76,114 @@ def lazyprop(fn):
             setattr(self, attr_name, fn(self))
         return getattr(self, attr_name)
     return _lazyprop
+
+def sizeof(obj):
+    """
+    Approximate memory footprint of *obj* in bytes, including the contents
+    of containers and Numpy arrays.
+    """
+    if isinstance(obj, np.ndarray):
+        size = obj.nbytes
+        if obj.dtype == object:
+            size += sum(sizeof(x) for x in obj.flat)
+        return size
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in six.iteritems(obj))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(sizeof(x) for x in obj)
+    return size
+
+def memory_usage():
+    """
+    Returns a dictionary with the current (`rss`) and peak (`peak`) resident
+    memory of this process in bytes.  Uses the /proc file system where
+    available, otherwise both are the peak as reported by
+    :func:`resource.getrusage` (or zero if that's unavailable too).
+    """
+    result = {'peak': 0, 'rss': 0}
+    keys = {'VmHWM:': 'peak', 'VmRSS:': 'rss'}
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                parts = line.split()
+                if parts and parts[0] in keys:
+                    result[keys[parts[0]]] = int(parts[1]) * 1024
+    except IOError:
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform != 'darwin':
+                peak *= 1024 # reported in kilobytes rather than bytes
+            result['peak'] = result['rss'] = peak
+    return result
+
+def get_executor(kind='process', workers=None):
+    """
+    Returns a :class:`concurrent.futures.Executor` and a flag indicating if
+    the caller owns it (and should shut it down when finished).  *kind* is
+    either ``'process'``, ``'thread'``, or an existing executor to share,
+    which is passed through untouched.
+    """
+    if isinstance(kind, futures.Executor):
+        return kind, False
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    if kind == 'process':
+        return futures.ProcessPoolExecutor(workers), True
+    elif kind == 'thread':
+        return futures.ThreadPoolExecutor(workers), True
+
+    raise ValueError("executor must be 'process', 'thread', or an "
+                     "Executor instance")
+
+def bounded_map(function, iterable, workers=None, ordered=True,
+        prefetch=None, executor='process'):
+    """
+    Like the builtin map(), but calls *function* in a pool of *workers*.
+    No more than *prefetch* items (default: twice the number of workers)
+    are dispatched but not yet consumed at any one time, so memory use is
+    bounded regardless of the length of *iterable*.
+
+    If *ordered* is false, results are yielded as they complete rather than
+    in the order of *iterable*.  *executor* is passed to :func:`get_executor`;
+    a provided executor instance is shared and left running afterwards.
+    """
+    if prefetch is None:
+        prefetch = PREFETCH_PER_WORKER * (workers or multiprocessing.cpu_count())
+    prefetch = max(1, int(prefetch))
+
+    pool, owned = get_executor(executor, workers)
+    iterable = iter(iterable)
+    pending = collections.deque(
+        pool.submit(function, item)
+        for item in itertools.islice(iterable, prefetch))
+
+    try:
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = futures.wait(pending,
+                        return_when=futures.FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+            result = future.result()
+            future = None
+
+            # top up the queue before handing control back to the consumer
+            # so the workers stay busy
+            for item in itertools.islice(iterable, 1):
+                pending.append(pool.submit(function, item))
+
+            yield result
+            result = None
+    finally:
+        for future in pending:
+            future.cancel()
+        if owned:
+            pool.shutdown(wait=True)
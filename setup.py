@@ -31,6 +31,7 @@ setup(
     ],
 
     install_requires=[
+        'futures; python_version < "3"', # concurrent.futures backport
         'networkx>=1.8.1',
         'numpy>=1.8.1',
         'pandas>=0.14.0',
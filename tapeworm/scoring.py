@@ -9,16 +9,86 @@ from __future__ import (
 import six
 from six.moves import (zip, filter, map, reduce, input, range)
 
+import hashlib
+import json
+
 import numpy as np
-import scipy.stats as sps
 import scipy.interpolate as spi
+import scipy.signal as ss
 #import matplotlib.pyplot as plt
 
 from .core import OneGoodBlobException
 
 KDE_SAMPLES = 1000 #: Default number of samples to take along KDE distribution
+KDE_TRUNCATE = 5 #: Kernels are cut off this many bandwidths from the center
+SUFFIX = '.scores.npz' #: Saved score surfaces, next to the summary file
+
+def binned_kde(data, grid, bandwidth=None):
+    """
+    Evaluates a Gaussian kernel density estimate of the 1D *data* at the
+    evenly spaced, increasing points *grid*, like
+    ``scipy.stats.gaussian_kde(data, bw_method=bandwidth)(grid)``, but by
+    binning the data onto the grid and convolving with the kernel by FFT.
+    *bandwidth* may be ``'scott'`` (the default), ``'silverman'`` or a
+    scalar factor.  Data off the grid only count towards the total, and
+    the kernel is never narrower than the grid spacing.
+    """
+    data = np.asarray(data, dtype=float).ravel()
+    grid = np.asarray(grid, dtype=float)
+    n = data.size
+    if n < 2:
+        raise ValueError('`dataset` input should have multiple elements.')
+    if grid.size < 2 or grid[1] <= grid[0]:
+        raise ValueError('grid must be increasing and evenly spaced')
+
+    if bandwidth is None or bandwidth == 'scott':
+        factor = n ** (-1 / 5)
+    elif bandwidth == 'silverman':
+        factor = (n * 3 / 4) ** (-1 / 5)
+    elif isinstance(bandwidth, six.string_types):
+        raise ValueError('Unrecognized bandwidth {!r}'.format(bandwidth))
+    else:
+        factor = float(bandwidth)
+    spacing = grid[1] - grid[0]
+    sigma = max(factor * data.std(ddof=1), spacing)
+
+    # share each datum between its two nearest grid points
+    position = (data - grid[0]) / spacing
+    position = position[(position >= 0) & (position <= grid.size - 1)]
+    left = np.minimum(position.astype(int), grid.size - 2)
+    right_share = position - left
+    counts = (np.bincount(left, 1 - right_share, minlength=grid.size) +
+              np.bincount(left + 1, right_share, minlength=grid.size))
+
+    half = int(min(grid.size - 1, np.ceil(KDE_TRUNCATE * sigma / spacing)))
+    offsets = np.arange(-half, half + 1) * spacing
+    kernel = (np.exp(-0.5 * (offsets / sigma)**2) /
+              (sigma * np.sqrt(2 * np.pi)))
+
+    density = ss.fftconvolve(counts, kernel, mode='same') / n
+    return np.maximum(density, 0, out=density) # FFT rounding
+
+def fingerprint(displacements, **params):
+    """
+    Returns a key identifying a fit of *displacements* with the keyword
+    arguments *params* to :meth:`DisplacementScorer.kde_fit`, so saved
+    scores can be matched to their data.
+    """
+    data = np.ma.filled(np.ma.asarray(displacements, dtype=float), np.nan)
+    digest = hashlib.sha1(str(data.shape).encode('utf-8'))
+    digest.update(np.ascontiguousarray(data).tobytes())
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
 
 class DisplacementScorer(object):
+    """
+    Scores frame and distance gaps between blobs by the density of the
+    *displacements* of blobs that many frames after they were found (see
+    :meth:`kde_fit`).  The fitted scores can be saved and reloaded with
+    :meth:`save` and :meth:`load`.
+    """
+    key = None #: Label the scores were saved or loaded with
+
     def __init__(self, displacements, *args, **kwargs):
         self.kde_fit(displacements, *args, **kwargs)
 
@@ -26,8 +96,13 @@ class DisplacementScorer(object):
 
     def kde_fit(self, displacements, bandwidth=None, subsample=None, 
             samples=KDE_SAMPLES):
-        # if subsample is None:
-        #     subsample = 1
+        """
+        Fits the distribution of *displacements* (rows of distances from
+        the first point of each blob, masked past their ends) at every
+        frame gap, or every *subsample* gaps and the last, with a
+        :func:`binned_kde` of *bandwidth* evaluated at *samples* distances.
+        Scores are interpolated between them by a spline.
+        """
         if displacements.shape[0] == 1:
             raise OneGoodBlobException()
 
@@ -42,19 +117,62 @@ class DisplacementScorer(object):
         self.frame_gap_domain = 1, displacements.shape[1] - 1
 
         distances = np.linspace(*self.distance_domain, num=samples)
-        frame_gaps = np.arange(self.frame_gap_domain[0], 
-                self.frame_gap_domain[1] + 1, step=subsample)
+        frame_gaps = np.arange(self.frame_gap_domain[0],
+                self.frame_gap_domain[1] + 1, step=subsample or 1)
+        if frame_gaps[-1] != self.frame_gap_domain[1]:
+            # always fit the ends of the domain
+            frame_gaps = np.append(frame_gaps, self.frame_gap_domain[1])
 
-        self.scores = np.empty((frame_gaps.size, distances.size))
+        scores = np.empty((frame_gaps.size, distances.size))
 
         #for i, dist in enumerate(displacements.T[1:]):
         for i, fgap in enumerate(frame_gaps):
             dist = displacements[:,fgap]
             if isinstance(dist, np.ma.MaskedArray):
                 dist = dist.compressed()
-            self.scores[i] = sps.gaussian_kde(dist, bw_method=bandwidth)(distances)
+            scores[i] = binned_kde(dist, distances, bandwidth)
+
+        self._interpolate(frame_gaps, distances, scores)
+
+    def _interpolate(self, frame_gaps, distances, scores):
+        """
+        Sets up the spline between the scores fitted at *frame_gaps* and
+        *distances*.
+        """
+        self.frame_gaps = frame_gaps
+        self.distances = distances
+        self.scores = scores
+        self.score_interp = spi.RectBivariateSpline(frame_gaps, distances,
+                scores, kx=min(3, frame_gaps.size - 1))
 
-        self.score_interp = spi.RectBivariateSpline(frame_gaps, distances, self.scores)
+    def save(self, path, key=None):
+        """
+        Saves the fitted scores to *path* (see :meth:`load`), labelled with
+        *key*, e.g. from :func:`fingerprint`.
+        """
+        with open(str(path), 'wb') as f:
+            np.savez(f, frame_gaps=self.frame_gaps, distances=self.distances,
+                     scores=self.scores,
+                     frame_gap_domain=self.frame_gap_domain,
+                     distance_domain=self.distance_domain,
+                     key='' if key is None else key)
+        self.key = key
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns a scorer with the scores saved by :meth:`save` to *path*,
+        without fitting anything.  Its :attr:`key` is the one they were
+        saved with.
+        """
+        with np.load(str(path)) as saved:
+            scorer = cls.__new__(cls)
+            scorer.frame_gap_domain = tuple(saved['frame_gap_domain'])
+            scorer.distance_domain = tuple(saved['distance_domain'])
+            scorer.key = six.text_type(saved['key']) or None
+            scorer._interpolate(saved['frame_gaps'], saved['distances'],
+                                saved['scores'])
+        return scorer
 
     # def show(self):
     #     fig, ax = plt.subplots()
@@ -82,3 +200,12 @@ class DisplacementScorer(object):
         """
         result = self.score_interp(fgap, dgap)
         return np.clip(result, 1e-100, 1e100, out=result)
+
+    def ev(self, fgaps, dgaps):
+        """
+        Like calling the scorer, but pointwise: the score of each pair of
+        frame and distance gap in *fgaps* and *dgaps*, rather than of
+        every combination.
+        """
+        result = np.atleast_1d(self.score_interp.ev(fgaps, dgaps))
+        return np.clip(result, 1e-100, 1e100, out=result)
@@ -10,7 +10,7 @@ from six.moves import (zip, filter, map, reduce, input, range)
 
 import sys
 import itertools
-import math
+import warnings
 
 import numpy as np
 import networkx as nx
@@ -27,6 +27,7 @@ MAX_FRAME_GAP = 500 #: Maximum gap time in frames to consider (1 s ~= 10 frames)
 MAX_WORM_SPEED = 1.37 #: Worms move at some finite speed, measured in px/frame.
 MAX_OBS_FRAC = 0.90 #: Assume that the observed worms were only moving this fraction of theoretical maximum
 WORM_ERROR = 10 #: Offset in pixels to add on max speed bounding "cone".
+CANDIDATE_CHUNK = 1000 #: Ends whose candidates are found together
 
 def euclid(a, b):
     """
@@ -107,6 +108,10 @@ def find_candidates(ends, starts, **params):
         possible starts as values.  In the latter dictionary, keys are IDs
         and the value is a third dictionary with the fields `d` containing 
         the distance gap, and `f` with the frame gap.
+
+    Starts are sorted by frame so only those within *max_fgap* frames of
+    each end are considered, and the distances are found for
+    :data:`CANDIDATE_CHUNK` ends at a time.
     """
     p = {
         'max_fgap': MAX_FRAME_GAP,
@@ -116,24 +121,50 @@ def find_candidates(ends, starts, **params):
     if params:
         p.update(params)
 
+    # starts sorted by frame (stably, to keep their order within a frame)
+    # so each end's window of max_fgap frames is a contiguous slice
+    order = np.argsort(starts['f'], kind='mergesort')
+    start_frames = starts['f'][order]
+    start_locs = np.asarray(starts['loc'], dtype=float)[order]
+    end_frames = ends['f']
+    end_locs = np.asarray(ends['loc'], dtype=float)
+    first = np.searchsorted(start_frames, end_frames, side='right')
+    windows = np.maximum(np.searchsorted(start_frames,
+            end_frames + p['max_fgap'], side='right') - first, 0)
+
     candidates = {}
-    for blob_a in ends:
-        a_bid = int(blob_a['bid'])
-        candidates[a_bid] = {}
-        for blob_b in starts[np.logical_and(
-                    blob_a['f'] < starts['f'], 
-                    starts['f'] <= blob_a['f'] + p['max_fgap']
-                )]:
-            b_bid = int(blob_b['bid'])
-            f_gap = blob_b['f'] - blob_a['f']
-            d_gap = euclid(blob_a['loc'], blob_b['loc'])
-
-            # check if it's in the 'cone'
-            if (d_gap <= p['error'] + f_gap * p['max_speed']):
+    for chunk in range(0, len(ends), CANDIDATE_CHUNK):
+        chunk_ends = slice(chunk, chunk + CANDIDATE_CHUNK)
+        counts = windows[chunk_ends]
+
+        # every end/start pair in the windows of this chunk of ends
+        pair_end = np.repeat(np.arange(len(counts)), counts) + chunk
+        pair_offsets = np.cumsum(counts) - counts
+        pair_start = (np.arange(counts.sum()) -
+                      np.repeat(pair_offsets - first[chunk_ends], counts))
+
+        f_gaps = start_frames[pair_start] - end_frames[pair_end]
+        offset = start_locs[pair_start] - end_locs[pair_end]
+        d_gaps = np.sqrt(offset[:, 0] * offset[:, 0] +
+                         offset[:, 1] * offset[:, 1])
+
+        # check which are in the 'cone', reported by end then in the order
+        # the starts were given
+        inside = np.flatnonzero(d_gaps <= p['error'] + f_gaps * p['max_speed'])
+        inside = inside[np.lexsort((order[pair_start[inside]],
+                                    pair_end[inside]))]
+        b_bids = starts['bid'][order[pair_start[inside]]]
+        bounds = np.searchsorted(pair_end[inside],
+                np.arange(chunk, chunk + len(counts) + 1))
+
+        for i in range(len(counts)):
+            a_bid = int(ends['bid'][chunk + i])
+            candidates[a_bid] = {}
+            for k in range(bounds[i], bounds[i + 1]):
                 # a->b is possible, save it.
-                candidates[a_bid][b_bid] = {
-                            'd': d_gap, 
-                            'f': f_gap,
+                candidates[a_bid][int(b_bids[k])] = {
+                            'd': d_gaps[inside[k]],
+                            'f': f_gaps[inside[k]],
                         }
 
     return candidates
@@ -289,10 +320,15 @@ class Taper(object):
         How far out in seconds to consider blob joins.
         Default: **50**, which is borderline-overkill.
 
+    subsample : int
+        Fit the displacement scores every this many frame gaps and
+        interpolate between them.  Default: **1**, every gap.
+
     verbosity : int
         How much to talk.  Accepts values from 0 to 1, inclusive.
     """
-    def __init__(self, directory, min_move=2, min_time=10, horizon=50, verbosity=0):
+    def __init__(self, directory, min_move=2, min_time=10, horizon=50,
+            subsample=1, verbosity=0):
         self.plate = MultiblobExperiment(directory)
         self.plate.add_summary_filter(multiworm.filters.summary_lifetime_minimum(min_time))
         self.plate.add_filter(multiworm.filters.relative_move_minimum(min_move))
@@ -302,6 +338,7 @@ class Taper(object):
         self.starts = None # (bid, x, y, f)
         self.ends = None # (bid, x, y, f)
         self.displacements = None
+        self.subsample = subsample
         self.verbosity = verbosity
 
         self.patched_segments = []
@@ -330,9 +367,13 @@ class Taper(object):
             dtype = multiworm.util.dtype(dtype)
         return np.zeros((self.plate.max_blobs, width), dtype=dtype)
 
-    def load_data(self):
+    def load_data(self, workers=None, cache=True):
         """
-        Parse, filter, and determine a scoring method for blobs.
+        Parse, filter, and determine a scoring method for blobs.  If
+        *workers* is provided, blobs are read and filtered in that many
+        processes.  If *cache* is true, the scores are saved next to the
+        summary file and reused by later runs on the same blobs (see
+        :meth:`_fit_scorer`).
         """
         self.plate.load_summary()
         terminal_fields = [('bid', 'int32'), ('loc', '2int16'), ('f', 'int32')]
@@ -341,7 +382,7 @@ class Taper(object):
         displacements = []
 
         i = -1
-        for i, blob in enumerate(self.plate.good_blobs()):
+        for i, blob in enumerate(self.plate.good_blobs(workers=workers)):
             bid, bdata = blob
             bdata = self._condense_blob(bdata)
             blob = None
@@ -383,12 +424,42 @@ class Taper(object):
                 return
 
         displacements = jagged_mask(displacements)
-        self.scorer = scoring.DisplacementScorer(displacements)
+        self._fit_scorer(displacements, cache=cache)
 
         self._find_candidates()
         self._score_candidates()
         self._judge_candidates()
 
+    def _fit_scorer(self, displacements, cache=True):
+        """
+        Fits :attr:`scorer` to *displacements*.  If *cache* is true, scores
+        saved by an earlier fit of the same displacements are loaded
+        instead, and new ones are saved.
+        """
+        params = {'subsample': self.subsample}
+        key = scoring.fingerprint(displacements, **params)
+        path = self.plate.summary_file.with_name(
+                self.plate.basename + scoring.SUFFIX)
+
+        if cache and path.exists():
+            try:
+                scorer = scoring.DisplacementScorer.load(path)
+            except (IOError, OSError, ValueError, KeyError) as e:
+                warnings.warn('Could not load displacement scores: {}'
+                              .format(e))
+            else:
+                if scorer.key == key:
+                    self.scorer = scorer
+                    return
+
+        self.scorer = scoring.DisplacementScorer(displacements, **params)
+        if cache:
+            try:
+                self.scorer.save(path, key)
+            except (IOError, OSError) as e:
+                warnings.warn('Could not save displacement scores: {}'
+                              .format(e))
+
     def _find_candidates(self, **kwargs):
         """
         Finds all candidate joins for the loaded data set.  See 
@@ -400,19 +471,27 @@ class Taper(object):
     def _score_candidates(self, **kwargs):
         """
         Compute the score for each candidate using self.scorer and add to 
-        the candidate dictionary as a 'score' field.
+        the candidate dictionary as a 'score' field.  All candidates are
+        scored at once with :meth:`.scoring.DisplacementScorer.ev`.
         """
-        for lost_bid, connections in six.iteritems(self.candidates):
-            for found_bid, connection in six.iteritems(connections):
-                connection['score'] = math.log10(
-                        self.scorer(connection['f'], connection['d']).max())
-
-                if self.verbosity >= 1:
-                    print('{0:5d} --> {1:<5d} : f = {2:3d}, d = {3:5.1f}, '
-                          'log_score={4:.2f}'.format(
-                                lost_bid, found_bid, connection['f'], 
-                                connection['d'], connection['score']
-                        ))
+        connections = [connection
+                for connections in six.itervalues(self.candidates)
+                for connection in six.itervalues(connections)]
+        if not connections:
+            return
+
+        scores = np.log10(self.scorer.ev(
+                np.array([c['f'] for c in connections], dtype=float),
+                np.array([c['d'] for c in connections], dtype=float)))
+        for connection, score in zip(connections, scores.tolist()):
+            connection['score'] = score
+
+        if self.verbosity >= 1:
+            print('Scored {0} candidate joins from {1} lost blobs: '
+                  'log_score min {2:.2f}, median {3:.2f}, max {4:.2f}'.format(
+                        len(connections),
+                        sum(1 for c in six.itervalues(self.candidates) if c),
+                        scores.min(), np.median(scores), scores.max()))
 
     def _judge_candidates(self, log_threshold=-2, **kwargs):
         """
@@ -98,3 +98,43 @@ class TestCandidateFinding(unittest.TestCase):
                 tapeworm.tape.find_candidates(ends, starts, **params),
                 expected_result,
             )
+
+    def test_empty(self):
+        ends = termini([(1, (100, 100), 10)])
+        self.assertEqual(tapeworm.tape.find_candidates(ends, termini([])),
+                         {1: {}})
+        self.assertEqual(tapeworm.tape.find_candidates(termini([]), ends), {})
+
+    def test_same_as_pairwise(self):
+        rs = np.random.RandomState(0)
+        n = 500
+        ends = termini([(i, rs.randint(0, 500, 2), f) for i, f
+                        in zip(range(1, n + 1), rs.randint(0, 20000, n))])
+        starts = termini([(i, rs.randint(0, 500, 2), f) for i, f
+                          in zip(range(n + 1, 2 * n + 1),
+                                 rs.randint(0, 20000, n) // 10 * 10)])
+        params = {'error': 5, 'max_speed': 0.5, 'max_fgap': 300.5}
+
+        # check pair by pair, as find_candidates once did
+        expected = {}
+        for blob_a in ends:
+            expected[blob_a['bid']] = {}
+            for blob_b in starts[(blob_a['f'] < starts['f']) &
+                    (starts['f'] <= blob_a['f'] + params['max_fgap'])]:
+                f_gap = blob_b['f'] - blob_a['f']
+                d_gap = tapeworm.tape.euclid(blob_a['loc'], blob_b['loc'])
+                if d_gap <= params['error'] + f_gap * params['max_speed']:
+                    expected[blob_a['bid']][blob_b['bid']] = {
+                            'd': d_gap, 'f': f_gap}
+
+        chunk = tapeworm.tape.CANDIDATE_CHUNK
+        tapeworm.tape.CANDIDATE_CHUNK = 64 # spans a few chunks
+        try:
+            candidates = tapeworm.tape.find_candidates(ends, starts, **params)
+        finally:
+            tapeworm.tape.CANDIDATE_CHUNK = chunk
+        self.assertEqual(candidates, expected)
+        self.assertTrue(any(candidates.values()))
+        # starts are in the order given
+        for bid, found in six.iteritems(candidates):
+            self.assertEqual(list(found), list(expected[bid]))
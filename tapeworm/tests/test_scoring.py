@@ -3,10 +3,20 @@ from __future__ import (
 import six
 from six.moves import (zip, filter, map, reduce, input, range)
 
+import math
+import pathlib
+import shutil
+import tempfile
 import unittest
 
 import numpy as np
+import scipy.stats as sps
+
 import tapeworm.scoring
+import tapeworm.tape
+
+SYNTH1 = (pathlib.Path(__file__).parent.resolve().parent.parent /
+          'tests' / 'data' / 'synth1')
 
 class TestScoring(unittest.TestCase):
 
@@ -27,6 +37,7 @@ class TestScoring(unittest.TestCase):
         self.mean_f = (self.min_f + self.max_f) / 2
         self.mean_d = (self.min_d + self.max_d) / 2
 
+        self.displacements = displacement_data
         self.scorer = tapeworm.scoring.DisplacementScorer(displacement_data)
 
     def test_internal_domain(self):
@@ -75,5 +86,138 @@ class TestScoring(unittest.TestCase):
             self.assertTrue(self.scorer(*badness) >= 0,
                     "Scorer accepting values in known-bad domain")
 
+    def test_ev(self):
+        fgaps = np.linspace(self.min_f, self.max_f, 7)
+        dgaps = np.linspace(self.min_d, self.max_d, 7)
+        np.testing.assert_allclose(self.scorer.ev(fgaps, dgaps),
+                [self.scorer(f, d)[0, 0] for f, d in zip(fgaps, dgaps)])
+        self.assertEqual(self.scorer.ev(self.mean_f, self.mean_d).shape, (1,))
+
+    def test_subsample(self):
+        scorer = tapeworm.scoring.DisplacementScorer(
+                self.displacements, subsample=4)
+        self.assertEqual(list(scorer.frame_gaps), [1, 5, 9, 13, 17, 21, 25,
+                                                   29])
+        # the same fits at the gaps sampled, and a spline between them
+        np.testing.assert_array_equal(scorer.scores,
+                self.scorer.scores[scorer.frame_gaps - 1])
+        for fgap in [1, 3, 29]:
+            dgap = np.ma.median(self.displacements[:, fgap])
+            self.assertTrue(np.isfinite(scorer(fgap, dgap)).all())
+        self.assertAlmostEqual(scorer(29, self.mean_d)[0, 0],
+                               self.scorer(29, self.mean_d)[0, 0])
+
+    def test_save_load(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = pathlib.Path(tmp) / 'scores.npz'
+            self.scorer.save(path, 'abc')
+            loaded = tapeworm.scoring.DisplacementScorer.load(path)
+        finally:
+            shutil.rmtree(tmp)
+
+        self.assertEqual(loaded.key, 'abc')
+        self.assertEqual(tuple(loaded.frame_gap_domain),
+                         tuple(self.scorer.frame_gap_domain))
+        self.assertEqual(tuple(loaded.distance_domain),
+                         tuple(self.scorer.distance_domain))
+        fgaps = np.linspace(self.min_f, self.max_f, 7)
+        dgaps = np.linspace(self.min_d, self.max_d, 9)
+        np.testing.assert_array_equal(loaded(fgaps, dgaps),
+                                      self.scorer(fgaps, dgaps))
+
+class TestBinnedKDE(unittest.TestCase):
+
+    def test_like_gaussian_kde(self):
+        rs = np.random.RandomState(0)
+        grid = np.linspace(0, 300, 1000)
+        for data in [rs.gamma(2, 20, 50), rs.uniform(0, 300, 400),
+                     np.abs(rs.normal(0, 5, 100))]:
+            for bandwidth in [None, 'silverman', 0.3]:
+                expected = sps.gaussian_kde(data, bandwidth)(grid)
+                np.testing.assert_allclose(
+                        tapeworm.scoring.binned_kde(data, grid, bandwidth),
+                        expected, rtol=0, atol=0.01 * expected.max())
+
+    def test_too_few(self):
+        self.assertRaises(ValueError, tapeworm.scoring.binned_kde, [1],
+                          np.linspace(0, 1, 10))
+
+class TestSavedScores(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = pathlib.Path(tempfile.mkdtemp())
+        self.path = self.tmp / 'synth1'
+        shutil.copytree(str(SYNTH1), str(self.path))
+
+        rs = np.random.RandomState(0)
+        self.displacements = np.ma.array(np.cumsum(
+                rs.rand(20, 30), axis=1) - rs.rand(20, 1))
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tmp))
+
+    def fit(self, displacements=None, **kwargs):
+        taper = tapeworm.tape.Taper(self.path, **kwargs)
+        if displacements is None:
+            displacements = self.displacements
+        taper._fit_scorer(displacements)
+        return taper.scorer
+
+    def test_reused(self):
+        fitted = self.fit()
+        self.assertTrue(any(self.path.glob('*' + tapeworm.scoring.SUFFIX)))
+
+        fit = tapeworm.scoring.DisplacementScorer.kde_fit
+        def fail(*args, **kwargs):
+            raise AssertionError('refitted')
+        tapeworm.scoring.DisplacementScorer.kde_fit = fail
+        try:
+            loaded = self.fit()
+        finally:
+            tapeworm.scoring.DisplacementScorer.kde_fit = fit
+        np.testing.assert_array_equal(loaded.scores, fitted.scores)
+
+    def test_refit_on_change(self):
+        fitted = self.fit()
+        self.assertFalse(self.fit(subsample=3).scores.shape ==
+                         fitted.scores.shape)
+        changed = self.displacements.copy()
+        changed[0, 5] = np.ma.masked
+        self.assertFalse(np.array_equal(self.fit(changed).scores,
+                                        fitted.scores))
+
+class TestCandidateScores(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.taper = tapeworm.tape.Taper(SYNTH1)
+        self.taper.scorer = tapeworm.scoring.DisplacementScorer(np.ma.array(
+                np.cumsum(rs.rand(20, 30), axis=1) - rs.rand(20, 1)))
+
+        termini = np.zeros(50, [('bid', 'int32'), ('loc', '2int16'),
+                                ('f', 'int32')])
+        termini['bid'] = np.arange(1, 51)
+        termini['loc'] = rs.randint(0, 20, (50, 2))
+        termini['f'] = rs.randint(0, 100, 50)
+        self.taper.ends, self.taper.starts = termini[:25], termini[25:]
+        self.taper._find_candidates(max_fgap=29)
+
+    def test_like_pairwise(self):
+        self.taper._score_candidates()
+        scored = 0
+        for connections in six.itervalues(self.taper.candidates):
+            for connection in six.itervalues(connections):
+                self.assertAlmostEqual(connection['score'], math.log10(
+                        self.taper.scorer(connection['f'],
+                                          connection['d']).max()))
+                scored += 1
+        self.assertTrue(scored)
+
+    def test_no_candidates(self):
+        self.taper.candidates = {1: {}}
+        self.taper._score_candidates()
+        self.assertEqual(self.taper.candidates, {1: {}})
+
 if __name__ == '__main__':
     unittest.main()
@@ -6,9 +6,6 @@ import six
 import sys
 import itertools
 import argparse
-#import gc
-import time
-import resource
 
 import multiworm
 
@@ -20,28 +17,9 @@ TEST_DATA_SETS = {
 }
 
 
-def memory_usage():
-    """Memory usage of the current process in kilobytes."""
-    status = None
-    result = {'peak': 0, 'rss': 0}
-    try:
-        # This will only work on systems with a /proc file system
-        # (like Linux).
-        status = open('/proc/self/status')
-        for line in status:
-            parts = line.split()
-            key = parts[0][2:-1].lower()
-            if key in result:
-                result[key] = int(parts[1])
-    finally:
-        if status is not None:
-            status.close()
-    return result
-
-def memprint():
-    m = memory_usage()
-    peak = m['peak']/1024
-    rss = m['rss']/1024
+def memprint(stats):
+    peak = stats.peak_rss / 2**20
+    rss = stats.rss / 2**20
     return 'Peak: {0:6.1f} MB, Current: {1:6.1f} MB'.format(peak, rss)
 
 def main():
@@ -50,19 +28,17 @@ def main():
     args = parser.parse_args()
 
     plate = multiworm.Experiment(TEST_DATA_SETS[args.test_set])
-    plate.add_summary_filter(multiworm.filters.summary_lifetime_minimum(120))
-    plate.load_summary()
+    lifetime = multiworm.filters.summary_lifetime_minimum(120)
+    bids = lifetime(plate.summary).index
 
-    ids = []
-    t = time.time()
-    for blob in itertools.islice(plate.good_blobs(), 50):
-        now = time.time()
-        t, tdelta = now, now - t
+    def report(bid, stats):
+        print(memprint(stats), 'ID: {0:5d}, t: {1:7.1f} ms'.format(
+            bid, stats.latency * 1000))
 
-        bid, bdata = blob
-        print(memprint(), 'ID: {0:5d}, t: {1:7.1f} ms'.format(bid, tdelta * 1000))
+    ids = []
+    stream = plate.stream(bids, callback=report)
+    for bid, bdata in itertools.islice(stream, 50):
         ids.append(bid)
-        blob, bdata = None, None
 
     print(ids)
 
@@ -0,0 +1,590 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import six
+from six.moves import zip, filter, map, reduce, input, range
+
+import json
+import pathlib
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+import multiworm
+from multiworm import synthetic
+from multiworm.analytics import (ragged, noise, smooth, NoiseEstimator,
+        SpeedEstimator, SpeedSketch, TDigest, ExperimentAnalyzer,
+        PlateTimeSeries, plate_timeseries)
+from multiworm.analytics.analytics import AnalysisMethod, _analyze_shard
+from multiworm.analytics.speed import batch_speeds
+
+
+TEST_ROOT = pathlib.Path(__file__).parent.resolve()
+DATA_DIR = TEST_ROOT / 'data'
+SYNTH1 = DATA_DIR / 'synth1'
+
+
+def random_centroids(rs, n_blobs, max_frames=300):
+    return [np.cumsum(rs.normal(0.1, 0.5, (rs.randint(1, max_frames), 2)),
+                      axis=0) for _ in range(n_blobs)]
+
+
+class TestRagged(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.arrays = [rs.normal(size=(n, 2)) for n in [3, 0, 1, 5, 2, 0]]
+        self.values, self.offsets = ragged.concatenate(self.arrays)
+
+    def check(self, result, reference):
+        for got, arr in zip(result, self.arrays):
+            if len(arr):
+                np.testing.assert_allclose(got, reference(arr))
+            else:
+                self.assertTrue(np.all(np.isnan(got)))
+
+    def test_roundtrip(self):
+        self.assertEqual(list(self.offsets), [0, 3, 3, 4, 9, 11, 11])
+        for got, arr in zip(ragged.split(self.values, self.offsets), self.arrays):
+            np.testing.assert_array_equal(got, arr)
+
+    def test_diff(self):
+        steps, offsets = ragged.diff(self.values, self.offsets)
+        for got, arr in zip(ragged.split(steps, offsets), self.arrays):
+            np.testing.assert_array_equal(got, np.diff(arr, axis=0))
+
+    def test_sums(self):
+        for got, arr in zip(ragged.sums(self.values, self.offsets), self.arrays):
+            np.testing.assert_allclose(got, arr.sum(axis=0))
+
+    def test_means(self):
+        self.check(ragged.means(self.values, self.offsets),
+                   lambda a: a.mean(axis=0))
+
+    def test_stds(self):
+        self.check(ragged.stds(self.values, self.offsets),
+                   lambda a: a.std(axis=0))
+
+    def test_medians(self):
+        self.check(ragged.medians(self.values, self.offsets),
+                   lambda a: np.median(a, axis=0))
+
+    def test_percentiles(self):
+        q = [0, 10, 50, 75, 100]
+        self.check(ragged.percentiles(self.values, self.offsets, q),
+                   lambda a: np.percentile(a, q, axis=0))
+
+    def test_select(self):
+        mask = self.values[:, 0] > 0
+        values, offsets = ragged.select(self.values, self.offsets, mask)
+        for got, arr in zip(ragged.split(values, offsets), self.arrays):
+            np.testing.assert_array_equal(got, arr[arr[:, 0] > 0])
+
+    def test_one_dimensional(self):
+        values, offsets = ragged.concatenate([[1, 2, 3], [10, 30]])
+        np.testing.assert_array_equal(ragged.medians(values, offsets), [2, 20])
+
+    def test_empty(self):
+        values, offsets = ragged.concatenate([])
+        self.assertEqual(len(values), 0)
+        self.assertEqual(list(offsets), [0])
+
+
+class TestNoiseEstimator(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = np.random.RandomState(0)
+        self.centroids = random_centroids(self.rs, 50)
+
+    def estimate(self, centroids, **kwargs):
+        estimator = NoiseEstimator(**kwargs)
+        for c in centroids:
+            estimator.process_blob({'centroid': [tuple(p) for p in c]})
+        estimator.process_blob(None)
+        return estimator.result()['noise']
+
+    def test_moments(self):
+        result = self.estimate(self.centroids, batch_size=7)
+        self.assertEqual(len(result['means']), len(self.centroids))
+        for means, sds, c in zip(result['means'], result['std_devs'],
+                                 self.centroids):
+            if len(c) < 2:
+                self.assertTrue(np.all(np.isnan(means)))
+                continue
+            steps = np.diff(c, axis=0)
+            np.testing.assert_allclose(means, steps.mean(axis=0))
+            np.testing.assert_allclose(sds, steps.std(axis=0))
+
+    def test_short_blobs_ignored(self):
+        result = self.estimate(self.centroids + [[(0, 0)]])
+        self.assertTrue(np.all(np.isfinite(result['mean_xy'])))
+
+    def test_result_shape(self):
+        centroids = [c for c in self.centroids if len(c) > 20]
+        for method in noise.METHODS:
+            result = self.estimate(centroids, method=method)
+            self.assertEqual(len(result['mean_xy']), 2)
+            self.assertEqual(len(result['std_dev_xy']), 2)
+            self.assertEqual(np.shape(result['means']), (len(centroids), 2))
+            self.assertEqual(np.shape(result['std_devs']), (len(centroids), 2))
+            np.testing.assert_allclose(result['std_dev_xy'], [0.5, 0.5],
+                                       rtol=0.1)
+
+    def test_mad_robust(self):
+        c = np.cumsum(self.rs.normal(0, 0.5, (1000, 2)), axis=0)
+        c[500:] += 200 # a jump, e.g. a blob merging with another
+        means, sds = noise.batch_step_stats([c], robust=True)
+        np.testing.assert_allclose(sds[0], [0.5, 0.5], rtol=0.1)
+        means, sds = noise.batch_step_stats([c])
+        self.assertTrue(np.all(sds[0] > 5))
+
+    def test_no_variance(self):
+        means, sds = noise.batch_step_stats([[(0, 0), (1, 2), (2, 4)]])
+        np.testing.assert_array_equal(means[0], [1, 2])
+        np.testing.assert_array_equal(sds[0], [0, 0])
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, NoiseEstimator, method='magic')
+
+
+def reference_speed_percentiles(centroid, percentiles, smoothing):
+    method, window = smoothing[:2]
+    xy = list(zip(*centroid))
+    xy_smoothed = [smooth.smooth(method, c, window, *smoothing[2:]) for c in xy]
+    dxy = np.diff(np.array(xy_smoothed), axis=1)
+    ds = np.linalg.norm(dxy, axis=0)
+    return np.percentile(ds, percentiles)
+
+
+class TestSmoothMany(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.segments = [np.cumsum(rs.normal(size=n)) for n in
+                         [0, 1, 2, 5, 30, 36, 40, 71, 100, 500]]
+        self.values, self.offsets = ragged.concatenate(self.segments)
+
+    def check(self, method, *args):
+        smoothed, offsets = smooth.smooth_many(method, self.values,
+                                               self.offsets, *args)
+        for got, segment in zip(ragged.split(smoothed, offsets), self.segments):
+            if not len(segment):
+                self.assertEqual(len(got), 0)
+                continue
+            np.testing.assert_allclose(
+                got, smooth.smooth(method, segment, *args), atol=1e-10)
+
+    def test_sgolay(self):
+        self.check('sgolay', 71, 5)
+        self.check('sgolay', 11, 3)
+
+    def test_fir(self):
+        self.check('hann', 11)
+        self.check('boxcar', 10)
+        self.check('gaussian', 15, 3)
+
+    def test_columns(self):
+        values = np.column_stack([self.values, self.values ** 2])
+        smoothed, _ = smooth.smooth_many('sgolay', values, self.offsets, 11, 3)
+        for k in range(2):
+            single, _ = smooth.smooth_many('sgolay', values[:, k],
+                                           self.offsets, 11, 3)
+            np.testing.assert_array_equal(smoothed[:, k], single)
+
+
+class TestSpeedEstimator(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = np.random.RandomState(0)
+        self.centroids = random_centroids(self.rs, 40, max_frames=500)
+
+    def check(self, smoothing, **kwargs):
+        percentiles = [10, 20, 50, 80, 90]
+        estimator = SpeedEstimator(percentiles, smoothing, **kwargs)
+        for c in self.centroids:
+            estimator.process_blob({'centroid': [tuple(p) for p in c]})
+        result = estimator.result()['speed']['percentiles']
+
+        self.assertEqual(len(result), len(self.centroids))
+        for got, c in zip(result, self.centroids):
+            if len(c) <= smoothing[1]:
+                continue # too short for the reference to make sense
+            np.testing.assert_allclose(got, reference_speed_percentiles(
+                    c, percentiles, smoothing), atol=1e-10)
+
+    def test_sgolay(self):
+        self.check(('sgolay', 71, 5), batch_size=7)
+
+    def test_fir(self):
+        self.check(('hann', 15))
+
+    def test_too_short(self):
+        estimator = SpeedEstimator([50], ('hann', 15))
+        estimator.process_blob({'centroid': [(0, 0), (1, 1)]})
+        result = estimator.result()['speed']['percentiles']
+        self.assertTrue(np.isnan(result[0][0]))
+
+
+class TestKernelCache(unittest.TestCase):
+
+    def test_shared(self):
+        a = smooth.kernel('sgolay', 71, 5)
+        b = smooth.kernel('sgolay', '71', '5')
+        self.assertIs(a.base, b.base)
+        self.assertFalse(a.flags.writeable)
+        self.assertIs(smooth.kernel('hann', 11), smooth.kernel('hann', 11.0))
+
+    def test_values(self):
+        np.testing.assert_allclose(smooth.kernel('hann', 10).sum(), 1)
+        # a Savitzky-Golay smoothing kernel preserves polynomials
+        x = np.arange(-35, 36)
+        np.testing.assert_allclose(
+            np.dot(smooth.kernel('sgolay', 71, 5), x ** 3), 0, atol=1e-6)
+        np.testing.assert_allclose(
+            np.dot(smooth.kernel('sgolay', 71, 5, deriv=1)[::-1], x), 1)
+
+    def test_bounded(self):
+        cache = smooth.fir_kernel.cache
+        for winlen in range(1, 400, 2):
+            smooth.kernel('boxcar', winlen)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+
+    def test_threaded(self):
+        results = []
+        def worker():
+            for winlen in range(5, 105, 2):
+                results.append((winlen, smooth.kernel('sgolay', winlen, 3)))
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(results), 4 * 50)
+        for winlen, k in results:
+            self.assertEqual(len(k), winlen)
+            np.testing.assert_array_equal(k, smooth.kernel('sgolay', winlen, 3))
+
+
+def rank_errors(digest, values, q):
+    # how far (as a fraction of all values) the estimates are from the
+    # requested quantiles
+    values = np.sort(values)
+    estimates = digest.quantile(q)
+    ranks = np.searchsorted(values, estimates) / len(values)
+    return np.abs(ranks - q)
+
+
+class TestTDigest(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.values = np.r_[rs.lognormal(0, 1, 100000), rs.normal(size=50000)]
+        rs.shuffle(self.values)
+        self.q = np.array([0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999])
+
+    def digest(self, values, **kwargs):
+        digest = TDigest(**kwargs)
+        for chunk in np.array_split(values, 37):
+            digest.add(chunk)
+        return digest
+
+    def test_accuracy(self):
+        digest = self.digest(self.values)
+        self.assertLess(rank_errors(digest, self.values, self.q).max(), 0.002)
+        self.assertEqual(digest.count, len(self.values))
+        self.assertLessEqual(len(digest), digest.compression)
+
+    def test_extremes(self):
+        digest = self.digest(self.values)
+        self.assertEqual(digest.quantile(0), self.values.min())
+        self.assertEqual(digest.quantile(1), self.values.max())
+
+    def test_merge(self):
+        parts = [self.digest(part) for part in np.array_split(self.values, 7)]
+        merged = TDigest()
+        for part in parts:
+            merged.merge(part)
+        self.assertLess(rank_errors(merged, self.values, self.q).max(), 0.002)
+        self.assertEqual(merged.count, len(self.values))
+
+    def test_deterministic(self):
+        a, b = self.digest(self.values), self.digest(self.values)
+        np.testing.assert_array_equal(a.means, b.means)
+        np.testing.assert_array_equal(a.weights, b.weights)
+
+    def test_serialize(self):
+        digest = self.digest(self.values)
+        state = json.loads(json.dumps(digest.to_dict()))
+        loaded = TDigest.from_dict(state)
+        np.testing.assert_array_equal(loaded.quantile(self.q),
+                                      digest.quantile(self.q))
+
+        loaded.merge(digest)
+        self.assertEqual(loaded.count, 2 * len(self.values))
+
+    def test_empty(self):
+        digest = TDigest()
+        digest.add([np.nan, np.inf])
+        self.assertEqual(len(digest), 0)
+        self.assertTrue(np.isnan(digest.percentile([10, 90])).all())
+        loaded = TDigest.from_dict(digest.to_dict())
+        self.assertEqual(loaded.count, 0)
+
+
+class TestSpeedSketch(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.centroids = random_centroids(rs, 200, max_frames=1000)
+        self.smoothing = ('sgolay', 11, 3)
+        self.speeds, _ = batch_speeds(*ragged.concatenate(self.centroids),
+                                      smoothing=self.smoothing)
+
+    def sketch(self, centroids):
+        sketch = SpeedSketch([10, 50, 90], self.smoothing, batch_size=30)
+        for c in centroids:
+            sketch.process_blob({'centroid': c})
+        return sketch
+
+    def test_pooled_percentiles(self):
+        result = self.sketch(self.centroids).result()['speed_sketch']
+        self.assertEqual(result['count'], len(self.speeds))
+        np.testing.assert_allclose(result['values'],
+                np.percentile(self.speeds, [10, 50, 90]), rtol=0.01)
+
+    def test_merge_saved(self):
+        whole = self.sketch(self.centroids).result()['speed_sketch']
+
+        first = self.sketch(self.centroids[:120])
+        saved = json.loads(json.dumps(self.sketch(self.centroids[120:])
+                                      .result()))
+        first.merge(SpeedSketch.from_result(saved))
+        merged = first.result()['speed_sketch']
+
+        self.assertEqual(merged['count'], whole['count'])
+        np.testing.assert_allclose(merged['values'], whole['values'],
+                                   rtol=0.01)
+
+
+def reference_timeseries(blobs, frame_times):
+    n = len(frame_times)
+    worms, areas = np.zeros(n), np.zeros(n)
+    speeds = [[] for _ in range(n)]
+    for blob in blobs:
+        previous = None
+        for frame, area, centroid in zip(blob['frame'], blob['area'],
+                                         blob['centroid']):
+            worms[frame - 1] += 1
+            areas[frame - 1] += area
+            if previous is not None:
+                f0, c0 = previous
+                speeds[frame - 1].append(
+                        np.hypot(centroid[0] - c0[0], centroid[1] - c0[1]) /
+                        (frame_times[frame - 1] - frame_times[f0 - 1]))
+            previous = frame, centroid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_areas = areas / worms
+    mean_speeds = [np.mean(s) if s else np.nan for s in speeds]
+    return worms, mean_speeds, mean_areas
+
+
+class TestPlateTimeSeries(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.frame_times = np.cumsum(rs.uniform(0.05, 0.15, 500))
+        self.blobs = []
+        for _ in range(60):
+            born = rs.randint(1, 500)
+            frames = np.arange(born, rs.randint(born, 501) + 1)
+            if rs.rand() < 0.5:
+                # a gap in tracking
+                frames = frames[rs.rand(len(frames)) < 0.8]
+            self.blobs.append({
+                'frame': frames.tolist(),
+                'area': rs.randint(50, 150, len(frames)).tolist(),
+                'centroid': [tuple(c) for c in
+                             rs.normal(size=(len(frames), 2)).cumsum(axis=0)],
+            })
+
+    def test_matches_reference(self):
+        method = PlateTimeSeries(self.frame_times, batch_size=7)
+        for blob in self.blobs:
+            method.process_blob(blob)
+        table = method.table()
+
+        worms, speeds, areas = reference_timeseries(self.blobs,
+                                                    self.frame_times)
+        self.assertEqual(list(table.index), list(range(1, 501)))
+        np.testing.assert_array_equal(table['time'], self.frame_times)
+        np.testing.assert_array_equal(table['worms'], worms)
+        np.testing.assert_allclose(table['mean_speed'], speeds)
+        np.testing.assert_allclose(table['mean_area'], areas)
+
+    def test_merge(self):
+        whole = PlateTimeSeries(self.frame_times)
+        first = whole.spawn()
+        second = whole.spawn()
+        for i, blob in enumerate(self.blobs):
+            whole.process_blob(blob)
+            (first if i < 25 else second).process_blob(blob)
+        first.merge(second)
+        merged = PlateTimeSeries(self.frame_times)
+        merged.merge(first)
+        np.testing.assert_allclose(merged.table(), whole.table())
+        self.assertRaises(ValueError, first.table)
+
+    def test_spawn_small(self):
+        # partials sent to shards hold neither the frame times nor arrays
+        # as long as the experiment
+        method = PlateTimeSeries(np.arange(10**6) / 10)
+        self.assertLess(len(pickle.dumps(method.spawn(), -1)), 2000)
+
+    def test_shard_partials_small(self):
+        # ...and those coming back only cover the frames of their blobs,
+        # without the blobs themselves
+        tmp = tempfile.mkdtemp()
+        try:
+            path = synthetic.generate(tmp, frames=50000, concurrent=1,
+                                      total_blobs=5, images=0)
+            ex = multiworm.Experiment(path)
+            ex.load_summary()
+            method = PlateTimeSeries(ex.frame_times)
+            locations = list(ex._blob_locations(ex.summary.index))
+            partials, _, _ = _analyze_shard(
+                    ([(bid, location, []) for bid, location in locations[-1:]],
+                     ex.filters, [method.spawn()], []))
+            partial, = partials
+        finally:
+            shutil.rmtree(tmp)
+
+        last = ex.summary.iloc[-1]
+        span = last['died_f'] - last['born_f'] + 1
+        self.assertEqual(partial._pending, [])
+        self.assertEqual(partial.first, last['born_f'] - 1)
+        self.assertEqual(len(partial.worms), span)
+        self.assertLess(len(pickle.dumps(partial, -1)), 2000 + 40 * span)
+
+        method.merge(pickle.loads(pickle.dumps(partial, -1)))
+        table = method.table()
+        self.assertEqual(table['worms'].sum(), partial.worms.sum())
+        self.assertEqual(table['worms'][last['born_f']], 1)
+
+    def test_out_of_range(self):
+        method = PlateTimeSeries(self.frame_times[:10])
+        method.process_blob(self.blobs[0])
+        self.assertRaises(multiworm.core.MWTDataError, method.table)
+
+    def test_experiment(self):
+        ex = multiworm.Experiment(SYNTH1)
+        ex.add_summary_filter(readable)
+        table = plate_timeseries(ex, workers=2, shard_size=1)
+        self.assertEqual(len(table), len(ex.frame_times))
+
+        blobs = [blob for _, blob in ex.good_blobs()]
+        worms, speeds, areas = reference_timeseries(blobs, ex.frame_times)
+        np.testing.assert_array_equal(table['worms'], worms)
+        np.testing.assert_allclose(table['mean_speed'], speeds)
+
+
+class BlobCounter(AnalysisMethod):
+    # picklable (module level) analyzer that records what it saw
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = []
+
+    def process_blob(self, blob):
+        self.frames.append(len(blob['frame']))
+
+    def merge(self, other):
+        self.frames.extend(other.frames)
+
+    def result(self):
+        return {'frames': self.frames}
+
+
+def readable(summary):
+    # the synth1 offsets for blobs 2-11 are stale
+    return summary.index.isin([1, 12])
+
+
+class TestExperimentAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        self.ex = multiworm.Experiment(SYNTH1)
+        self.ex.add_summary_filter(readable)
+
+    def analyzer(self):
+        analyzer = ExperimentAnalyzer()
+        analyzer.add_analysis_method(NoiseEstimator())
+        analyzer.add_analysis_method(SpeedEstimator([10, 50, 90], ('hann', 11)))
+        analyzer.add_analysis_method(BlobCounter())
+        return analyzer
+
+    def test_matches_serial(self):
+        serial = self.analyzer()
+        serial.analyze(self.ex.good_blobs())
+        expected = serial.results()
+
+        for workers, executor in [(None, 'process'), (2, 'process'),
+                                  (2, 'thread')]:
+            analyzer = self.analyzer()
+            analyzer.analyze_experiment(self.ex, workers=workers,
+                                        shard_size=1, executor=executor)
+            results = analyzer.results()
+            self.assertEqual(results['frames'], expected['frames'])
+            np.testing.assert_array_equal(results['noise']['means'],
+                                          expected['noise']['means'])
+            np.testing.assert_array_equal(results['speed']['percentiles'],
+                                          expected['speed']['percentiles'])
+
+    def test_partials_flushed(self):
+        # shards send back results, not blobs waiting to be batched
+        self.ex.load_summary()
+        blobs = [(bid, location, []) for bid, location in
+                 self.ex._blob_locations(self.ex._good_summary.index)]
+        analyzers = [NoiseEstimator(), SpeedEstimator([50], ('hann', 11)),
+                     SpeedSketch([50], ('hann', 11))]
+        partials, passes, _ = _analyze_shard(
+                (blobs, self.ex.filters, [a.spawn() for a in analyzers], []))
+        self.assertTrue(any(passes.values()))
+        for partial in partials:
+            self.assertEqual(partial._pending, [])
+
+    def test_filters_applied(self):
+        self.ex.add_filter(multiworm.filters.move_minimum(1e9))
+        analyzer = self.analyzer()
+        analyzer.analyze_experiment(self.ex, workers=2)
+        self.assertEqual(analyzer.results()['frames'], [])
+
+
+class TestMerge(unittest.TestCase):
+
+    def test_merge_in_order(self):
+        centroids = random_centroids(np.random.RandomState(1), 30)
+        blobs = [{'centroid': c} for c in centroids]
+        for make in [NoiseEstimator,
+                     lambda: SpeedEstimator([50], ('sgolay', 11, 3))]:
+            whole = make()
+            for b in blobs:
+                whole.process_blob(b)
+
+            first = make()
+            second = first.spawn()
+            for b in blobs[:13]:
+                first.process_blob(b)
+            for b in blobs[13:]:
+                second.process_blob(b)
+            first.merge(second)
+
+            a, b = whole.result(), first.result()
+            for key in a:
+                for field in ['means', 'std_devs', 'percentiles']:
+                    if field in a[key]:
+                        np.testing.assert_array_equal(a[key][field],
+                                                      b[key][field])
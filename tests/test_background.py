@@ -0,0 +1,98 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import six
+from six.moves import zip, filter, map, reduce, input, range
+
+import pathlib
+import shutil
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+
+import multiworm
+from multiworm import background
+
+
+TEST_ROOT = pathlib.Path(__file__).parent.resolve()
+DATA_DIR = TEST_ROOT / 'data'
+SYNTH1 = DATA_DIR / 'synth1'
+
+
+def noisy_reader(path):
+    # the fixture images are empty, so make up a plate for each
+    rs = np.random.RandomState(zlib.crc32(str(path).encode('utf-8')))
+    x, y = np.mgrid[0:30, 0:20]
+    plate = (x + y).astype(np.uint8)
+    noise = rs.randint(0, 3, plate.shape).astype(np.uint8)
+    worm = rs.randint(0, 20)
+    plate[worm:worm + 5, worm:worm + 2] = 255
+    return plate + noise
+
+def fail_reader(path):
+    raise AssertionError('read an image')
+
+
+class TestEstimate(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = ['img{}'.format(i) for i in range(15)]
+        stack = np.array([noisy_reader(p) for p in self.paths])
+        self.expected = np.median(stack, axis=0)
+
+    def test_median(self):
+        bg = background.estimate(self.paths, reader=noisy_reader)
+        np.testing.assert_array_equal(bg, self.expected)
+
+    def test_bands(self):
+        row_bytes = len(self.paths) * 20
+        for rows in [1, 7, 29]:
+            bg = background.estimate(self.paths, reader=noisy_reader,
+                                     max_bytes=rows * row_bytes)
+            np.testing.assert_array_equal(bg, self.expected)
+
+    def test_parallel(self):
+        for executor in ['thread', 'process']:
+            bg = background.estimate(self.paths, reader=noisy_reader,
+                    max_bytes=1000, workers=2, executor=executor)
+            np.testing.assert_array_equal(bg, self.expected)
+
+    def test_mismatched_shapes(self):
+        def reader(path):
+            return np.zeros((10, 10) if path == 'img3' else (10, 11))
+        self.assertRaises(multiworm.MWTDataError, background.estimate,
+                          self.paths, reader=reader)
+
+    def test_no_images(self):
+        self.assertRaises(ValueError, background.estimate, [])
+
+
+class TestExperimentBackground(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = pathlib.Path(tempfile.mkdtemp())
+        self.path = self.tmp / 'synth1'
+        shutil.copytree(str(SYNTH1), str(self.path))
+        self.ex = multiworm.Experiment(self.path)
+        self.ex.image_files.reader = noisy_reader
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tmp))
+
+    def test_memoized(self):
+        bg = self.ex.background(workers=2)
+        self.assertEqual(bg.shape, (30, 20))
+        self.ex.image_files.reader = fail_reader
+        self.assertIs(self.ex.background(), bg)
+
+    def test_saved(self):
+        bg = self.ex.background()
+        self.assertTrue(background.cache_path(self.ex).exists())
+
+        ex = multiworm.Experiment(self.path)
+        ex.image_files.reader = fail_reader
+        np.testing.assert_array_equal(ex.background(), bg)
+
+    def test_no_cache(self):
+        self.ex.background(cache=False)
+        self.assertFalse(background.cache_path(self.ex).exists())
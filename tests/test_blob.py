@@ -5,8 +5,12 @@ from six.moves import zip, filter, map, reduce, input, range
 import pathlib
 import unittest
 
+import numpy as np
+
 import multiworm
 from multiworm.blob import Blob
+from multiworm.readers.blob import (decode_outline, decode_outline_line,
+        encode_outline)
 
 
 TEST_ROOT = pathlib.Path(__file__).parent.resolve()
@@ -69,3 +73,65 @@ class TestBlobProperties(unittest.TestCase):
         blob = self.ex[12]
         df = blob.df
         self.assertIs(df, None)
+
+
+class TestBlobView(unittest.TestCase):
+
+    def setUp(self):
+        self.ex = multiworm.Experiment(SYNTH1)
+
+    def test_summary_fields(self):
+        view = self.ex.view(5)
+        summary = self.ex.summary_data(5)
+        for field in ['born_f', 'died_f', 'born_t', 'died_t', 'file_no']:
+            self.assertEqual(getattr(view, field), summary[field])
+            self.assertEqual(view[field], summary[field])
+
+    def test_no_instance_dict(self):
+        view = self.ex.view(1)
+        self.assertFalse(hasattr(view, '__dict__'))
+        self.assertRaises(AttributeError, setattr, view, 'thing', 1)
+
+    def test_data_matches_blob(self):
+        view = self.ex.view(1)
+        self.assertEqual(list(view['centroid']), list(self.ex[1]['centroid']))
+
+    def test_empty(self):
+        self.assertTrue(self.ex.view(12).empty)
+        self.assertEqual(self.ex.view(12)['centroid'], [])
+
+    def test_views_cover_experiment(self):
+        views = self.ex.views()
+        self.assertEqual([v.id for v in views], list(self.ex))
+        self.assertEqual([v.row for v in views], list(range(len(self.ex))))
+
+    def test_missing(self):
+        self.assertRaises(KeyError, self.ex.view, 99999)
+        self.assertRaises(AttributeError, getattr, self.ex.view(1), 'bogus')
+
+
+class TestOutlineEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.blob = multiworm.Experiment(SYNTH1)[1]
+
+    def test_round_trip(self):
+        for i in range(len(self.blob['frame'])):
+            if self.blob['contour_encode_len'][i] is None:
+                continue
+            outline = decode_outline_line(self.blob, i)
+            start, n_points, encoded = encode_outline(outline)
+            self.assertEqual(start, tuple(self.blob['contour_start'][i]))
+            np.testing.assert_array_equal(
+                    decode_outline(start, n_points, encoded), outline)
+
+    def test_points(self):
+        outline = [(5, 5), (6, 5), (6, 6), (5, 6), (4, 6)]
+        start, n_points, encoded = encode_outline(outline)
+        self.assertEqual((start, n_points), ((5, 5), 5))
+        np.testing.assert_array_equal(
+                decode_outline(start, n_points, encoded), outline)
+
+    def test_not_steps(self):
+        self.assertRaises(ValueError, encode_outline, [(0, 0), (1, 1)])
+        self.assertRaises(ValueError, encode_outline, [])
@@ -0,0 +1,114 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import six
+from six.moves import zip, filter, map, reduce, input, range
+
+import math
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import multiworm
+from multiworm import blobstats
+
+
+TEST_ROOT = pathlib.Path(__file__).parent.resolve()
+DATA_DIR = TEST_ROOT / 'data'
+SYNTH1 = DATA_DIR / 'synth1'
+
+# the synth1 offsets for blobs 2-11 are stale
+READABLE = [1, 12]
+
+
+class TestCompute(unittest.TestCase):
+
+    def test_values(self):
+        data = {
+            'frame': [1, 2, 3],
+            'centroid': [(0, 0), (3, 4), (3, 10)],
+            'area': [10, 20, 30],
+            'midline': [((0, 0), (0, 2)), None, ((0, 0), (0, 4))],
+        }
+        stats = dict(zip(blobstats.COLUMNS, blobstats.compute(data)))
+
+        self.assertEqual(stats['n_frames'], 3)
+        self.assertAlmostEqual(stats['move_px'], 13)
+        self.assertAlmostEqual(stats['path_px'], 11)
+        self.assertAlmostEqual(stats['mean_area'], 20)
+        self.assertAlmostEqual(stats['mean_midline'], 3)
+        self.assertEqual([stats[k] for k in ['bbox_x0', 'bbox_y0',
+                          'bbox_x1', 'bbox_y1']], [0, 0, 3, 10])
+
+    def test_empty(self):
+        stats = blobstats.compute(None)
+        self.assertEqual(stats[0], 0)
+        self.assertTrue(all(math.isnan(x) for x in stats[1:]))
+
+    def test_matches_filters(self):
+        ex = multiworm.Experiment(SYNTH1)
+        data = ex._blob_data(1)
+        stats = dict(zip(blobstats.COLUMNS, blobstats.compute(data)))
+        self.assertEqual(stats['n_frames'], len(data['frame']))
+        self.assertTrue(multiworm.filters.move_minimum(stats['move_px'])(data))
+        self.assertFalse(
+            multiworm.filters.move_minimum(stats['move_px'] + 1e-6)(data))
+
+
+class TestExperimentBlobStats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = pathlib.Path(tempfile.mkdtemp())
+        self.path = self.tmp / 'synth1'
+        shutil.copytree(str(SYNTH1), str(self.path))
+        self.ex = multiworm.Experiment(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tmp))
+
+    def test_columns_in_summary(self):
+        table = self.ex.load_blob_stats(bids=READABLE)
+        self.assertEqual(list(table.index), READABLE)
+        for column in blobstats.COLUMNS:
+            self.assertIn(column, self.ex.summary.columns)
+        self.assertEqual(self.ex.summary.loc[1, 'n_frames'],
+                         len(self.ex[1]['frame']))
+        self.assertTrue(np.isnan(self.ex.summary.loc[2, 'move_px']))
+        self.assertEqual(self.ex.view(1).move_px, table.loc[1, 'move_px'])
+
+    def test_parallel_identical(self):
+        serial = self.ex.load_blob_stats(bids=READABLE, cache=False)
+        ex = multiworm.Experiment(self.path)
+        parallel = ex.load_blob_stats(bids=READABLE, workers=2, cache=False)
+        self.assertTrue(serial.equals(parallel))
+
+    def test_summary_filter(self):
+        self.ex.load_blob_stats(bids=READABLE)
+        self.ex.add_summary_filter(lambda s: s['n_frames'] > 0)
+        self.assertEqual(self.ex.max_blobs, 1)
+
+    def test_cached(self):
+        self.ex.load_blob_stats(bids=[1])
+        self.assertTrue(blobstats.cache_path(self.ex).exists())
+
+        ex = multiworm.Experiment(self.path)
+        ex._blob_locations = None # any blob reads would fail
+        table = ex.load_blob_stats(bids=[1])
+        self.assertEqual(list(table.dtypes),
+                         [int] + [float] * (len(blobstats.COLUMNS) - 1))
+        self.assertTrue(table.equals(self.ex.blob_stats))
+
+    def test_cache_extended(self):
+        self.ex.load_blob_stats(bids=[1])
+        ex = multiworm.Experiment(self.path)
+        table = ex.load_blob_stats(bids=[12])
+        self.assertEqual(list(table.index), READABLE)
+        self.assertEqual(len(blobstats.read(ex)), 2)
+
+    def test_stale_cache_ignored(self):
+        self.ex.load_blob_stats(bids=[1])
+        mtime = blobstats.cache_path(self.ex).stat().st_mtime
+        os.utime(str(self.ex.summary_file), (mtime + 100, mtime + 100))
+        self.assertIsNone(blobstats.read(self.ex))
@@ -0,0 +1,125 @@
+from __future__ import absolute_import, print_function, unicode_literals
+import six
+from six.moves import zip, filter, map, reduce, input, range
+
+import pathlib
+import threading
+import unittest
+
+import numpy as np
+
+import multiworm
+import multiworm.cache
+from multiworm.cache import LRUCache
+
+
+TEST_ROOT = pathlib.Path(__file__).parent.resolve()
+DATA_DIR = TEST_ROOT / 'data'
+SYNTH1 = DATA_DIR / 'synth1'
+
+
+def kb(n):
+    return np.zeros(n * 1024, dtype=np.uint8)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache(10 * 1024)
+
+    def test_budget_in_bytes(self):
+        for i in range(5):
+            self.cache.put(i, kb(3))
+
+        self.assertLessEqual(self.cache.nbytes, 10 * 1024)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.evictions, 2)
+
+    def test_least_recent_evicted(self):
+        for i in range(3):
+            self.cache.put(i, kb(3))
+        self.cache.get(0)
+        self.cache.put(3, kb(3))
+
+        self.assertIn(0, self.cache)
+        self.assertNotIn(1, self.cache)
+
+    def test_hit_miss(self):
+        self.cache.put('a', kb(1))
+        self.cache.get('a')
+        self.cache.get('b')
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_pin(self):
+        self.cache.pin('hot')
+        self.cache.put('hot', kb(3))
+        for i in range(10):
+            self.cache.put(i, kb(3))
+        self.assertIn('hot', self.cache)
+
+        self.cache.unpin('hot')
+        for i in range(10):
+            self.cache.put(i, kb(3))
+        self.assertNotIn('hot', self.cache)
+
+    def test_oversize_skipped(self):
+        self.cache.put('big', kb(20))
+        self.assertNotIn('big', self.cache)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_threaded(self):
+        def hammer(offset):
+            for i in range(200):
+                self.cache.get_or_load((offset + i) % 7, lambda: kb(2))
+
+        threads = [threading.Thread(target=hammer, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.cache.nbytes,
+                         sum(self.cache.sizeof(kb(2)) for _ in self.cache._entries))
+        self.assertLessEqual(self.cache.nbytes, self.cache.max_bytes)
+
+
+class TestExperimentBlobCache(unittest.TestCase):
+
+    def setUp(self):
+        self.ex = multiworm.Experiment(SYNTH1)
+
+    def test_views_share_data(self):
+        a = self.ex[1]
+        b = self.ex[1]
+        a['centroid']
+        b['centroid']
+
+        self.assertIs(a.blob_data, b.blob_data)
+        self.assertEqual(self.ex.blob_cache.misses, 1)
+        self.assertEqual(self.ex.blob_cache.hits, 1)
+
+    def test_budget_disables(self):
+        ex = multiworm.Experiment(SYNTH1, cache_bytes=0)
+        ex[1]['centroid']
+        self.assertEqual(len(ex.blob_cache), 0)
+
+
+class TestMemoize(unittest.TestCase):
+
+    def test_memoized(self):
+        calls = []
+
+        @multiworm.cache.memoize(10 * 1024)
+        def make(n, fill=0):
+            calls.append((n, fill))
+            return np.full(n, fill)
+
+        a = make(10)
+        self.assertIs(make(10), a)
+        self.assertIsNot(make(10, fill=1), a)
+        self.assertEqual(calls, [(10, 0), (10, 1)])
+        self.assertFalse(a.flags.writeable)
+        self.assertEqual(make.cache.hits, 1)
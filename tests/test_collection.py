@@ -0,0 +1,80 @@
+from __future__ import absolute_import, print_function, unicode_literals
+import six
+from six.moves import zip, filter, map, reduce, input, range
+
+import pathlib
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import multiworm
+
+
+TEST_ROOT = pathlib.Path(__file__).parent.resolve()
+DATA_DIR = TEST_ROOT / 'data'
+SYNTH1 = DATA_DIR / 'synth1'
+
+
+def n_frames(blob):
+    return len(blob['frame'])
+
+def is_long(blob):
+    return len(blob['frame']) > 10
+
+def readable(summary):
+    # the synth1 offsets for blobs 2-11 are stale
+    return summary.loc[[1, 12]]
+
+
+class TestPickleExperiment(unittest.TestCase):
+
+    def test_roundtrip(self):
+        ex = multiworm.Experiment(SYNTH1, callback=lambda p: None)
+        ex[1]['centroid']
+        ex2 = pickle.loads(pickle.dumps(ex))
+
+        self.assertEqual(list(ex2), list(ex))
+        self.assertEqual(sorted(ex2.graph.edges()), sorted(ex.graph.edges()))
+        self.assertRaises(Exception, ex2.graph.add_node, 123)
+        self.assertEqual(len(ex2.blob_cache), 0)
+        self.assertEqual(list(ex2[1]['centroid']), list(ex[1]['centroid']))
+
+
+class TestExperimentCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = pathlib.Path(tempfile.mkdtemp())
+        self.paths = [SYNTH1, self.tmp / 'synth1copy']
+        shutil.copytree(str(SYNTH1), str(self.paths[1]))
+
+        self.plates = multiworm.ExperimentCollection(self.paths, workers=2)
+
+    def tearDown(self):
+        self.plates.close()
+        shutil.rmtree(str(self.tmp))
+
+    def test_opened(self):
+        self.assertEqual(list(self.plates), ['synth1', 'synth1copy'])
+        for eid in self.plates:
+            self.assertEqual(len(self.plates[eid]), 12)
+
+    def test_map(self):
+        result = self.plates.map(n_frames, summary_filter=readable)
+        expected = len(multiworm.Experiment(SYNTH1)[1]['frame'])
+        for eid in self.plates:
+            self.assertEqual(dict(result[eid]), {1: expected})
+
+    def test_filter(self):
+        result = self.plates.filter(is_long, summary_filter=readable)
+        self.assertEqual(dict(result), {'synth1': [1], 'synth1copy': [1]})
+
+    def test_reduce(self):
+        result = self.plates.reduce(lambda a, b: a + b, n_frames, 0,
+                                    summary_filter=readable)
+        self.assertEqual(result['synth1'], result['synth1copy'])
+        self.assertGreater(result['synth1'], 0)
+
+    def test_duplicate_ids(self):
+        self.assertRaises(ValueError, multiworm.ExperimentCollection,
+                          [SYNTH1, SYNTH1], executor='thread')
@@ -6,6 +6,7 @@ import pathlib
 import unittest
 
 import networkx as nx
+import numpy as np
 
 import multiworm
 
@@ -147,6 +148,101 @@ class TestReadingData(unittest.TestCase):
         self.assertEqual(SYNTH1_N_BLOBS, count)
 
 
+class TestParallelBlobs(unittest.TestCase):
+
+    def setUp(self):
+        self.ex = multiworm.Experiment(SYNTH1)
+        self.bids = [1, 12]
+        self.serial = dict(
+            (bid, list(blob['centroid']))
+            for bid, blob in self.ex.blobs(self.bids))
+
+    def check(self, pairs):
+        got = dict((bid, list(blob['centroid'])) for bid, blob in pairs)
+        self.assertEqual(self.serial, got)
+
+    def test_ordered(self):
+        pairs = list(self.ex.blobs(self.bids, workers=2))
+        self.assertEqual([bid for bid, _ in pairs], self.bids)
+        self.check(pairs)
+
+    def test_unordered(self):
+        self.check(self.ex.blobs(self.bids, workers=2, ordered=False,
+                                 prefetch=1))
+
+    def test_threads(self):
+        self.check(self.ex.blobs(self.bids, workers=2, executor='thread'))
+
+    def test_empty_blob(self):
+        blobs = dict(self.ex.blobs(self.bids, workers=2))
+        self.assertTrue(blobs[12].empty)
+        self.assertFalse(blobs[1].empty)
+
+    def test_worker_errors_raised(self):
+        # the synth1 offset for blob 2 doesn't point at its header
+        blobs = self.ex.blobs([1, 2], workers=2)
+        self.assertRaises(multiworm.core.MWTBlobsError, list, blobs)
+
+
+def readable(summary):
+    # the synth1 offsets for blobs 2-11 are stale
+    return summary.index.isin([1, 12])
+
+def has_frames(blob):
+    return len(blob['frame']) > 0
+
+
+class TestFilterPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.ex = multiworm.Experiment(SYNTH1)
+        self.ex.add_summary_filter(readable)
+
+    def test_summary_filters_combined(self):
+        self.ex.add_summary_filter(multiworm.filters.exists_in_frame(10))
+        self.ex.load_summary()
+        self.assertEqual(self.ex.max_blobs, 1)
+
+    def test_filters_added_after_load(self):
+        self.ex.load_summary()
+        self.assertEqual(self.ex.max_blobs, 2)
+        self.ex.add_summary_filter(multiworm.filters.exists_in_frame(10))
+        self.assertEqual(self.ex.max_blobs, 1)
+
+    def test_good_blobs_skips_empty(self):
+        good = dict(self.ex.good_blobs())
+        self.assertEqual(list(good), [1])
+        self.assertEqual(list(good[1]['centroid']),
+                         list(self.ex[1]['centroid']))
+
+    def test_blob_filter(self):
+        self.ex.add_filter(has_frames)
+        self.assertEqual([bid for bid, _ in self.ex.good_blobs()], [1])
+
+        self.ex.add_filter(multiworm.filters.relative_move_minimum(1e6))
+        self.assertEqual(list(self.ex.good_blobs()), [])
+
+    def test_parallel(self):
+        self.ex.add_filter(has_frames)
+        self.ex.add_filter(multiworm.filters.relative_move_minimum(0))
+        good = list(self.ex.good_blobs(workers=2))
+        self.assertEqual([bid for bid, _ in good], [1])
+
+    def test_streaming_filters(self):
+        self.ex.add_filter(multiworm.filters.area_minimum(0))
+        self.ex.add_filter(has_frames)
+        self.assertEqual([bid for bid, _ in self.ex.good_blobs()], [1])
+
+        self.ex.add_filter(multiworm.filters.move_minimum(1e6))
+        self.assertEqual(list(self.ex.good_blobs(workers=2)), [])
+
+    def test_progress(self):
+        self.assertEqual(self.ex.progress(), (0, 2))
+        progress = [self.ex.progress() for _ in self.ex.good_blobs()]
+        self.assertEqual(progress, [(1, 2)])
+        self.assertEqual(self.ex.progress(), (2, 2))
+
+
 class TestExperimentProperties(unittest.TestCase):
 
     def setUp(self):
@@ -168,3 +264,22 @@ class TestExperimentProperties(unittest.TestCase):
         G = self.ex.graph.copy()
         G.add_node(123)
         G.add_edge(55, 66)
+
+
+class TestImagePatches(unittest.TestCase):
+
+    def test_centered_on_blob(self):
+        ex = multiworm.Experiment(SYNTH1)
+        x, y = np.mgrid[0:1200, 0:1200]
+        ex.image_files.reader = lambda path: 10000 * x + y
+        blob = ex[1]
+        patches = ex.image_patches(1, [0, 1e10], 10)
+        self.assertEqual(patches.shape, (2, 10, 10))
+
+        for patch, i in zip(patches, [0, -1]):
+            cx, cy = np.round(blob['centroid'][i]).astype(int)
+            self.assertEqual(patch[5, 5], 10000 * cx + cy)
+
+    def test_empty_blob(self):
+        ex = multiworm.Experiment(SYNTH1)
+        self.assertRaises(multiworm.MWTDataError, ex.image_patches, 12, [0], 10)
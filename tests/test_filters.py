@@ -0,0 +1,180 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+import six
+from six.moves import zip, filter, map, reduce, input, range
+
+import math
+import unittest
+
+import numpy as np
+
+import multiworm.filters as mwf
+
+
+def reference_midline_length(points):
+    dist = 0
+    ipoints = iter(points)
+    a = six.next(ipoints)
+    for b in ipoints:
+        dist += math.sqrt((a[0] - b[0])**2 + (a[1] - b[1])**2)
+        a = b
+    return dist
+
+def reference_relative_move(blob, threshold):
+    xcent, ycent = tuple(zip(*blob['centroid']))
+    move_px = (max(xcent) - min(xcent)) + (max(ycent) - min(ycent))
+    size_px = (
+        sum(reference_midline_length(p) for p in blob['midline'] if p)
+        / len(blob['midline']))
+    return move_px >= size_px * threshold
+
+
+def random_blob(rs, n_frames, step, midline_frac=0.8):
+    centroid = np.cumsum(rs.normal(0, step, (n_frames, 2)), axis=0) + 500
+    midline = []
+    for _ in range(n_frames):
+        if rs.rand() < midline_frac:
+            pts = np.cumsum(rs.randint(-3, 4, (11, 2)), axis=0)
+            midline.append(tuple(tuple(int(c) for c in p) for p in pts))
+        else:
+            midline.append(None)
+    return {
+        'centroid': [tuple(c) for c in centroid],
+        'midline': midline,
+    }
+
+
+class TestRelativeMoveMinimum(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = np.random.RandomState(0)
+
+    def test_same_decisions(self):
+        for step in [0.1, 0.5, 1, 2, 5]:
+            for _ in range(20):
+                blob = random_blob(self.rs, self.rs.randint(2, 200), step)
+                for threshold in [0.5, 1, 2, 4]:
+                    self.assertEqual(
+                        bool(mwf.relative_move_minimum(threshold)(blob)),
+                        reference_relative_move(blob, threshold))
+
+    def test_array_backed(self):
+        blob = random_blob(self.rs, 100, 1, midline_frac=1)
+        arrays = {
+            'centroid': np.array(blob['centroid']),
+            'midline': np.array(blob['midline']),
+        }
+        for threshold in [0.5, 1, 2, 4]:
+            f = mwf.relative_move_minimum(threshold)
+            self.assertEqual(f(blob), f(arrays))
+
+    def test_no_midlines(self):
+        blob = random_blob(self.rs, 10, 1, midline_frac=0)
+        self.assertTrue(mwf.relative_move_minimum(2)(blob))
+
+    def test_midline_length(self):
+        pts = [(0, 0), (3, 4), (3, 10)]
+        self.assertAlmostEqual(mwf._midline_length(pts), 11)
+        self.assertAlmostEqual(
+            mwf._midline_length(pts), reference_midline_length(pts))
+
+
+def random_shape_blob(rs, n_frames):
+    vector = rs.normal(0, 3, (n_frames, 2))
+    vector[rs.rand(n_frames) < 0.05] = 0
+    ortho = rs.uniform(0, 3, n_frames)
+    ortho[rs.rand(n_frames) < 0.05] = 0
+    return {
+        'area': list(rs.randint(0, 100, n_frames)),
+        'std_vector': [tuple(v) for v in vector],
+        'std_ortho': list(ortho),
+        'centroid': [tuple(c) for c in
+                     np.cumsum(rs.normal(0, 1, (n_frames, 2)), axis=0)],
+    }
+
+def streamed(f, blob):
+    # like screen(), but over the already-parsed fields
+    state = f.start(len(blob[f.fields[0]]))
+    for values in zip(*(blob[field] for field in f.fields)):
+        outcome = f.update(state, values)
+        if outcome is not None:
+            return outcome
+    return f.finish(state)
+
+
+class TestStreamingFilters(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = np.random.RandomState(0)
+        self.blobs = [random_shape_blob(self.rs, self.rs.randint(1, 100))
+                      for _ in range(100)]
+
+    def check_consistent(self, f):
+        outcomes = []
+        for blob in self.blobs:
+            outcome = bool(f(blob))
+            self.assertEqual(outcome, streamed(f, blob))
+            self.assertEqual(outcome, mwf.StreamingFilter.__call__(f, blob))
+            outcomes.append(outcome)
+        # make sure the test is meaningful
+        self.assertTrue(any(outcomes))
+        self.assertFalse(all(outcomes))
+
+    def test_area_minimum(self):
+        for fraction in [0, 0.25, 0.5, 0.9]:
+            self.check_consistent(mwf.area_minimum(50, fraction))
+
+    def test_area_minimum_reference(self):
+        f = mwf.area_minimum(50)
+        for blob in self.blobs:
+            small = sum(1 for a in blob['area'] if a < 50)
+            self.assertEqual(f(blob), small <= len(blob['area']) / 2)
+
+    def test_aspect_ratio_minimum(self):
+        for fraction in [0, 0.5, 0.9]:
+            self.check_consistent(mwf.aspect_ratio_minimum(1.5, fraction))
+
+    def test_aspect_ratio_degenerate(self):
+        f = mwf.aspect_ratio_minimum(1, max_fraction=0)
+        self.assertFalse(f({'std_vector': [(0, 0)], 'std_ortho': [0]}))
+        self.assertTrue(f({'std_vector': [(1, 0)], 'std_ortho': [0]}))
+        self.assertFalse(streamed(f, {'std_vector': [(0, 0)], 'std_ortho': [0]}))
+        self.assertTrue(streamed(f, {'std_vector': [(1, 0)], 'std_ortho': [0]}))
+
+    def test_move_minimum(self):
+        self.check_consistent(mwf.move_minimum(10))
+
+    def test_early_exit(self):
+        f = mwf.area_minimum(50, max_fraction=0)
+        state = f.start(1000)
+        self.assertIs(f.update(state, (10,)), False)
+
+        f = mwf.move_minimum(5)
+        state = f.start(1000)
+        self.assertIsNone(f.update(state, ((0, 0),)))
+        self.assertIs(f.update(state, ((3, 3),)), True)
+
+
+class TestScreen(unittest.TestCase):
+
+    LINE = '{} {:.3f} 10.0 20.0 {} 1.0 0.0 1.0 5 5\n'
+
+    def lines(self, areas):
+        return [self.LINE.format(i + 1, i / 10, a) for i, a in enumerate(areas)]
+
+    def test_passes_through(self):
+        lines = self.lines([60] * 5)
+        data = mwf.screen(lines, [mwf.area_minimum(50)])
+        self.assertEqual(data, mwf.screen(lines, []))
+        self.assertEqual(data['area'], [60] * 5)
+        self.assertEqual(data['frame'], [1, 2, 3, 4, 5])
+
+    def test_stops_parsing(self):
+        # the last line is garbage; rejecting early never gets to it
+        lines = self.lines([10, 10, 10, 60]) + ['not a blob line']
+        self.assertIsNone(mwf.screen(lines, [mwf.area_minimum(50)]))
+        with self.assertRaises(Exception):
+            mwf.screen(lines, [])
+
+    def test_rejected_at_finish(self):
+        lines = self.lines([60, 60, 10, 10, 10])
+        self.assertIsNone(mwf.screen(lines, [mwf.move_minimum(1)]))
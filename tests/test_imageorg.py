@@ -3,9 +3,12 @@ import six
 from six.moves import zip, filter, map, reduce, input, range
 
 import pathlib
+import pickle
 import unittest
 import warnings
 
+import numpy as np
+
 import multiworm
 import multiworm.readers.image as mwimg
 
@@ -173,3 +176,165 @@ class TestImageOrganizer(unittest.TestCase):
     def test_spanning_time_errors_not_2(self):
         self.assertRaisesRegexp(ValueError, 'two', self.ifo.spanning, time=[0.1])
         self.assertRaisesRegexp(ValueError, 'two', self.ifo.spanning, time=[0.11, 0.22, 0.33])
+
+    def test_nearest_many_times(self):
+        times = [0, 0.0501, 0.2499, 0.4]
+        paths, image_times = self.ifo.nearest_many(times=times)
+        self.assertEqual(paths, [self.ifo.nearest(time=t)[0] for t in times])
+        self.assertEqual(list(image_times), [0.1, 0.1, 0.2, 0.3])
+
+    def test_nearest_many_frames(self):
+        frames = [0, 3, 4, 9]
+        paths, _ = self.ifo.nearest_many(frames=frames)
+        self.assertEqual(paths, [self.ifo.nearest(frame=f)[0] for f in frames])
+
+    def test_nearest_many_no_kwargs(self):
+        self.assertRaisesRegexp(ValueError, 'either', self.ifo.nearest_many)
+
+    def test_nearest_tie_goes_low(self):
+        self.assertSameEntry(self.ifo.nearest(time=0.15), eix=0)
+
+    def test_index_invalidated(self):
+        self.assertSameEntry(self.ifo.nearest(time=0.5), eix=2)
+        self.ifo[0.5] = 'd'
+        self.assertEqual(self.ifo.nearest(time=0.5), ('d', 0.5))
+        del self.ifo[0.5]
+        self.assertSameEntry(self.ifo.nearest(time=0.5), eix=2)
+
+    def test_matches_brute_force(self):
+        ifo = mwimg.ImageFileOrganizer(mwimg.find(SYNTH1, 'test_blobsfile'),
+                                       experiment=ArbitraryShim())
+        keys = list(ifo)
+        for t in [-1, 0, 0.0095, 1.5, 50, 100.1, 1e10]:
+            self.assertEqual(ifo.nearest(time=t)[1],
+                             mwimg.find_nearest(sorted(keys), t))
+        self.assertEqual(len(ifo.spanning(time=[0, 1e10])), len(keys))
+
+
+class FakeReader(object):
+    """Stands in for PNG decoding; the fixture images are empty files"""
+    def __init__(self):
+        self.reads = []
+
+    def __call__(self, path):
+        self.reads.append(path)
+        return np.full((8, 8), len(str(path)), dtype=np.uint8)
+
+
+class TestImageLoading(unittest.TestCase):
+
+    def setUp(self):
+        self.reader = FakeReader()
+        self.entries = dict((t / 10, 'img{}'.format(t)) for t in range(5))
+
+    def organizer(self, **kwargs):
+        return mwimg.ImageFileOrganizer(self.entries,
+                experiment=ArbitraryShim(), reader=self.reader, **kwargs)
+
+    def test_decoded_once(self):
+        ifo = self.organizer()
+        a, t = ifo.load(time=0.21)
+        b, _ = ifo.load(time=0.19)
+        self.assertAlmostEqual(t, 0.2)
+        self.assertIs(a, b)
+        self.assertEqual(self.reader.reads, ['img2'])
+
+    def test_budget(self):
+        ifo = self.organizer(cache_bytes=2 * 64)
+        for t in [0, 0.1, 0.2, 0]:
+            ifo.load(time=t)
+        self.assertEqual(self.reader.reads, ['img0', 'img1', 'img2', 'img0'])
+
+    def test_prefetch(self):
+        ifo = self.organizer(prefetch=1)
+        try:
+            ifo.load(time=0.2)
+            ifo.close() # waits for the prefetching to finish
+            self.assertEqual(sorted(self.reader.reads), ['img1', 'img2', 'img3'])
+
+            ifo.load(time=0.3)
+            ifo.load(time=0.1)
+            self.assertEqual(self.reader.reads.count('img3'), 1)
+            self.assertEqual(self.reader.reads.count('img1'), 1)
+        finally:
+            ifo.close()
+
+    def test_pickle(self):
+        ifo = self.organizer(prefetch=1)
+        ifo.load(time=0)
+        ifo.close()
+        ifo2 = pickle.loads(pickle.dumps(ifo))
+        self.assertEqual(dict(ifo2), self.entries)
+        self.assertEqual(len(ifo2.image_cache), 0)
+        self.assertEqual(ifo2.prefetch, 1)
+
+
+def coordinate_reader(path):
+    # each pixel holds 100 * x + y, offset by the image number in the path
+    x, y = np.mgrid[0:50, 0:40]
+    return 100 * x + y + 10000 * int(str(path)[3:])
+
+
+class TestImagePatches(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = dict((t / 10, 'img{}'.format(t)) for t in range(5))
+        self.reads = []
+        def reader(path):
+            self.reads.append(path)
+            return coordinate_reader(path)
+        self.ifo = mwimg.ImageFileOrganizer(self.entries,
+                experiment=ArbitraryShim(), reader=reader)
+
+    def test_patches(self):
+        patches = self.ifo.patches([0.1, 0.31, 0.1], [(10, 20), (5, 6), (30, 3)], 4)
+        self.assertEqual(patches.shape, (3, 4, 4))
+        self.assertEqual(patches[0, 0, 0], 10000 + 100 * 8 + 18)
+        self.assertEqual(patches[1, 2, 2], 30000 + 100 * 5 + 6)
+        self.assertEqual(patches[2, 2, 2], 10000 + 100 * 30 + 3)
+        self.assertEqual(sorted(self.reads), ['img1', 'img3'])
+
+    def test_rectangular(self):
+        patches = self.ifo.patches([0], [(10, 10)], (3, 5))
+        self.assertEqual(patches.shape, (1, 3, 5))
+        self.assertEqual(patches[0, 1, 2], 100 * 10 + 10)
+
+    def test_edges_filled(self):
+        patches = self.ifo.patches([0, 0], [(0, 0), (-100, -100)], 4, fill=-1)
+        self.assertEqual(patches[0, 0, 0], -1)
+        self.assertEqual(patches[0, 2, 2], 0)
+        self.assertTrue(np.all(patches[1] == -1))
+
+    def test_fill_promoted(self):
+        image = np.arange(12, dtype=np.uint8).reshape(3, 4)
+        corners = np.array([(-1, 0), (0, 0)])
+        patches = mwimg.cut_patches(image, corners, (2, 2), fill=-1)
+        self.assertEqual(patches.dtype, np.int16)
+        self.assertEqual(patches[0, 0, 0], -1)
+        self.assertEqual(patches[0, 1, 0], 0)
+
+        patches = mwimg.cut_patches(image, corners, (2, 2), fill=np.nan)
+        self.assertTrue(np.isnan(patches[0, 0]).all())
+        np.testing.assert_array_equal(patches[1], image[:2, :2])
+
+        patches = mwimg.cut_patches(image, corners, (2, 2))
+        self.assertEqual(patches.dtype, np.uint8)
+
+    def test_cached_images_used(self):
+        self.ifo.load(time=0.2)
+        self.ifo.patches([0.2, 0.2], [(10, 10), (20, 20)], 4)
+        self.assertEqual(self.reads, ['img2'])
+
+    def test_parallel_identical(self):
+        times = np.linspace(0, 0.4, 30)
+        centers = np.random.RandomState(0).uniform(-5, 55, (30, 2))
+        serial = self.ifo.patches(times, centers, 6)
+        for executor in ['thread', 'process']:
+            ifo = mwimg.ImageFileOrganizer(self.entries,
+                    experiment=ArbitraryShim(), reader=coordinate_reader)
+            parallel = ifo.patches(times, centers, 6, workers=2,
+                                   executor=executor)
+            np.testing.assert_array_equal(serial, parallel)
+
+    def test_mismatched(self):
+        self.assertRaises(ValueError, self.ifo.patches, [0, 0.1], [(1, 1)], 4)
@@ -0,0 +1,225 @@
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import functools
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+import multiworm
+from multiworm.analytics import (ExperimentAnalyzer, NoiseEstimator,
+        SpeedEstimator)
+from multiworm.analytics.analytics import AnalysisMethod
+from multiworm.analytics.resultcache import (ResultCache, fingerprint,
+        params_hash, filters_hash)
+
+TEST_ROOT = pathlib.Path(__file__).parent.resolve()
+DATA_DIR = TEST_ROOT / 'data'
+SYNTH1 = DATA_DIR / 'synth1'
+
+
+class FrameCounter(AnalysisMethod):
+    # cacheable analyzer that remembers which blobs it computed
+    computed = []
+
+    def __init__(self, scale=1):
+        self.scale = scale
+        self.reset()
+
+    def reset(self):
+        self.counts = []
+
+    def merge(self, other):
+        self.counts.extend(other.counts)
+
+    def process_blob(self, blob):
+        self.add_outputs(self.blob_outputs([blob]))
+
+    def cache_params(self):
+        return {'scale': self.scale}
+
+    def blob_outputs(self, blobs):
+        FrameCounter.computed.extend(b['frame'][0] for b in blobs)
+        return [self.scale * len(b['frame']) for b in blobs]
+
+    def add_outputs(self, outputs):
+        self.counts.extend(outputs)
+
+    def result(self):
+        return {'counts': self.counts}
+
+
+def readable(summary):
+    # the synth1 offsets for blobs 2-11 are stale
+    return summary.index.isin([1, 12])
+
+
+def long_blob(blob):
+    return len(blob['frame']) > 10
+
+
+class EveryFrame(multiworm.filters.StreamingFilter):
+    fields = ('frame',)
+
+    def start(self, n_frames):
+        return None
+
+    def update(self, state, values):
+        return None
+
+    def finish(self, state):
+        return True
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = pathlib.Path(tempfile.mkdtemp())
+        self.cache = ResultCache(self.tmp / 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tmp))
+
+    def test_missing(self):
+        self.assertEqual(self.cache.load(('a', 'b', 'c')), {})
+
+    def test_round_trip(self):
+        entries = {1: np.arange(3.0), 5: (1, 2)}
+        self.cache.store(('a', 'b', 'c'), entries)
+        loaded = self.cache.load(('a', 'b', 'c'))
+        self.assertEqual(sorted(loaded), [1, 5])
+        np.testing.assert_array_equal(loaded[1], entries[1])
+        self.assertEqual(loaded[5], (1, 2))
+
+    def test_eviction(self):
+        data = {1: np.zeros(1000)}
+        for n, key in enumerate(['old', 'used', 'new']):
+            self.cache.store((key, 'x', 'y'), data)
+            path = self.cache._file((key, 'x', 'y'))
+            os.utime(str(path), (1e9 + n, 1e9 + n))
+        self.cache.load(('old', 'x', 'y')) # now the most recent
+
+        self.cache.max_bytes = 2.5 * 8000
+        self.cache.store(('newest', 'x', 'y'), data)
+        self.assertEqual(self.cache.load(('used', 'x', 'y')), {})
+        self.assertEqual(len(self.cache.load(('old', 'x', 'y'))), 1)
+        self.assertEqual(len(self.cache.load(('newest', 'x', 'y'))), 1)
+        self.assertLessEqual(self.cache.nbytes, self.cache.max_bytes)
+
+    def test_write_error(self):
+        (self.tmp / 'file').touch()
+        cache = ResultCache(self.tmp / 'file')
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            cache.store(('a', 'b', 'c'), {1: 2})
+        self.assertEqual(len(w), 1)
+
+    def test_hashes(self):
+        self.assertEqual(params_hash({'a': 1, 'b': [2, 3]}),
+                         params_hash({'b': [2, 3], 'a': 1}))
+        self.assertNotEqual(params_hash({'a': 1}), params_hash({'a': 2}))
+        self.assertIsNone(filters_hash([lambda blob: True]))
+        self.assertEqual(
+                filters_hash([multiworm.filters.area_minimum(50)]),
+                filters_hash([multiworm.filters.area_minimum(50)]))
+        self.assertNotEqual(
+                filters_hash([multiworm.filters.area_minimum(50)]),
+                filters_hash([multiworm.filters.area_minimum(60)]))
+        self.assertIsNotNone(
+                filters_hash([multiworm.filters.relative_move_minimum(2)]))
+
+    def test_user_filters_not_hashed(self):
+        # their code isn't in the pickle, so edits would go unnoticed
+        self.assertIsNone(filters_hash([long_blob]))
+        self.assertIsNone(filters_hash([multiworm.filters.area_minimum(50),
+                                        EveryFrame()]))
+        self.assertIsNone(filters_hash([functools.partial(long_blob)]))
+
+    def test_stale_entries(self):
+        self.cache.path.mkdir()
+        for data in [b'cmultiworm\nNoSuchThing\n.',
+                     b'cno_such_module_here\nthing\n.']:
+            with self.cache._file(('a', 'b', 'c')).open('wb') as f:
+                f.write(data)
+            self.assertEqual(self.cache.load(('a', 'b', 'c')), {})
+
+
+class TestCachedAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = pathlib.Path(tempfile.mkdtemp())
+        self.path = self.tmp / 'synth1'
+        shutil.copytree(str(SYNTH1), str(self.path))
+        self.cache = ResultCache(self.tmp / 'cache')
+        FrameCounter.computed = []
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tmp))
+
+    def experiment(self, filters=()):
+        ex = multiworm.Experiment(self.path)
+        ex.add_summary_filter(readable)
+        for f in filters:
+            ex.add_filter(f)
+        return ex
+
+    def analyze(self, *methods, **kwargs):
+        analyzer = ExperimentAnalyzer()
+        for method in methods:
+            analyzer.add_analysis_method(method)
+        analyzer.analyze_experiment(kwargs.pop('experiment', None) or
+                                    self.experiment(), **kwargs)
+        return analyzer.results()
+
+    def test_same_results(self):
+        methods = lambda: [NoiseEstimator(), SpeedEstimator([10, 90],
+                                                            ('hann', 11))]
+        expected = self.analyze(*methods())
+        for _ in range(2):
+            results = self.analyze(*methods(), cache=self.cache, workers=2)
+            self.assertEqual(results['noise']['means'],
+                             expected['noise']['means'])
+            np.testing.assert_array_equal(results['speed']['percentiles'],
+                                          expected['speed']['percentiles'])
+
+    def test_only_missing(self):
+        first = self.analyze(FrameCounter(), cache=self.cache)
+        self.assertEqual(len(FrameCounter.computed), 1) # only blob 1 has data
+
+        FrameCounter.computed = []
+        again = self.analyze(FrameCounter(), cache=self.cache)
+        self.assertEqual(FrameCounter.computed, [])
+        self.assertEqual(again, first)
+
+        changed = self.analyze(FrameCounter(scale=2), cache=self.cache)
+        self.assertEqual(len(FrameCounter.computed), 1)
+        self.assertEqual(changed['counts'], [2 * c for c in first['counts']])
+
+    def test_filters(self):
+        strict = [multiworm.filters.area_minimum(1e9)]
+        self.assertEqual(self.analyze(FrameCounter(), cache=self.cache,
+                experiment=self.experiment(strict))['counts'], [])
+        self.assertEqual(FrameCounter.computed, [])
+
+        # cached outputs are reused for blobs passing other filters
+        loose = self.analyze(FrameCounter(), cache=self.cache)
+        FrameCounter.computed = []
+        self.assertEqual(self.analyze(FrameCounter(), cache=self.cache,
+                experiment=self.experiment(strict))['counts'], [])
+        self.assertEqual(loose, self.analyze(FrameCounter(), cache=self.cache))
+        self.assertEqual(FrameCounter.computed, [])
+
+    def test_data_changed(self):
+        ex = self.experiment()
+        before = fingerprint(ex)
+        summary = ex.summary_file
+        os.utime(str(summary), (summary.stat().st_atime + 10,
+                                summary.stat().st_mtime + 10))
+        self.assertNotEqual(fingerprint(self.experiment()), before)
@@ -0,0 +1,52 @@
+from __future__ import absolute_import, print_function, unicode_literals
+import six
+from six.moves import zip, filter, map, reduce, input, range
+
+import pathlib
+import unittest
+
+import multiworm
+
+
+TEST_ROOT = pathlib.Path(__file__).parent.resolve()
+DATA_DIR = TEST_ROOT / 'data'
+SYNTH1 = DATA_DIR / 'synth1'
+
+
+class TestBlobStream(unittest.TestCase):
+
+    def setUp(self):
+        self.ex = multiworm.Experiment(SYNTH1)
+        self.bids = [1, 12]
+
+    def test_yields_data(self):
+        got = dict((bid, data and list(data['centroid']))
+                   for bid, data in self.ex.stream(self.bids))
+        self.assertEqual(got[1], list(self.ex[1]['centroid']))
+        self.assertIs(got[12], None)
+
+    def test_releases_data(self):
+        held = []
+        for bid, data in self.ex.stream(self.bids):
+            held.append(data)
+        self.assertFalse(held[0])
+
+    def test_bypasses_cache(self):
+        list(self.ex.stream(self.bids))
+        self.assertEqual(len(self.ex.blob_cache), 0)
+
+    def test_stats_callback(self):
+        seen = []
+        stream = self.ex.stream(self.bids,
+                callback=lambda bid, stats: seen.append((bid, stats.count)))
+        list(stream)
+
+        self.assertEqual(seen, [(1, 1), (12, 2)])
+        self.assertEqual(stream.stats.count, 2)
+        self.assertGreater(stream.stats.peak_rss, 0)
+        self.assertGreaterEqual(stream.stats.max_latency,
+                                stream.stats.mean_latency)
+
+    def test_memory_limit(self):
+        stream = self.ex.stream(self.bids, memory_limit=1)
+        self.assertRaises(MemoryError, list, stream)
@@ -0,0 +1,134 @@
+from __future__ import (
+        absolute_import, division, print_function, unicode_literals)
+import six
+from six.moves import (zip, filter, map, reduce, input, range)
+
+import pathlib
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+
+import multiworm
+from multiworm import synthetic
+from multiworm.readers import blob as blob_reader
+
+
+def read_png(path):
+    # just enough to read back what synthetic.write_png writes
+    data = pathlib.Path(path).read_bytes()
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, pos = {}, 8
+    while pos < len(data):
+        length, = struct.unpack(b'>I', data[pos:pos + 4])
+        kind = data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        crc, = struct.unpack(b'>I', data[pos + 8 + length:pos + 12 + length])
+        assert zlib.crc32(kind + body) & 0xffffffff == crc
+        chunks[kind] = body
+        pos += 12 + length
+    width, height = struct.unpack(b'>II', chunks[b'IHDR'][:8])
+    raw = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8)
+    return raw.reshape(height, width + 1)[:, 1:]
+
+
+class TestGenerate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = pathlib.Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tmp))
+
+    def generate(self, name='ex', **kwargs):
+        options = dict(frames=500, concurrent=8, total_blobs=60,
+                       blobs_per_file=20, images=3, plate_size=(300, 200))
+        options.update(kwargs)
+        return synthetic.generate(self.tmp / name, **options)
+
+    def test_readable(self):
+        ex = multiworm.Experiment(self.generate(event_rate=0.3))
+        self.assertEqual(len(ex.summary), 60)
+        self.assertEqual(len(ex.blobs_files), 3)
+        self.assertEqual(len(ex.frame_times), 500)
+        self.assertEqual(len(ex.image_files), 3)
+        self.assertGreater(len(ex.graph.edges()), 0)
+
+        n_blobs = 0
+        for bid, data in ex.blobs():
+            n_blobs += 1
+            row = ex.summary.loc[bid]
+            self.assertEqual(data['frame'][0], row['born_f'])
+            self.assertEqual(data['frame'][-1], row['died_f'])
+            self.assertEqual(data['frame'],
+                    list(range(int(row['born_f']), int(row['died_f']) + 1)))
+            np.testing.assert_allclose(data['time'],
+                    np.asarray(ex.frame_times)[np.array(data['frame']) - 1])
+        self.assertEqual(n_blobs, 60)
+
+    def test_contours(self):
+        ex = multiworm.Experiment(self.generate(geometry=0.5))
+        with_geometry = []
+        for bid, data in ex.blobs():
+            for i, n_points in enumerate(data['contour_encode_len']):
+                with_geometry.append(n_points is not None)
+                if n_points is None:
+                    continue
+                outline = blob_reader.decode_outline_line(data, i)
+                self.assertEqual(len(outline), n_points)
+                # a closed loop around the centroid
+                self.assertEqual(np.abs(outline[0] - outline[-1]).sum(), 1)
+                np.testing.assert_allclose(outline.mean(axis=0),
+                        data['centroid'][i], atol=3)
+                self.assertEqual(len(data['midline'][i]), 11)
+        self.assertAlmostEqual(np.mean(with_geometry), 0.5, delta=0.05)
+
+    def test_no_geometry(self):
+        ex = multiworm.Experiment(self.generate(geometry=0, images=0))
+        for bid, data in ex.blobs():
+            self.assertEqual(set(data['contour_encode_len']), set([None]))
+
+    def test_no_events(self):
+        ex = multiworm.Experiment(self.generate(event_rate=0, images=0))
+        self.assertEqual(len(ex.graph.edges()), 0)
+
+    def test_deterministic(self):
+        a = self.generate('a', seed=3)
+        b = self.generate('b', seed=3)
+        c = self.generate('c', seed=4)
+        names = sorted(p.name for p in a.iterdir())
+        self.assertEqual(names, sorted(p.name for p in b.iterdir()))
+        for name in names:
+            self.assertEqual((a / name).read_bytes(), (b / name).read_bytes())
+        self.assertNotEqual((a / 'synthetic.summary').read_bytes(),
+                            (c / 'synthetic.summary').read_bytes())
+
+    def test_images(self):
+        ex = multiworm.Experiment(self.generate(concurrent=3, total_blobs=3,
+                                                images=2))
+        for time, path in six.iteritems(ex.image_files):
+            img = read_png(path) # indexed by x then y, as MWT saves them
+            self.assertEqual(img.shape, (300, 200))
+            # every worm is dark on a light background
+            frame = int(round(time * 10))
+            for bid, data in ex.blobs():
+                if frame not in data['frame']:
+                    continue
+                x, y = data['centroid'][data['frame'].index(frame)]
+                self.assertLess(img[int(round(x)), int(round(y))], 100)
+            self.assertGreater(np.median(img), 150)
+
+
+class TestWritePNG(unittest.TestCase):
+
+    def test_round_trip(self):
+        tmp = pathlib.Path(tempfile.mkdtemp())
+        try:
+            image = np.random.RandomState(0).randint(0, 256, (7, 13))
+            synthetic.write_png(tmp / 'a.png', image.astype(np.uint8))
+            np.testing.assert_array_equal(read_png(tmp / 'a.png'), image)
+        finally:
+            shutil.rmtree(str(tmp))
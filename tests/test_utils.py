@@ -151,3 +151,29 @@ class TestLazyProp(unittest.TestCase):
         tick = time.time()
         assert a.b == 'red stapler'
         assert time.time() - tick < 0.05
+
+
+class TestBoundedMap(unittest.TestCase):
+    def setUp(self):
+        self.f = multiworm.util.bounded_map
+
+    def test_ordered(self):
+        out = list(self.f(abs, range(-20, 0), workers=3, executor='thread'))
+        self.assertEqual(out, [abs(x) for x in range(-20, 0)])
+
+    def test_unordered(self):
+        out = self.f(abs, range(-20, 0), workers=3, ordered=False,
+                     executor='thread')
+        self.assertEqual(sorted(out), list(range(1, 21)))
+
+    def test_backpressure(self):
+        consumed = []
+        def source():
+            for x in range(100):
+                consumed.append(x)
+                yield x
+
+        gen = self.f(abs, source(), workers=2, prefetch=4, executor='thread')
+        six.next(gen)
+        self.assertLessEqual(len(consumed), 5)
+        gen.close()